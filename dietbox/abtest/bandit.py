@@ -0,0 +1,250 @@
+import numpy as np
+import pandas as pd
+from dietbox.abtest.bayesian import cal_beta_comparison
+
+
+class ThompsonSamplingBandit:
+    """Beta-Binomial Thompson sampling allocation over arms
+
+    Each arm keeps its total and converted counts, the same quantities as
+    `ABTestRatios`, and a $Beta(\\alpha, \\beta)$ posterior of its conversion
+    rate. `choose(n)` allocates a batch of `n` units at once:
+
+    - `method="sample"` draws one posterior sample per unit and arm and picks
+      the arm with the largest sample, which is Thompson sampling,
+    - `method="probability"` draws the arms from the probabilities that each
+      arm is the best, which are cached between updates, so serving is a
+      single `Generator.choice` call.
+
+    Both methods allocate with the same probabilities. The probabilities are
+    computed with quadrature for two arms, see
+    `dietbox.abtest.bayesian.cal_beta_comparison`, and with Monte Carlo
+    samples otherwise.
+
+    ```python
+    bandit = ThompsonSamplingBandit(["A", "B", "C"])
+    arms = bandit.choose(1000)
+    bandit.update(arms, converted)
+    bandit.to_frame()
+    ```
+
+    :param arms: names of the arms, or the number of arms
+    :param prior: $(\\alpha, \\beta)$ of the beta prior, defaults to (1, 1)
+    :param method: `"sample"` or `"probability"`, defaults to `"sample"`
+    :param n_samples: number of Monte Carlo samples of the probabilities, defaults to 10000
+    :param seed: seed of the random generator
+    """
+
+    def __init__(self, arms, prior=None, method=None, n_samples=None, seed=None):
+
+        if prior is None:
+            prior = (1, 1)
+        if method is None:
+            method = "sample"
+        if method not in ("sample", "probability"):
+            raise Exception(f"method should be sample or probability: {method}")
+        if n_samples is None:
+            n_samples = 10000
+        if np.ndim(arms) == 0:
+            arms = range(arms)
+
+        self.arm_names = pd.Index(arms)
+        if not self.arm_names.is_unique:
+            raise Exception(f"arm names are not unique: {list(self.arm_names)}")
+
+        self.prior = prior
+        self.method = method
+        self.n_samples = n_samples
+        self.rng = np.random.default_rng(seed)
+        self.total = np.zeros(len(self.arm_names))
+        self.converted = np.zeros(len(self.arm_names))
+        self._probabilities = None
+
+    @classmethod
+    def from_ab_test_data(cls, ab_test_data, **kwargs):
+        """Bandit with the arms A and B and the counts of `ABTestRatios` data"""
+
+        bandit = cls(["A", "B"], **kwargs)
+        bandit.update_counts(
+            [ab_test_data["A_total"], ab_test_data["B_total"]],
+            [ab_test_data["A_converted"], ab_test_data["B_converted"]],
+        )
+
+        return bandit
+
+    def __len__(self):
+        return len(self.arm_names)
+
+    @property
+    def alpha(self):
+        return self.prior[0] + self.converted
+
+    @property
+    def beta(self):
+        return self.prior[1] + self.total - self.converted
+
+    def _arm_index(self, arms):
+        index = self.arm_names.get_indexer(np.asarray(arms).ravel())
+        if (index < 0).any():
+            raise Exception(f"unknown arms: {set(np.asarray(arms)[index < 0])}")
+
+        return index
+
+    def update_counts(self, total, converted):
+        """Add total and converted counts to every arm
+
+        :param total: totals in the order of the arms
+        :param converted: conversions in the order of the arms
+        :return: the bandit itself
+        """
+
+        self.total += np.asarray(total, dtype=float)
+        self.converted += np.asarray(converted, dtype=float)
+        self._probabilities = None
+
+        return self
+
+    def update(self, arms, converted):
+        """Add the outcomes of allocated units
+
+        :param arms: arm of each unit, e.g., from `choose`
+        :param converted: whether or how often each unit converted
+        :return: the bandit itself
+        """
+
+        index = self._arm_index(arms)
+
+        return self.update_counts(
+            np.bincount(index, minlength=len(self)),
+            np.bincount(
+                index, np.asarray(converted, dtype=float).ravel(), minlength=len(self)
+            ),
+        )
+
+    def allocation_probabilities(self):
+        """Posterior probabilities that each arm has the best conversion rate"""
+
+        if self._probabilities is not None:
+            return self._probabilities
+
+        alpha, beta = self.alpha, self.beta
+        if len(self) == 2 and min(alpha.min(), beta.min()) >= 1:
+            prob_b_better = cal_beta_comparison(alpha[0], beta[0], alpha[1], beta[1])[0]
+            probabilities = np.array([1 - prob_b_better, prob_b_better])
+        else:
+            samples = self.rng.beta(alpha, beta, size=(self.n_samples, len(self)))
+            probabilities = (
+                np.bincount(samples.argmax(axis=1), minlength=len(self))
+                / self.n_samples
+            )
+
+        self._probabilities = probabilities
+
+        return probabilities
+
+    def choose(self, n):
+        """Arms of a batch of `n` units
+
+        :param n: number of units
+        :return: arm names
+        :rtype: numpy.ndarray
+        """
+
+        if self.method == "probability":
+            index = self.rng.choice(
+                len(self), size=n, p=self.allocation_probabilities()
+            )
+        else:
+            index = self.rng.beta(self.alpha, self.beta, size=(n, len(self))).argmax(
+                axis=1
+            )
+
+        return self.arm_names.to_numpy()[index]
+
+    def to_frame(self):
+        """Counts, posterior means and allocation probabilities of the arms"""
+
+        return pd.DataFrame(
+            {
+                "total": self.total,
+                "converted": self.converted,
+                "posterior_mean": self.alpha / (self.alpha + self.beta),
+                "allocation_probability": self.allocation_probabilities(),
+            },
+            index=self.arm_names,
+        )
+
+
+def replay_bandit(policy, arms, converted, batch_size=None):
+    """Offline evaluation of a policy on logged uniformly random allocations
+
+    The logged units are replayed in batches. The policy chooses an arm for
+    every unit of a batch, only the units where it agrees with the logged arm
+    are kept, and the policy is updated with their outcomes after the batch,
+    as when serving with batched `choose` calls. With uniformly random logged
+    arms, the conversion rate of the kept units is an unbiased estimate of
+    the conversion rate of the policy, see Li et al., Unbiased Offline
+    Evaluation of Contextual-bandit-based News Article Recommendation
+    Algorithms: https://arxiv.org/abs/1003.5956
+
+    :param policy: object with `choose(n)` and `update(arms, converted)`,
+        e.g., `ThompsonSamplingBandit`
+    :param arms: logged arm of each unit
+    :param converted: logged outcome of each unit
+    :param batch_size: number of logged units per batch, defaults to 1000
+    :return: number of kept units, their conversions and conversion rate, and
+        the kept units of every arm
+    :rtype: dict
+    """
+
+    if batch_size is None:
+        batch_size = 1000
+
+    arms = np.asarray(arms)
+    converted = np.asarray(converted, dtype=float)
+
+    kept_arms, kept_converted = [], []
+    for start in range(0, len(arms), batch_size):
+        batch_arms = arms[start : start + batch_size]
+        batch_converted = converted[start : start + batch_size]
+
+        kept = policy.choose(len(batch_arms)) == batch_arms
+        policy.update(batch_arms[kept], batch_converted[kept])
+        kept_arms.append(batch_arms[kept])
+        kept_converted.append(batch_converted[kept])
+
+    kept_arms = np.concatenate(kept_arms)
+    kept_converted = np.concatenate(kept_converted)
+    arm_names, arm_counts = np.unique(kept_arms, return_counts=True)
+
+    return {
+        "total": len(kept_arms),
+        "converted": kept_converted.sum(),
+        "conversion_rate": kept_converted.mean() if len(kept_arms) else np.nan,
+        "allocation": dict(zip(arm_names.tolist(), arm_counts.tolist())),
+    }
+
+
+if __name__ == "__main__":
+
+    import timeit
+
+    rates = {"A": 0.05, "B": 0.055, "C": 0.07}
+    n = 1_000_000
+    rng = np.random.default_rng(42)
+    logged_arms = rng.choice(list(rates), size=n)
+    logged_converted = rng.random(n) < pd.Series(rates)[logged_arms].to_numpy()
+    print(f"uniform allocation: {logged_converted.mean():.4f}")
+
+    for method in ("sample", "probability"):
+        bandit = ThompsonSamplingBandit(list(rates), method=method, seed=42)
+        res = replay_bandit(bandit, logged_arms, logged_converted)
+        print(f"thompson sampling ({method}): {res}")
+
+        number = 100
+        duration = timeit.timeit(lambda: bandit.choose(10_000), number=number) / number
+        print(f"choose(10000) in {duration * 1e3:.2f}ms")
+
+    print(bandit.to_frame())
+
+    print("END")
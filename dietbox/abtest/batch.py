@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+from dietbox.abtest.normal import norm_sf
+from dietbox.abtest.stats import ABTestReport, metric
+from dietbox.abtest.stats_util import (
+    cal_conversion_rate,
+    cal_conversion_uplift,
+    cal_difference_standard_error,
+    cal_p_value,
+    cal_pooled_probability,
+    cal_pooled_std_err,
+    cal_standard_error,
+    cal_z_score,
+)
+
+
+class ABTestRatiosBatch(ABTestReport):
+    """Vectorized version of `ABTestRatios` for many experiments at once.
+
+    The input is columnar: either a dict of arrays or a pandas DataFrame with
+    the columns `A_total`, `A_converted`, `B_total`, `B_converted`. Each row is
+    one experiment and every metric is returned as an array with one value per
+    experiment. The numbers are the same as running `ABTestRatios` row by row.
+
+    ```python
+    batch = ABTestRatiosBatch(
+        {
+            "A_total": [17207, 1000],
+            "A_converted": [43, 70],
+            "B_total": [17198, 1100],
+            "B_converted": [68, 110],
+        }
+    )
+    batch.to_frame()
+    ```
+
+    :param ab_test_data: columnar experiment data
+    :type ab_test_data: dict or pandas.DataFrame
+    :param test_name: names of the experiments, defaults to the index of the
+        DataFrame if a DataFrame is given
+    :param test: `"normal"` for the p-values of `ABTestRatios` or `"binom"` for
+        the exact binomial p-values of `ABTestRatiosNaive`, defaults to `"normal"`
+    """
+
+    report_metrics = {
+        "kpi": "conversion_rate",
+        "std_err": "standard_error",
+        "pooled_std_err": "pooled_std_err",
+        "probability": "pooled_probability",
+        "uplift": "conversion_uplift",
+        "p_value": "p_value",
+        "z_score": "z_score",
+        "diff_std_err": "difference_std_err",
+    }
+
+    def __init__(self, ab_test_data, test_name=None, test=None):
+
+        if test is None:
+            test = "normal"
+        if test not in ("normal", "binom"):
+            raise Exception(f"test should be normal or binom: {test}")
+
+        self.test = test
+        self.data = ab_test_data
+        self.A_total = np.asarray(ab_test_data.get("A_total"), dtype=float)
+        self.A_converted = np.asarray(ab_test_data.get("A_converted"), dtype=float)
+        self.B_total = np.asarray(ab_test_data.get("B_total"), dtype=float)
+        self.B_converted = np.asarray(ab_test_data.get("B_converted"), dtype=float)
+
+        if test_name is not None:
+            self.name = np.asarray(test_name)
+        elif isinstance(ab_test_data, pd.DataFrame):
+            self.name = ab_test_data.index.to_numpy()
+        else:
+            self.name = None
+
+    def __len__(self):
+        return len(self.A_total)
+
+    @metric()
+    def conversion_rate(self):
+        """Conversion rates of all experiments"""
+
+        self.A_cr = cal_conversion_rate(self.A_total, self.A_converted)
+        self.B_cr = cal_conversion_rate(self.B_total, self.B_converted)
+
+        return self.A_cr, self.B_cr
+
+    @metric()
+    def standard_error(self):
+        """Standard errors of all experiments"""
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.A_std_err = cal_standard_error(self.A_total, self.A_converted)
+            self.B_std_err = cal_standard_error(self.B_total, self.B_converted)
+
+        return self.A_std_err, self.B_std_err
+
+    @metric()
+    def conversion_uplift(self):
+        """Relative uplift in conversion rate of all experiments"""
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.uplift = cal_conversion_uplift(
+                self.A_total, self.B_total, self.A_converted, self.B_converted
+            )
+
+        return self.uplift
+
+    @metric()
+    def pooled_probability(self):
+        """Pooled probability of all experiments"""
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.probability = cal_pooled_probability(
+                self.A_total, self.B_total, self.A_converted, self.B_converted
+            )
+
+        return self.probability
+
+    @metric("pooled_probability")
+    def pooled_std_err(self):
+        """Pooled standard error of all experiments"""
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.pld_std_err = cal_pooled_std_err(
+                self.probability, self.A_total, self.B_total
+            )
+
+        return self.pld_std_err
+
+    @metric()
+    def difference_std_err(self):
+        """Standard error of the difference of all experiments"""
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.diff_std_err = cal_difference_standard_error(
+                self.A_total, self.B_total, self.A_converted, self.B_converted
+            )
+
+        return self.diff_std_err
+
+    @metric("conversion_uplift", "pooled_std_err")
+    def p_value(self):
+        """p-values of all experiments
+
+        For the `"normal"` test, this is the p-value of the uplift under the null
+        distribution with pooled standard error. For the `"binom"` test, this is
+        the exact binomial p-value of B's conversions given A's conversion rate.
+        """
+
+        if self.test == "binom":
+            self.p = cal_p_value(
+                {
+                    "A_total": self.A_total,
+                    "A_converted": self.A_converted,
+                    "B_total": self.B_total,
+                    "B_converted": self.B_converted,
+                },
+                test="binom",
+            )
+        else:
+            self.p = norm_sf(self.uplift, loc=0, scale=self.pld_std_err)
+
+        return self.p
+
+    @metric()
+    def z_score(self, significance_level=None, two_tailed=None):
+        """z-scores of all experiments, using the p-values as significance levels"""
+
+        if significance_level is None:
+            significance_level = self.p_value()
+
+        if two_tailed is None:
+            two_tailed = True
+
+        self.z = cal_z_score(significance_level, two_tailed)
+
+        return self.z
+
+    def to_frame(self):
+        """Report as a DataFrame with one row per experiment"""
+
+        res = self.report(with_data=False)
+
+        dataframe = pd.DataFrame(
+            {
+                "kpi_a": res["kpi"]["a"],
+                "kpi_b": res["kpi"]["b"],
+                "std_err_a": res["std_err"]["a"],
+                "std_err_b": res["std_err"]["b"],
+                "pooled_std_err": res["pooled_std_err"],
+                "probability": res["probability"],
+                "uplift": res["uplift"],
+                "p_value": res["p_value"],
+                "z_score": res["z_score"],
+                "diff_std_err": res["diff_std_err"],
+            },
+            index=self.name,
+        )
+
+        return dataframe
+
+
+if __name__ == "__main__":
+
+    ab_tests = pd.DataFrame(
+        {
+            "A_total": np.random.randint(10000, 20000, size=5000),
+            "B_total": np.random.randint(10000, 20000, size=5000),
+        }
+    )
+    ab_tests["A_converted"] = np.random.binomial(ab_tests.A_total, 0.003)
+    ab_tests["B_converted"] = np.random.binomial(ab_tests.B_total, 0.004)
+
+    print(ABTestRatiosBatch(ab_tests).to_frame())
+
+    print("END")
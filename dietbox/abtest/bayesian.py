@@ -0,0 +1,301 @@
+import numpy as np
+import pandas as pd
+import scipy.special as scsp
+import scipy.stats as scs
+from dietbox.abtest.stats import ABTestReport, metric
+
+
+def _beta_pdf(x, alpha, beta):
+    """Beta density computed in log space, stable for large parameters"""
+
+    return np.exp(
+        (alpha - 1) * np.log(x) + (beta - 1) * np.log1p(-x) - scsp.betaln(alpha, beta)
+    )
+
+
+def cal_beta_comparison(alpha_A, beta_A, alpha_B, beta_B, quadrature_nodes=None):
+    """$P(B > A)$ and expected losses of two beta distributed rates
+
+    The expectations are one dimensional integrals over the density of the
+    narrower posterior, $\\int f_A(x) g_B(x) dx$, where $g_B$ is a closed form
+    expression of regularized incomplete beta functions. The integrals are
+    computed with Gauss-Legendre quadrature on $\\pm 12$ standard deviations
+    of the narrower posterior, vectorized over experiments.
+
+    The quadrature is accurate if all parameters are at least 1. Use
+    `cal_beta_comparison_monte_carlo` otherwise.
+
+    :param alpha_A: alpha parameters of the posteriors of group A
+    :param beta_A: beta parameters of the posteriors of group A
+    :param alpha_B: alpha parameters of the posteriors of group B
+    :param beta_B: beta parameters of the posteriors of group B
+    :param quadrature_nodes: number of Gauss-Legendre nodes, defaults to 64
+    :return: $P(B > A)$, expected loss of choosing A, expected loss of choosing B
+    :rtype: tuple
+    """
+
+    if quadrature_nodes is None:
+        quadrature_nodes = 64
+
+    alpha_A, beta_A, alpha_B, beta_B = np.broadcast_arrays(
+        *(np.asarray(i, dtype=float) for i in (alpha_A, beta_A, alpha_B, beta_B))
+    )
+    mean_A = alpha_A / (alpha_A + beta_A)
+    mean_B = alpha_B / (alpha_B + beta_B)
+    var_A = mean_A * (1 - mean_A) / (alpha_A + beta_A + 1)
+    var_B = mean_B * (1 - mean_B) / (alpha_B + beta_B + 1)
+
+    # integrate over the narrower distribution, "x" is the narrower one and
+    # "y" is the wider one
+    swap = var_B < var_A
+    alpha_x = np.where(swap, alpha_B, alpha_A)[..., None]
+    beta_x = np.where(swap, beta_B, beta_A)[..., None]
+    alpha_y = np.where(swap, alpha_A, alpha_B)[..., None]
+    beta_y = np.where(swap, beta_A, beta_B)[..., None]
+    mean_x = np.where(swap, mean_B, mean_A)[..., None]
+    mean_y = np.where(swap, mean_A, mean_B)[..., None]
+    std_x = np.sqrt(np.where(swap, var_B, var_A))[..., None]
+
+    lower = np.clip(mean_x - 12 * std_x, 0, 1)
+    upper = np.clip(mean_x + 12 * std_x, 0, 1)
+    nodes, weights = np.polynomial.legendre.leggauss(quadrature_nodes)
+    x = lower + (upper - lower) * (nodes + 1) / 2
+    weights = weights * (upper - lower) / 2
+
+    density_x = _beta_pdf(x, alpha_x, beta_x) * weights
+    cdf_y = scsp.betainc(alpha_y, beta_y, x)
+    first_moment_y = mean_y * scsp.betainc(alpha_y + 1, beta_y, x)
+
+    # P(y > x) and E[max(y - x, 0)]
+    prob_y_better = np.sum(density_x * (1 - cdf_y), axis=-1)
+    loss_x = np.sum(density_x * (mean_y - first_moment_y - x * (1 - cdf_y)), axis=-1)
+    loss_x = np.clip(loss_x, 0, None)
+    loss_y = np.clip(loss_x - (mean_y[..., 0] - mean_x[..., 0]), 0, None)
+
+    prob_B_better = np.where(swap, 1 - prob_y_better, prob_y_better)
+    loss_A = np.where(swap, loss_y, loss_x)
+    loss_B = np.where(swap, loss_x, loss_y)
+
+    return np.clip(prob_B_better, 0, 1), loss_A, loss_B
+
+
+def cal_beta_comparison_monte_carlo(
+    alpha_A, beta_A, alpha_B, beta_B, n_samples=None, seed=None
+):
+    """Monte Carlo version of `cal_beta_comparison`
+
+    The samples are drawn for all experiments at once from a generator with a
+    fixed seed, so the results are reproducible.
+
+    :param n_samples: number of posterior samples per experiment, defaults to 20000
+    :param seed: seed of the random generator, defaults to 42
+    :return: $P(B > A)$, expected loss of choosing A, expected loss of choosing B
+    :rtype: tuple
+    """
+
+    if n_samples is None:
+        n_samples = 20000
+    if seed is None:
+        seed = 42
+
+    alpha_A, beta_A, alpha_B, beta_B = np.broadcast_arrays(
+        *(np.asarray(i, dtype=float) for i in (alpha_A, beta_A, alpha_B, beta_B))
+    )
+    rng = np.random.default_rng(seed)
+    size = alpha_A.shape + (n_samples,)
+
+    samples_A = rng.beta(alpha_A[..., None], beta_A[..., None], size=size)
+    samples_B = rng.beta(alpha_B[..., None], beta_B[..., None], size=size)
+    difference = samples_B - samples_A
+
+    return (
+        np.mean(difference > 0, axis=-1),
+        np.mean(np.clip(difference, 0, None), axis=-1),
+        np.mean(np.clip(-difference, 0, None), axis=-1),
+    )
+
+
+class ABTestBayesian(ABTestReport):
+    """Bayesian Beta-Binomial counterpart of `ABTestRatios`
+
+    The conversion rates of both groups get independent $Beta(\\alpha, \\beta)$
+    priors. The input is the same `ab_test_data` as for `ABTestRatios`, either
+    with scalars for one experiment or with arrays (or a DataFrame) for many
+    experiments, in which case every metric is an array.
+
+    $P(B > A)$ and the expected losses are computed with quadrature, see
+    `cal_beta_comparison`. Experiments with posterior parameters below 1,
+    where the quadrature is not reliable, fall back to Monte Carlo with a
+    fixed seed. `method="monte_carlo"` uses Monte Carlo for all experiments.
+
+    ```python
+    bayes = ABTestBayesian(
+        {"A_converted": 43, "A_total": 17207, "B_converted": 68, "B_total": 17198}
+    )
+    bayes.report()
+    ```
+
+    :param ab_test_data: counts of the groups
+    :param prior: $(\\alpha, \\beta)$ of the beta prior, defaults to (1, 1)
+    :param credible_level: probability mass of the credible intervals, defaults to 0.95
+    :param method: `"quadrature"` or `"monte_carlo"`, defaults to `"quadrature"`
+    :param test_name: name of the test or names of the experiments
+    """
+
+    report_metrics = {
+        "kpi": "posterior_mean",
+        "credible_interval": "credible_interval",
+        "uplift": "posterior_uplift",
+        "prob_b_better": "prob_b_better",
+        "expected_loss": "expected_loss",
+    }
+
+    def __init__(
+        self, ab_test_data, prior=None, credible_level=None, method=None, test_name=None
+    ):
+
+        if prior is None:
+            prior = (1, 1)
+        if credible_level is None:
+            credible_level = 0.95
+        if method is None:
+            method = "quadrature"
+        if method not in ("quadrature", "monte_carlo"):
+            raise Exception(f"method should be quadrature or monte_carlo: {method}")
+
+        self.data = ab_test_data
+        self.prior = prior
+        self.credible_level = credible_level
+        self.method = method
+
+        A_total = np.asarray(ab_test_data.get("A_total"), dtype=float)
+        A_converted = np.asarray(ab_test_data.get("A_converted"), dtype=float)
+        B_total = np.asarray(ab_test_data.get("B_total"), dtype=float)
+        B_converted = np.asarray(ab_test_data.get("B_converted"), dtype=float)
+
+        self.A_alpha = prior[0] + A_converted
+        self.A_beta = prior[1] + A_total - A_converted
+        self.B_alpha = prior[0] + B_converted
+        self.B_beta = prior[1] + B_total - B_converted
+
+        if test_name is not None:
+            self.name = test_name
+        elif isinstance(ab_test_data, pd.DataFrame):
+            self.name = ab_test_data.index.to_numpy()
+        else:
+            self.name = None
+
+    @metric()
+    def posterior_mean(self):
+        """Posterior means of the conversion rates"""
+
+        self.A_mean = self.A_alpha / (self.A_alpha + self.A_beta)
+        self.B_mean = self.B_alpha / (self.B_alpha + self.B_beta)
+
+        return self.A_mean, self.B_mean
+
+    @metric()
+    def credible_interval(self):
+        """Equal tailed credible intervals of the conversion rates"""
+
+        lower = (1 - self.credible_level) / 2
+        upper = (1 + self.credible_level) / 2
+
+        self.A_interval = (
+            scs.beta.ppf(lower, self.A_alpha, self.A_beta),
+            scs.beta.ppf(upper, self.A_alpha, self.A_beta),
+        )
+        self.B_interval = (
+            scs.beta.ppf(lower, self.B_alpha, self.B_beta),
+            scs.beta.ppf(upper, self.B_alpha, self.B_beta),
+        )
+
+        return self.A_interval, self.B_interval
+
+    @metric("posterior_mean")
+    def posterior_uplift(self):
+        """Relative uplift of the posterior mean of B over A"""
+
+        self.uplift = (self.B_mean - self.A_mean) / self.A_mean
+
+        return self.uplift
+
+    @metric()
+    def comparison(self):
+        """$P(B > A)$ and the expected losses of choosing A or B"""
+
+        parameters = (self.A_alpha, self.A_beta, self.B_alpha, self.B_beta)
+
+        if self.method == "monte_carlo":
+            res = cal_beta_comparison_monte_carlo(*parameters)
+        else:
+            res = cal_beta_comparison(*parameters)
+            singular = np.min(np.broadcast_arrays(*parameters), axis=0) < 1
+            if np.any(singular):
+                fallback = cal_beta_comparison_monte_carlo(
+                    *(np.broadcast_to(i, singular.shape)[singular] for i in parameters)
+                )
+                res = tuple(np.array(i, copy=True) for i in res)
+                for r, f in zip(res, fallback):
+                    r[singular] = f
+                res = tuple(r[()] for r in res)
+
+        self.prob_B_better, self.A_loss, self.B_loss = res
+
+        return res
+
+    @metric("comparison")
+    def prob_b_better(self):
+        """Posterior probability that B converts better than A"""
+
+        return self.prob_B_better
+
+    @metric("comparison")
+    def expected_loss(self):
+        """Expected loss in conversion rate of choosing A or B"""
+
+        return self.A_loss, self.B_loss
+
+    def to_frame(self):
+        """Report as a DataFrame with one row per experiment"""
+
+        res = self.report(with_data=False)
+
+        dataframe = pd.DataFrame(
+            {
+                "kpi_a": res["kpi"]["a"],
+                "kpi_b": res["kpi"]["b"],
+                "credible_interval_a_lower": res["credible_interval"]["a"][0],
+                "credible_interval_a_upper": res["credible_interval"]["a"][1],
+                "credible_interval_b_lower": res["credible_interval"]["b"][0],
+                "credible_interval_b_upper": res["credible_interval"]["b"][1],
+                "uplift": res["uplift"],
+                "prob_b_better": res["prob_b_better"],
+                "expected_loss_a": res["expected_loss"]["a"],
+                "expected_loss_b": res["expected_loss"]["b"],
+            },
+            index=self.name,
+        )
+
+        return dataframe
+
+
+if __name__ == "__main__":
+
+    import time
+
+    ab_tests = pd.DataFrame(
+        {
+            "A_total": np.random.randint(10000, 20000, size=5000),
+            "B_total": np.random.randint(10000, 20000, size=5000),
+        }
+    )
+    ab_tests["A_converted"] = np.random.binomial(ab_tests.A_total, 0.003)
+    ab_tests["B_converted"] = np.random.binomial(ab_tests.B_total, 0.004)
+
+    start = time.perf_counter()
+    res = ABTestBayesian(ab_tests).to_frame()
+    print(f"{len(ab_tests)} experiments in {time.perf_counter() - start:.3f}s")
+    print(res.sort_values("prob_b_better"))
+
+    print("END")
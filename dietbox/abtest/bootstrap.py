@@ -0,0 +1,226 @@
+import numpy as np
+from dietbox.abtest.normal import norm_cdf, norm_ppf
+from dietbox.abtest.parallel import map_in_pool, spawn_seeds
+from dietbox.abtest.rank import cal_value_counts
+from dietbox.abtest.stats_util import cal_series_kpi
+
+# value counts of the groups, set once per worker process
+_worker_data = {}
+
+
+def _init_worker(groups):
+    _worker_data["groups"] = groups
+
+
+def cal_multinomial_weights(rng, counts, size):
+    """Bootstrap weights of the distinct values of a series
+
+    Resampling n elements with replacement is the same as drawing the number
+    of times each distinct value is picked from $Multinomial(n, counts / n)$.
+    Each row of the result is one resample.
+
+    Series with few distinct values are drawn with `rng.multinomial` in O(k)
+    per resample. Otherwise, the picks of the most frequent value, e.g., zero
+    revenue, are drawn from a binomial distribution and only the other picks
+    are sampled by position, in O(n - max(counts)) per resample.
+
+    :param rng: `np.random.Generator`
+    :param counts: counts of the distinct values
+    :param size: number of resamples
+    :return: weights of shape (size, k)
+    """
+
+    counts = np.asarray(counts, dtype=np.int64)
+    n = int(np.sum(counts))
+    k = len(counts)
+    bulk = int(np.argmax(counts))
+    rest = n - int(counts[bulk])
+
+    if 8 * k <= rest or rest == 0:
+        return rng.multinomial(n, counts / n, size=size)
+
+    rest_picks = rng.binomial(n, rest / n, size=size)
+    others = np.delete(np.arange(k), bulk)
+    category = np.repeat(others, counts[others])
+    picks = category[rng.integers(0, rest, size=int(np.sum(rest_picks)))]
+    picks += np.repeat(np.arange(size) * k, rest_picks)
+
+    weights = np.bincount(picks, minlength=size * k).reshape(size, k)
+    weights[:, bulk] = n - rest_picks
+
+    return weights
+
+
+def _cal_bytes_per_resample(counts):
+    """Upper bound of the memory of the weights of one resample"""
+
+    return 8 * (len(counts) + 2 * (np.sum(counts) - np.max(counts)))
+
+
+def _bootstrap_block(task):
+    """Sums and non-zero counts of one block of resamples of each group"""
+
+    seed, size = task
+    rng = np.random.default_rng(seed)
+
+    res = []
+    for values, counts in _worker_data["groups"]:
+        weights = cal_multinomial_weights(rng, counts, size)
+        res.append((weights @ values, weights @ (values != 0)))
+
+    return res
+
+
+def _cal_uplift(A_kpi, B_kpi):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (B_kpi - A_kpi) / A_kpi
+
+
+def _cal_jackknife_uplift(groups, kpi_method):
+    """Leave-one-out uplifts, one per distinct value of each group, and their counts"""
+
+    moments = [
+        (np.sum(counts), np.dot(values, counts), np.sum(counts[values != 0]))
+        for values, counts in groups
+    ]
+    kpis = [cal_series_kpi(*m, kpi_method=kpi_method) for m in moments]
+
+    uplifts = []
+    for i, (values, counts) in enumerate(groups):
+        total, value_sum, non_zero = moments[i]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            kpi_loo = cal_series_kpi(
+                total - 1, value_sum - values, non_zero - (values != 0), kpi_method
+            )
+        if i == 0:
+            uplifts.append(_cal_uplift(kpi_loo, kpis[1]))
+        else:
+            uplifts.append(_cal_uplift(kpis[0], kpi_loo))
+
+    return np.concatenate(uplifts), np.concatenate([c for _, c in groups])
+
+
+def cal_bootstrap_uplift_interval(
+    A_series,
+    B_series,
+    kpi_method=None,
+    n_resamples=None,
+    confidence_level=None,
+    n_jobs=None,
+    seed=None,
+    max_block_bytes=None,
+):
+    """Bootstrap confidence intervals of the KPI uplift of two series
+
+    The series are reduced to their value counts, and the resamples are
+    drawn as blocks of multinomial weight matrices of the distinct values,
+    see `cal_multinomial_weights`. The size of a block is bounded by
+    `max_block_bytes`. The blocks are spread over a process pool and every
+    block has its own seed spawned from `seed`, so the result does not
+    depend on `n_jobs`.
+
+    Percentile and BCa intervals are reported. The acceleration of the BCa
+    interval comes from the closed form jackknife of the KPIs.
+
+    :param A_series: series of group A
+    :param B_series: series of group B
+    :param kpi_method: kpi method of `ABTestSeries`, defaults to `"sum"`
+    :param n_resamples: number of resamples, defaults to 10000
+    :param confidence_level: confidence level, defaults to 0.95
+    :param n_jobs: number of processes, defaults to all CPUs
+    :param seed: seed of the resamples, defaults to 42
+    :param max_block_bytes: memory bound of one block of weights, defaults to 64 MB
+    :return: uplift and its intervals
+    :rtype: dict
+    """
+
+    if kpi_method is None:
+        kpi_method = "sum"
+    if n_resamples is None:
+        n_resamples = 10000
+    if confidence_level is None:
+        confidence_level = 0.95
+    if seed is None:
+        seed = 42
+    if max_block_bytes is None:
+        max_block_bytes = 2**26
+
+    groups = []
+    for series in (A_series, B_series):
+        values, counts = cal_value_counts(series)
+        groups.append((values.astype(float), counts.astype(np.int64)))
+
+    A_kpi, B_kpi = (
+        cal_series_kpi(
+            np.sum(counts),
+            np.dot(values, counts),
+            np.sum(counts[values != 0]),
+            kpi_method,
+        )
+        for values, counts in groups
+    )
+    uplift = _cal_uplift(A_kpi, B_kpi)
+
+    bytes_per_resample = max(_cal_bytes_per_resample(c) for _, c in groups)
+    block_size = int(max(1, min(n_resamples, max_block_bytes // bytes_per_resample)))
+    block_sizes = [block_size] * (n_resamples // block_size)
+    if n_resamples % block_size:
+        block_sizes.append(n_resamples % block_size)
+
+    try:
+        blocks = map_in_pool(
+            _bootstrap_block,
+            zip(spawn_seeds(seed, len(block_sizes)), block_sizes),
+            n_jobs=n_jobs,
+            initializer=_init_worker,
+            initargs=(groups,),
+        )
+    finally:
+        _worker_data.clear()
+
+    resampled_kpis = []
+    for i, (values, counts) in enumerate(groups):
+        value_sum = np.concatenate([block[i][0] for block in blocks])
+        non_zero = np.concatenate([block[i][1] for block in blocks])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            resampled_kpis.append(
+                cal_series_kpi(np.sum(counts), value_sum, non_zero, kpi_method)
+            )
+    resampled_uplift = _cal_uplift(*resampled_kpis)
+
+    alpha = 1 - confidence_level
+    percentile = np.nanquantile(resampled_uplift, [alpha / 2, 1 - alpha / 2])
+
+    jackknife, jackknife_counts = _cal_jackknife_uplift(groups, kpi_method)
+    deviation = np.average(jackknife, weights=jackknife_counts) - jackknife
+    acceleration = np.sum(jackknife_counts * deviation**3) / (
+        6 * np.sum(jackknife_counts * deviation**2) ** 1.5
+    )
+    bias = norm_ppf(np.mean(resampled_uplift < uplift))
+    z = norm_ppf([alpha / 2, 1 - alpha / 2])
+    bca_levels = norm_cdf(bias + (bias + z) / (1 - acceleration * (bias + z)))
+    bca = np.nanquantile(resampled_uplift, bca_levels)
+
+    return {
+        "uplift": uplift,
+        "percentile": (percentile[0], percentile[1]),
+        "bca": (bca[0], bca[1]),
+        "n_resamples": n_resamples,
+        "confidence_level": confidence_level,
+    }
+
+
+if __name__ == "__main__":
+
+    import time
+
+    rng = np.random.default_rng(42)
+    size = 1_000_000
+    A_series = rng.binomial(1, 0.03, size=size) * rng.lognormal(3, 1.5, size=size)
+    B_series = rng.binomial(1, 0.031, size=size) * rng.lognormal(3, 1.5, size=size)
+
+    start = time.perf_counter()
+    print(cal_bootstrap_uplift_interval(A_series, B_series, kpi_method="all_avg"))
+    print(f"10000 resamples of {size} rows: {time.perf_counter() - start:.3f}s")
+
+    print("END")
@@ -0,0 +1,224 @@
+import numpy as np
+import scipy.stats as scs
+from dietbox.abtest.moments import MomentsAccumulator
+from dietbox.abtest.normal import norm_sf
+from dietbox.abtest.results import ABTestResult, ABTestResultCollection
+from dietbox.abtest.stats import ABTestSeries
+
+
+def cal_group_moments(values):
+    """Moments of every column of a matrix in one pass
+
+    :param values: 2 dimensional array with one column per metric
+    :return: one `MomentsAccumulator` per column
+    :rtype: list
+    """
+
+    values = np.asarray(values, dtype=float)
+    total = values.shape[0]
+    if not total:
+        return [MomentsAccumulator() for _ in range(values.shape[1])]
+
+    mean = values.mean(axis=0)
+    m2 = ((values - mean) ** 2).sum(axis=0)
+    non_zero = np.count_nonzero(values, axis=0)
+
+    return [
+        MomentsAccumulator(
+            {"total": total, "non_zero": non_zero[i], "mean": mean[i], "m2": m2[i]}
+        )
+        for i in range(values.shape[1])
+    ]
+
+
+def _cal_rank_sums(values, n_A):
+    """Rank sums of the first `n_A` rows and tie terms of every column"""
+
+    n = len(values)
+    order = np.argsort(values, axis=0, kind="stable")
+    sorted_values = np.take_along_axis(values, order, axis=0)
+
+    # first and last position of the run of ties of every sorted element
+    index = np.arange(n)[:, None]
+    new_run = np.ones(values.shape, dtype=bool)
+    new_run[1:] = sorted_values[1:] != sorted_values[:-1]
+    end_run = np.ones(values.shape, dtype=bool)
+    end_run[:-1] = new_run[1:]
+    first = np.maximum.accumulate(np.where(new_run, index, 0), axis=0)
+    last = np.minimum.accumulate(np.where(end_run, index, n)[::-1], axis=0)[::-1]
+
+    rank_sum = np.where(order < n_A, (first + last) / 2 + 1, 0).sum(axis=0)
+    # each run of length t has t elements, which add up to t^3 - t
+    tie_term = ((last - first + 1.0) ** 2 - 1).sum(axis=0)
+
+    return rank_sum, tie_term
+
+
+def cal_mannwhitneyu_columns(A_values, B_values, max_block_size=None):
+    """Two sided Mann-Whitney U tests of every column of two matrices
+
+    The stacked matrix is ranked with one `argsort` along the rows per block
+    of columns, and the average ranks of ties are found for all columns at
+    once, instead of one `scipy.stats.mannwhitneyu` call per column. The
+    p-values are the asymptotic ones with continuity and tie corrections, as
+    in `ABTestSeries.p_value`. Tiny samples are passed to scipy, which may
+    use the exact distribution. Columns with NaN values have NaN p-values.
+
+    :param A_values: 2 dimensional array of group A with one column per metric
+    :param B_values: 2 dimensional array of group B with the same columns
+    :param max_block_size: maximum number of values ranked at once, which
+        bounds the memory of the temporary arrays, defaults to 2**23
+    :return: p-values of the columns
+    :rtype: numpy.ndarray
+    """
+
+    if max_block_size is None:
+        max_block_size = 2**23
+
+    A_values = np.asarray(A_values, dtype=float)
+    B_values = np.asarray(B_values, dtype=float)
+    n_A, n_B = len(A_values), len(B_values)
+    n = n_A + n_B
+
+    if min(n_A, n_B) <= 8:
+        return scs.mannwhitneyu(
+            A_values, B_values, alternative="two-sided", axis=0
+        ).pvalue
+
+    n_columns = A_values.shape[1]
+    block = max(1, max_block_size // n)
+    rank_sum, tie_term = np.empty(n_columns), np.empty(n_columns)
+    for start in range(0, n_columns, block):
+        columns = slice(start, start + block)
+        rank_sum[columns], tie_term[columns] = _cal_rank_sums(
+            np.concatenate([A_values[:, columns], B_values[:, columns]]), n_A
+        )
+
+    U = rank_sum - n_A * (n_A + 1) / 2
+    mean = n_A * n_B / 2
+    std = np.sqrt(n_A * n_B / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (np.maximum(U, n_A * n_B - U) - mean - 0.5) / std
+
+    p_values = np.clip(2 * norm_sf(z), 0, 1)
+    # NaN propagates as in scipy, instead of being ranked as the largest value
+    p_values[np.isnan(A_values).any(axis=0) | np.isnan(B_values).any(axis=0)] = np.nan
+
+    return p_values
+
+
+def experiment_report(
+    dataframe,
+    metrics=None,
+    group_column=None,
+    groups=None,
+    kpi_method=None,
+    test=None,
+):
+    """AB test report of many metric columns of one experiment
+
+    The rows of each group are selected once and the moments of all metric
+    columns are computed in one pass over the group, see
+    `cal_group_moments`. The KPIs are the ones of `ABTestSeries` with
+    sufficient statistics. With `test="mannwhitney"`, all columns are rank
+    tested together, see `cal_mannwhitneyu_columns`, which gives the
+    p-values of `ABTestSeries.p_value` in a fraction of the time. With
+    `test="welch"` or `test="z"`, the p-values come from the moments, see
+    `dietbox.abtest.moments.cal_welch_test`.
+
+    ```python
+    experiment_report(
+        sessions,
+        metrics=["revenue", "orders", "page_views"],
+        kpi_method={"revenue": "all_avg", "orders": "count", "page_views": "sum"},
+    )
+    ```
+
+    :param dataframe: one row per unit with the group and metric columns
+    :type dataframe: pandas.DataFrame
+    :param metrics: metric columns, defaults to all columns but the group column
+    :param group_column: column of the groups, defaults to `"group"`
+    :param groups: values of group A and group B in `group_column`, defaults to `("A", "B")`
+    :param kpi_method: kpi method of all metrics, or dict of metrics to kpi
+        methods, see `ABTestSeries`, defaults to `"sum"`
+    :param test: `"mannwhitney"`, `"welch"` or `"z"`, defaults to `"mannwhitney"`
+    :return: one row per metric
+    :rtype: pandas.DataFrame
+    """
+
+    if group_column is None:
+        group_column = "group"
+    if groups is None:
+        groups = ("A", "B")
+    if test is None:
+        test = "mannwhitney"
+    if test not in ("mannwhitney", "welch", "z"):
+        raise Exception(f"test should be mannwhitney, welch or z: {test}")
+    if metrics is None:
+        metrics = [column for column in dataframe.columns if column != group_column]
+    metrics = list(metrics)
+    if not isinstance(kpi_method, dict):
+        kpi_method = {metric: kpi_method for metric in metrics}
+
+    group_values = [
+        dataframe.loc[dataframe[group_column] == group, metrics].to_numpy(dtype=float)
+        for group in groups
+    ]
+    A_moments, B_moments = (cal_group_moments(values) for values in group_values)
+    if test == "mannwhitney":
+        p_values = cal_mannwhitneyu_columns(*group_values)
+
+    results = ABTestResultCollection(capacity=max(1, len(metrics)))
+    for i, metric in enumerate(metrics):
+        ab_test = ABTestSeries(
+            {"A_moments": A_moments[i], "B_moments": B_moments[i]},
+            kpi_method=kpi_method.get(metric),
+            test_name=metric,
+        )
+        report = ab_test.report(with_data=False, pipeline=["kpi", "std_err", "uplift"])
+        if test == "mannwhitney":
+            report["p_value"] = p_values[i]
+        else:
+            report["p_value"] = ab_test.p_value(method=test)
+        results.append(ABTestResult.from_report(report))
+
+    res = results.to_frame().drop(columns="z_score").set_index("name")
+    res.index.name = "metric"
+    res.insert(0, "kpi_method", [kpi_method.get(metric) or "sum" for metric in metrics])
+
+    return res
+
+
+if __name__ == "__main__":
+
+    import time
+
+    import pandas as pd
+
+    n = 1_000_000
+    n_metrics = 20
+    rng = np.random.default_rng(42)
+    sessions = pd.DataFrame(
+        rng.binomial(1, 0.3, size=(n, n_metrics))
+        * rng.lognormal(1, 1, size=(n, n_metrics)),
+        columns=[f"metric_{i}" for i in range(n_metrics)],
+    )
+    sessions["group"] = rng.choice(["A", "B"], size=n)
+
+    start = time.perf_counter()
+    for metric in sessions.columns.drop("group"):
+        ABTestSeries(
+            {
+                "A_series": sessions.loc[sessions.group == "A", metric].to_numpy(),
+                "B_series": sessions.loc[sessions.group == "B", metric].to_numpy(),
+            },
+            kpi_method="all_avg",
+        ).report(with_data=False)
+    print(f"one ABTestSeries per metric: {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    report = experiment_report(sessions, kpi_method="all_avg")
+    print(f"experiment_report: {time.perf_counter() - start:.3f}s")
+    print(report)
+
+    print("END")
@@ -0,0 +1,422 @@
+import mmap
+import os
+
+import numpy as np
+import scipy.special as scsp
+
+
+class MomentsAccumulator:
+    """Streaming mean, variance and covariance of a series and a covariate
+
+    Chunks are reduced with NumPy and combined with the parallel update of
+    Chan et al., so the series never has to be in memory at once and the
+    result does not suffer from the cancellation of naive sums of squares.
+    Accumulators of different chunks or workers can be merged with `merge`
+    or `+`.
+
+    ```python
+    moments = MomentsAccumulator()
+    for series_chunk, covariate_chunk in chunks:
+        moments.update(series_chunk, covariate_chunk)
+
+    moments.mean, moments.variance, moments.covariance
+    ```
+
+    :param moments: initial state in the format of `to_dict`, defaults to empty
+    """
+
+    fields = (
+        "total",
+        "non_zero",
+        "mean",
+        "m2",
+        "covariate_mean",
+        "covariate_m2",
+        "comoment",
+    )
+
+    def __init__(self, moments=None):
+
+        if moments is None:
+            moments = {}
+
+        for field in self.fields:
+            setattr(self, field, moments.get(field, 0))
+
+    @classmethod
+    def from_sums(
+        cls,
+        total,
+        sum,
+        sum_squares,
+        non_zero=None,
+        covariate_sum=None,
+        covariate_sum_squares=None,
+        cross_sum=None,
+    ):
+        """Accumulator from raw sums, e.g., aggregated in SQL or Spark
+
+        The centered moments are recovered from the sums, e.g.,
+        $M_2 = \\sum x^2 - n \\bar x^2$. This loses precision if the mean is
+        many orders of magnitude larger than the standard deviation, which
+        does not happen for typical AB test metrics. Prefer merging
+        accumulators of the partitions where possible.
+
+        :param total: number of elements
+        :param sum: sum of the series
+        :param sum_squares: sum of the squares of the series
+        :param non_zero: number of non zero elements, NaN if not given, as it
+            can not be recovered from the sums
+        :param covariate_sum: sum of the covariate
+        :param covariate_sum_squares: sum of the squares of the covariate
+        :param cross_sum: sum of the products of the series and the covariate
+        """
+
+        moments = {"total": total, "non_zero": np.nan if non_zero is None else non_zero}
+        if total:
+            moments["mean"] = sum / total
+            moments["m2"] = max(sum_squares - total * moments["mean"] ** 2, 0)
+            if covariate_sum is not None:
+                moments["covariate_mean"] = covariate_sum / total
+                moments["covariate_m2"] = max(
+                    covariate_sum_squares - total * moments["covariate_mean"] ** 2, 0
+                )
+                moments["comoment"] = (
+                    cross_sum - total * moments["mean"] * moments["covariate_mean"]
+                )
+
+        return cls(moments)
+
+    def update(self, series, covariate=None):
+        """Add a chunk of the series and, optionally, of the covariate
+
+        :param series: chunk of the series
+        :param covariate: chunk of the covariate of the same length
+        :return: the accumulator itself
+        """
+
+        series = np.asarray(series, dtype=float).ravel()
+        if not len(series):
+            return self
+
+        chunk = {"total": len(series), "non_zero": np.count_nonzero(series)}
+        chunk["mean"] = series.mean()
+        centered = series - chunk["mean"]
+        chunk["m2"] = np.dot(centered, centered)
+
+        if covariate is not None:
+            covariate = np.asarray(covariate, dtype=float).ravel()
+            if covariate.shape != series.shape:
+                raise Exception(
+                    f"series and covariate have different shapes: "
+                    f"{series.shape} and {covariate.shape}"
+                )
+            chunk["covariate_mean"] = covariate.mean()
+            covariate_centered = covariate - chunk["covariate_mean"]
+            chunk["covariate_m2"] = np.dot(covariate_centered, covariate_centered)
+            chunk["comoment"] = np.dot(centered, covariate_centered)
+
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """Add the moments of another accumulator to this one
+
+        :param other: accumulator or dict from `to_dict`
+        :return: the accumulator itself
+        """
+
+        if isinstance(other, dict):
+            other = MomentsAccumulator(other)
+
+        total = self.total + other.total
+        if not other.total:
+            return self
+        if not self.total:
+            for field in self.fields:
+                setattr(self, field, getattr(other, field))
+            return self
+
+        weight = self.total * other.total / total
+        delta = other.mean - self.mean
+        covariate_delta = other.covariate_mean - self.covariate_mean
+
+        self.m2 += other.m2 + delta**2 * weight
+        self.covariate_m2 += other.covariate_m2 + covariate_delta**2 * weight
+        self.comoment += other.comoment + delta * covariate_delta * weight
+        self.mean += delta * other.total / total
+        self.covariate_mean += covariate_delta * other.total / total
+        self.non_zero += other.non_zero
+        self.total = total
+
+        return self
+
+    def __add__(self, other):
+        return MomentsAccumulator(self.to_dict()).merge(other)
+
+    def __iadd__(self, other):
+        return self.merge(other)
+
+    def to_dict(self):
+        """Current moments as a dict"""
+
+        return {field: getattr(self, field) for field in self.fields}
+
+    @property
+    def sum(self):
+        """Sum of the series"""
+
+        return self.mean * self.total
+
+    @property
+    def variance(self):
+        """Sample variance of the series"""
+
+        return self.m2 / (self.total - 1)
+
+    @property
+    def covariate_variance(self):
+        """Sample variance of the covariate"""
+
+        return self.covariate_m2 / (self.total - 1)
+
+    @property
+    def covariance(self):
+        """Sample covariance of the series and the covariate"""
+
+        return self.comoment / (self.total - 1)
+
+
+def is_series_file(series):
+    """Whether a series is a path of a file, see `iter_series_chunks`"""
+
+    return isinstance(series, (str, os.PathLike))
+
+
+def is_series_stream(series):
+    """Whether a series is read chunk by chunk instead of held in memory
+
+    Paths, memory maps and iterators of chunks are streamed.
+    """
+
+    return (
+        is_series_file(series)
+        or isinstance(series, np.memmap)
+        or not (isinstance(series, np.ndarray) or hasattr(series, "__len__"))
+    )
+
+
+def _file_layout(series, dtype):
+    """File name, offset, dtype and number of elements of a file backed series"""
+
+    if isinstance(series, np.memmap):
+        # only the memory map of a whole file has a valid offset, slices of
+        # it are read through the memory map
+        if isinstance(series.base, mmap.mmap) and series.flags.c_contiguous:
+            return series.filename, series.offset, series.dtype, series.size
+        return None
+
+    if not is_series_file(series):
+        return None
+
+    if str(series).endswith(".npy"):
+        with open(series, "rb") as fp:
+            version = np.lib.format.read_magic(fp)
+            if version == (1, 0):
+                shape, _, dtype = np.lib.format.read_array_header_1_0(fp)
+            else:
+                shape, _, dtype = np.lib.format.read_array_header_2_0(fp)
+            return series, fp.tell(), dtype, int(np.prod(shape))
+
+    dtype = np.dtype(float if dtype is None else dtype)
+
+    return series, 0, dtype, os.path.getsize(series) // dtype.itemsize
+
+
+def open_series(series, dtype=None):
+    """Memory map of a series stored in a file
+
+    `.npy` files are opened with `np.load`, other files are raw binary dumps
+    of `dtype`. Other series are returned as they are.
+
+    :param series: path, or any other series
+    :param dtype: dtype of raw binary files, defaults to float64
+    """
+
+    if not is_series_file(series):
+        return series
+    if str(series).endswith(".npy"):
+        return np.load(series, mmap_mode="r")
+
+    return np.memmap(series, dtype=float if dtype is None else dtype, mode="r")
+
+
+def iter_series_chunks(series, chunk_size=None, dtype=None):
+    """Chunks of a series held in memory, stored in a file, or already chunked
+
+    Files, i.e., paths of `.npy` files or raw binary dumps of `dtype` and
+    memory maps of whole files, are read chunk by chunk with buffered reads,
+    so the memory stays bounded by the chunk size however long the series is.
+    Reading through a memory map would instead keep every page it touched in
+    the resident memory of the process.
+
+    :param series: array, path, `np.memmap` or iterator of chunks
+    :param chunk_size: number of elements per chunk, defaults to 2**20
+    :param dtype: dtype of raw binary files, defaults to float64
+    :return: generator of arrays
+    """
+
+    if chunk_size is None:
+        chunk_size = 2**20
+
+    layout = _file_layout(series, dtype)
+    if layout is not None:
+        filename, offset, dtype, size = layout
+        with open(filename, "rb") as fp:
+            fp.seek(offset)
+            for start in range(0, size, chunk_size):
+                yield np.fromfile(fp, dtype=dtype, count=min(chunk_size, size - start))
+    elif isinstance(series, np.ndarray) or hasattr(series, "__len__"):
+        series = np.asarray(series)
+        for start in range(0, len(series), chunk_size):
+            yield series[start : start + chunk_size]
+    else:
+        for chunk in series:
+            yield np.asarray(chunk)
+
+
+def cal_moments(series, covariate=None, chunk_size=None, dtype=None):
+    """Moments of a series and a covariate, computed chunk by chunk
+
+    :param series: array, path, `np.memmap` or iterator of chunks, see
+        `iter_series_chunks`
+    :param covariate: same as the series, with chunks matching the chunks of
+        the series
+    :param chunk_size: size of the chunks of arrays and files, which bounds the
+        memory of the temporary arrays, defaults to 2**20
+    :param dtype: dtype of raw binary files, defaults to float64
+    :rtype: MomentsAccumulator
+    """
+
+    moments = MomentsAccumulator()
+
+    chunks = iter_series_chunks(series, chunk_size=chunk_size, dtype=dtype)
+    if covariate is None:
+        for chunk in chunks:
+            moments.update(chunk)
+    else:
+        covariate_chunks = iter_series_chunks(
+            covariate, chunk_size=chunk_size, dtype=dtype
+        )
+        for chunk, covariate_chunk in zip(chunks, covariate_chunks):
+            moments.update(chunk, covariate_chunk)
+
+    return moments
+
+
+def _cal_kpi_moments(moments, kpi_method):
+    """KPI, its standard error and the number of observations behind it"""
+
+    total, non_zero = moments.total, moments.non_zero
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if kpi_method in ("sum", "all_avg"):
+            size, mean, variance = total, moments.mean, moments.variance
+        elif kpi_method == "count":
+            size, mean = total, non_zero / total
+            variance = mean * (1 - mean) * total / (total - 1)
+        elif kpi_method == "non_zero_avg":
+            # zeros add nothing to the sums, so the non zero elements have
+            # the same sum and sum of squares as the series
+            size, mean = non_zero, moments.sum / non_zero
+            sum_squares = moments.m2 + total * moments.mean**2
+            variance = (sum_squares - non_zero * mean**2) / (non_zero - 1)
+        else:
+            raise Exception(f"kpi_method {kpi_method} is not supported")
+
+        scale = total if kpi_method == "sum" else 1
+        std_err = scale * np.sqrt(max(variance, 0) / size)
+
+    return scale * mean, std_err, size
+
+
+def cal_welch_test(A_moments, B_moments, kpi_method=None, test=None):
+    """Welch's t-test or z-test of the difference of the KPIs of two groups
+
+    Only the moments of the groups are needed, so the groups can be reduced
+    anywhere, e.g., chunk by chunk, in workers or in SQL, see
+    `MomentsAccumulator`. The KPIs are the ones of `ABTestSeries`; for
+    `"sum"`, the sizes of the groups are taken as fixed.
+
+    :param A_moments: `MomentsAccumulator` of group A
+    :param B_moments: `MomentsAccumulator` of group B
+    :param kpi_method: kpi method, defaults to `"sum"`
+    :param test: `"welch"` for Welch's t-test or `"z"` for the z-test, defaults to `"welch"`
+    :return: KPIs, their standard errors, difference, its standard error,
+        statistic, degrees of freedom and two tailed p-value
+    :rtype: dict
+    """
+
+    if kpi_method is None:
+        kpi_method = "sum"
+    if test is None:
+        test = "welch"
+    if test not in ("welch", "z"):
+        raise Exception(f"test should be welch or z: {test}")
+
+    A_kpi, A_std_err, A_size = _cal_kpi_moments(A_moments, kpi_method)
+    B_kpi, B_std_err, B_size = _cal_kpi_moments(B_moments, kpi_method)
+
+    difference = B_kpi - A_kpi
+    std_err = np.hypot(A_std_err, B_std_err)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        statistic = difference / std_err
+        if test == "welch":
+            dof = std_err**4 / (
+                A_std_err**4 / (A_size - 1) + B_std_err**4 / (B_size - 1)
+            )
+            p_value = 2 * scsp.stdtr(dof, -np.abs(statistic))
+        else:
+            dof = np.inf
+            p_value = 2 * scsp.ndtr(-np.abs(statistic))
+
+    return {
+        "kpi": (A_kpi, B_kpi),
+        "std_err": (A_std_err, B_std_err),
+        "difference": difference,
+        "diff_std_err": std_err,
+        "statistic": statistic,
+        "dof": dof,
+        "p_value": p_value,
+    }
+
+
+if __name__ == "__main__":
+
+    import time
+
+    size = 50_000_000
+    covariate = np.random.lognormal(1, 1, size=size)
+    series = 0.8 * covariate + np.random.normal(0, 1, size=size)
+
+    start = time.perf_counter()
+    moments = cal_moments(series, covariate)
+    print(f"{size} rows: {time.perf_counter() - start:.3f}s")
+    print(
+        moments.mean, moments.variance, moments.covariance / moments.covariate_variance
+    )
+
+    import resource
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "series.npy")
+        np.save(path, series)
+        del series, covariate
+
+        start = time.perf_counter()
+        moments = cal_moments(path)
+        print(
+            f"{size} rows from {path}: {time.perf_counter() - start:.3f}s, "
+            f"max rss {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3:.0f}MB"
+        )
+
+    print("END")
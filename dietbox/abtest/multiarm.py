@@ -0,0 +1,326 @@
+import numpy as np
+import pandas as pd
+from dietbox.abtest.normal import norm_cdf, norm_sf
+from dietbox.abtest.stats import ABTestReport, metric
+from dietbox.abtest.stats_util import (
+    cal_conversion_rate,
+    cal_pooled_probability,
+    cal_pooled_std_err,
+)
+
+
+def cal_holm_adjusted(p_values):
+    """Holm step-down adjusted p-values, controlling the family-wise error rate
+
+    :param p_values: p-values of one family of comparisons
+    :return: adjusted p-values in the original order
+    """
+
+    p_values = np.asarray(p_values, dtype=float)
+    m = len(p_values)
+    order = np.argsort(p_values)
+
+    adjusted = np.maximum.accumulate((m - np.arange(m)) * p_values[order])
+    res = np.empty(m)
+    res[order] = np.clip(adjusted, 0, 1)
+
+    return res
+
+
+def cal_benjamini_hochberg_adjusted(p_values):
+    """Benjamini-Hochberg adjusted p-values, controlling the false discovery rate
+
+    :param p_values: p-values of one family of comparisons
+    :return: adjusted p-values in the original order
+    """
+
+    p_values = np.asarray(p_values, dtype=float)
+    m = len(p_values)
+    order = np.argsort(p_values)
+
+    adjusted = m / np.arange(1, m + 1) * p_values[order]
+    adjusted = np.minimum.accumulate(adjusted[::-1])[::-1]
+    res = np.empty(m)
+    res[order] = np.clip(adjusted, 0, 1)
+
+    return res
+
+
+def cal_dunnett_adjusted(z_scores, weights, two_tailed=None, quadrature_nodes=None):
+    """Dunnett single-step adjusted p-values of comparisons with one control
+
+    The z-scores of the comparisons with a shared control are correlated,
+    with correlation $\\lambda_i \\lambda_j$ between comparison $i$ and $j$.
+    Conditional on the control, they are independent, so the probability
+    that the largest z-score stays below $c$ is a one dimensional integral
+    over the control,
+
+    $$
+    \\int \\phi(u) \\prod_i \\Phi\\left(\\frac{c - \\lambda_i u}{\\sqrt{1 - \\lambda_i^2}}\\right) du,
+    $$
+
+    computed with Gauss-Hermite quadrature for all comparisons at once.
+
+    :param z_scores: z-scores of the comparisons
+    :param weights: $\\lambda_i$, e.g., $\\sqrt{n_i / (n_0 + n_i)}$ for
+        sample sizes $n_i$ of the treatments and $n_0$ of the control
+    :param two_tailed: whether the p-values are two tailed, defaults to True
+    :param quadrature_nodes: number of Gauss-Hermite nodes, defaults to 96
+    :return: adjusted p-values
+    """
+
+    if two_tailed is None:
+        two_tailed = True
+    if quadrature_nodes is None:
+        quadrature_nodes = 96
+
+    z_scores = np.asarray(z_scores, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+
+    nodes, node_weights = np.polynomial.hermite_e.hermegauss(quadrature_nodes)
+    node_weights = node_weights / np.sqrt(2 * np.pi)
+
+    # axes: critical value, comparison, node
+    critical = np.abs(z_scores) if two_tailed else z_scores
+    critical = critical[:, None, None]
+    shift = weights[None, :, None] * nodes[None, None, :]
+    scale = np.sqrt(1 - weights**2)[None, :, None]
+
+    below = norm_cdf((critical - shift) / scale)
+    if two_tailed:
+        below = below - norm_cdf((-critical - shift) / scale)
+
+    no_rejection = np.prod(below, axis=1) @ node_weights
+
+    return np.clip(1 - no_rejection, 0, 1)
+
+
+class ABTestMultiArm(ABTestReport):
+    """A/B/n test of conversion rates of k arms
+
+    All comparisons are computed at once on arrays of pairs of arms, either
+    each treatment against the control or all pairs. Each comparison is a
+    two-proportion z-test of the difference of the conversion rates with the
+    pooled standard error, and the p-values of the family are corrected with
+    `"holm"`, `"bh"` (Benjamini-Hochberg) or `"dunnett"`.
+
+    ```python
+    multi_arm = ABTestMultiArm(
+        {
+            "total": [17207, 17198, 17250, 17190],
+            "converted": [43, 68, 51, 60],
+        },
+        arm_names=["control", "red", "green", "blue"],
+    )
+    multi_arm.to_frame()
+    ```
+
+    :param ab_test_data: `total` and `converted` of each arm, as a dict of
+        arrays or a DataFrame with one row per arm
+    :param arm_names: names of the arms, defaults to the index of the DataFrame
+        or the positions of the arms
+    :param control: position of the control arm, defaults to 0
+    :param comparisons: `"control"` or `"pairwise"`, defaults to `"control"`
+    :param correction: `"holm"`, `"bh"`, `"dunnett"` or `"none"`, defaults to `"holm"`
+    :param two_tailed: whether the p-values are two tailed, defaults to True.
+        One tailed p-values test whether the second arm of a pair converts better.
+    :param significance_level: significance level of the corrected p-values,
+        defaults to 0.05
+    :param test_name: name of the test
+    """
+
+    report_metrics = {
+        "kpi": "conversion_rate",
+        "uplift": "conversion_uplift",
+        "pooled_std_err": "pooled_std_err",
+        "z_score": "z_score",
+        "p_value": "p_value",
+        "adjusted_p_value": "adjusted_p_value",
+        "significant": "significant",
+    }
+
+    def __init__(
+        self,
+        ab_test_data,
+        arm_names=None,
+        control=None,
+        comparisons=None,
+        correction=None,
+        two_tailed=None,
+        significance_level=None,
+        test_name=None,
+    ):
+
+        if control is None:
+            control = 0
+        if comparisons is None:
+            comparisons = "control"
+        if correction is None:
+            correction = "holm"
+        if two_tailed is None:
+            two_tailed = True
+        if significance_level is None:
+            significance_level = 0.05
+        if comparisons not in ("control", "pairwise"):
+            raise Exception(f"comparisons should be control or pairwise: {comparisons}")
+        if correction not in ("holm", "bh", "dunnett", "none"):
+            raise Exception(
+                f"correction should be holm, bh, dunnett or none: {correction}"
+            )
+        if correction == "dunnett" and comparisons != "control":
+            raise Exception("dunnett correction requires comparisons with the control")
+
+        self.data = ab_test_data
+        self.total = np.asarray(ab_test_data.get("total"), dtype=float)
+        self.converted = np.asarray(ab_test_data.get("converted"), dtype=float)
+        self.control = control
+        self.comparisons = comparisons
+        self.correction = correction
+        self.two_tailed = two_tailed
+        self.significance_level = significance_level
+        self.name = test_name
+
+        if arm_names is not None:
+            self.arm_names = np.asarray(arm_names)
+        elif isinstance(ab_test_data, pd.DataFrame):
+            self.arm_names = ab_test_data.index.to_numpy()
+        else:
+            self.arm_names = np.arange(len(self.total))
+
+        k = len(self.total)
+        if comparisons == "control":
+            self.A_index = np.full(k - 1, control)
+            self.B_index = np.delete(np.arange(k), control)
+        else:
+            self.A_index, self.B_index = np.triu_indices(k, 1)
+
+    @metric()
+    def conversion_rate(self):
+        """Conversion rates of all arms"""
+
+        self.cr = cal_conversion_rate(self.total, self.converted)
+
+        return self.cr
+
+    @metric("conversion_rate")
+    def conversion_uplift(self):
+        """Relative uplift of the second arm over the first arm of each comparison"""
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.uplift = (self.cr[self.B_index] - self.cr[self.A_index]) / self.cr[
+                self.A_index
+            ]
+
+        return self.uplift
+
+    @metric()
+    def pooled_std_err(self):
+        """Pooled standard errors of the differences of all comparisons"""
+
+        A_total, B_total = self.total[self.A_index], self.total[self.B_index]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            probability = cal_pooled_probability(
+                A_total,
+                B_total,
+                self.converted[self.A_index],
+                self.converted[self.B_index],
+            )
+            self.pld_std_err = cal_pooled_std_err(probability, A_total, B_total)
+
+        return self.pld_std_err
+
+    @metric("conversion_rate", "pooled_std_err")
+    def z_score(self):
+        """z-scores of the differences of the conversion rates of all comparisons"""
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.z = (self.cr[self.B_index] - self.cr[self.A_index]) / self.pld_std_err
+
+        return self.z
+
+    @metric("z_score")
+    def p_value(self):
+        """Uncorrected p-values of all comparisons"""
+
+        if self.two_tailed:
+            self.p = 2 * norm_sf(np.abs(self.z))
+        else:
+            self.p = norm_sf(self.z)
+
+        return self.p
+
+    @metric("p_value")
+    def adjusted_p_value(self):
+        """p-values of all comparisons, corrected for multiple comparisons"""
+
+        if self.correction == "holm":
+            self.adjusted_p = cal_holm_adjusted(self.p)
+        elif self.correction == "bh":
+            self.adjusted_p = cal_benjamini_hochberg_adjusted(self.p)
+        elif self.correction == "dunnett":
+            control_total = self.total[self.control]
+            treatment_total = self.total[self.B_index]
+            self.adjusted_p = cal_dunnett_adjusted(
+                self.z,
+                np.sqrt(treatment_total / (control_total + treatment_total)),
+                two_tailed=self.two_tailed,
+            )
+        else:
+            self.adjusted_p = self.p
+
+        return self.adjusted_p
+
+    @metric("adjusted_p_value")
+    def significant(self):
+        """Whether the corrected p-values are below the significance level"""
+
+        return self.adjusted_p < self.significance_level
+
+    def to_frame(self):
+        """Report as a DataFrame with one row per comparison"""
+
+        res = self.report(with_data=False)
+
+        dataframe = pd.DataFrame(
+            {
+                "arm_a": self.arm_names[self.A_index],
+                "arm_b": self.arm_names[self.B_index],
+                "kpi_a": res["kpi"][self.A_index],
+                "kpi_b": res["kpi"][self.B_index],
+                "uplift": res["uplift"],
+                "pooled_std_err": res["pooled_std_err"],
+                "z_score": res["z_score"],
+                "p_value": res["p_value"],
+                "adjusted_p_value": res["adjusted_p_value"],
+                "significant": res["significant"],
+            }
+        )
+
+        return dataframe
+
+
+if __name__ == "__main__":
+
+    import time
+
+    total = np.random.randint(10000, 20000, size=20)
+    converted = np.random.binomial(total, np.linspace(0.003, 0.004, 20))
+
+    for comparisons, correction in [
+        ("control", "dunnett"),
+        ("control", "holm"),
+        ("pairwise", "bh"),
+    ]:
+        start = time.perf_counter()
+        res = ABTestMultiArm(
+            {"total": total, "converted": converted},
+            comparisons=comparisons,
+            correction=correction,
+        ).to_frame()
+        print(
+            f"{len(res)} comparisons with {correction}: "
+            f"{time.perf_counter() - start:.3f}s"
+        )
+    print(res.sort_values("adjusted_p_value").head())
+
+    print("END")
@@ -0,0 +1,210 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+
+def get_n_jobs(n_jobs=None):
+    """Number of worker processes
+
+    :param n_jobs: requested number of processes, `None` or `-1` for all CPUs
+    :rtype: int
+    """
+
+    if n_jobs is None or n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+
+    return max(1, int(n_jobs))
+
+
+def spawn_seeds(seed, n_seeds):
+    """Independent seeds for blocks of random work
+
+    The seeds only depend on `seed` and the position of the block, so results
+    are reproducible regardless of how the blocks are distributed over
+    processes.
+
+    :param seed: root seed
+    :param n_seeds: number of seeds
+    :return: list of `np.random.SeedSequence`
+    """
+
+    return np.random.SeedSequence(seed).spawn(n_seeds)
+
+
+def map_in_pool(func, tasks, n_jobs=None, initializer=None, initargs=None):
+    """Apply a function to tasks in a process pool
+
+    `func` and `initializer` have to be importable module level functions.
+    The initializer is run once in each worker, e.g., to set the data shared
+    by all tasks, so the data is sent once per worker and not once per task.
+    With `n_jobs=1`, everything runs in the current process.
+
+    :param func: function applied to each task
+    :param tasks: list of tasks
+    :param n_jobs: number of processes, defaults to all CPUs
+    :param initializer: function run in each worker before the tasks
+    :param initargs: arguments of the initializer
+    :return: results in the order of the tasks
+    :rtype: list
+    """
+
+    if initargs is None:
+        initargs = ()
+
+    tasks = list(tasks)
+    n_jobs = min(get_n_jobs(n_jobs), max(1, len(tasks)))
+
+    if n_jobs == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return [func(task) for task in tasks]
+
+    with ProcessPoolExecutor(
+        max_workers=n_jobs, initializer=initializer, initargs=initargs
+    ) as executor:
+        return list(
+            executor.map(func, tasks, chunksize=max(1, len(tasks) // (4 * n_jobs)))
+        )
+
+
+def imap_in_pool(func, tasks, n_jobs=None, initializer=None, initargs=None):
+    """Lazily apply a function to tasks in a process pool
+
+    Like `map_in_pool`, but the results are yielded one by one in the order of
+    the tasks and only about two tasks per process are submitted ahead. If
+    the consumer stops iterating, e.g., for early stopping, the remaining
+    tasks are never run.
+
+    :param func: function applied to each task
+    :param tasks: iterable of tasks
+    :param n_jobs: number of processes, defaults to all CPUs
+    :param initializer: function run in each worker before the tasks
+    :param initargs: arguments of the initializer
+    :return: generator of results
+    """
+
+    if initargs is None:
+        initargs = ()
+
+    n_jobs = get_n_jobs(n_jobs)
+    tasks = iter(tasks)
+
+    if n_jobs == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for task in tasks:
+            yield func(task)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=n_jobs, initializer=initializer, initargs=initargs
+    ) as executor:
+        pending = deque(
+            executor.submit(func, task) for task in islice(tasks, 2 * n_jobs)
+        )
+        try:
+            while pending:
+                result = pending.popleft().result()
+                for task in islice(tasks, 1):
+                    pending.append(executor.submit(func, task))
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class SharedArray:
+    """NumPy array in shared memory for worker processes
+
+    The array is copied once into a `multiprocessing.shared_memory` block.
+    Workers attach to it with `attach_shared_array(shared.descriptor)` and
+    get a zero-copy view, so the data is never pickled.
+
+    ```python
+    with SharedArray(series) as shared:
+        results = map_in_pool(
+            func, tasks, initializer=init_worker, initargs=(shared.descriptor,)
+        )
+    ```
+
+    Without `array`, an uninitialized shared array of `shape` and `dtype` is
+    created, which can be filled in place to avoid a temporary copy.
+
+    :param array: array to share
+    :param shape: shape of the array if no array is given
+    :param dtype: dtype of the array if no array is given
+    """
+
+    def __init__(self, array=None, shape=None, dtype=None):
+        from multiprocessing import shared_memory
+
+        if array is not None:
+            array = np.asarray(array)
+            shape, dtype = array.shape, array.dtype
+        dtype = np.dtype(dtype)
+
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        if array is not None:
+            self.array[...] = array
+
+    @property
+    def descriptor(self):
+        """Name, shape and dtype of the shared array, which can be pickled"""
+
+        return self.shm.name, self.array.shape, self.array.dtype.str
+
+    def close(self):
+        """Release and remove the shared memory block"""
+
+        del self.array
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def attach_shared_array(descriptor):
+    """Zero-copy view of a `SharedArray` in another process
+
+    The returned shared memory object has to be kept alive as long as the
+    array is used.
+
+    :param descriptor: `SharedArray.descriptor`
+    :return: shared memory object and array
+    :rtype: tuple
+    """
+
+    from multiprocessing import resource_tracker, shared_memory
+
+    name, shape, dtype = descriptor
+    try:
+        # the creating process owns the block, see SharedArray.close
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13, attaching registers the block with the resource
+        # tracker of this process, which unlinks it when this process exits.
+        # Unregistering afterwards would also drop the registration of the
+        # creating process when both share a tracker, as pool workers do, so
+        # the registration is skipped instead.
+        register = resource_tracker.register
+
+        def _register(name, rtype):
+            if rtype != "shared_memory":
+                register(name, rtype)
+
+        resource_tracker.register = _register
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
@@ -0,0 +1,207 @@
+import numpy as np
+import scipy.stats as scs
+from dietbox.abtest.parallel import (
+    SharedArray,
+    attach_shared_array,
+    get_n_jobs,
+    imap_in_pool,
+    spawn_seeds,
+)
+from dietbox.abtest.stats_util import cal_series_kpi
+
+# concatenated series and test settings, set once per worker process
+_worker_data = {}
+
+
+def _init_worker(values, A_total, kpi_method):
+    if isinstance(values, tuple):
+        # keep the shared memory object alive together with its view
+        _worker_data["shm"], values = attach_shared_array(values)
+
+    _worker_data["values"] = values
+    _worker_data["sum"] = values.sum()
+    _worker_data["non_zero"] = np.count_nonzero(values)
+    _worker_data["A_total"] = A_total
+    _worker_data["kpi_method"] = kpi_method
+
+
+def cal_kpi_difference(
+    A_total, A_sum, A_non_zero, B_total, B_sum, B_non_zero, kpi_method
+):
+    """Difference of the KPIs of group B and group A"""
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return cal_series_kpi(B_total, B_sum, B_non_zero, kpi_method) - cal_series_kpi(
+            A_total, A_sum, A_non_zero, kpi_method
+        )
+
+
+def _permutation_block(task):
+    """KPI differences of one block of permutations"""
+
+    seed, size = task
+    values = _worker_data["values"]
+    A_total = _worker_data["A_total"]
+    total = len(values)
+
+    rng = np.random.default_rng(seed)
+    A_index = rng.permuted(np.broadcast_to(np.arange(total), (size, total)), axis=1)[
+        :, :A_total
+    ]
+
+    A_values = values[A_index]
+    A_sum = A_values.sum(axis=1)
+    A_non_zero = np.count_nonzero(A_values, axis=1)
+
+    return cal_kpi_difference(
+        A_total,
+        A_sum,
+        A_non_zero,
+        total - A_total,
+        _worker_data["sum"] - A_sum,
+        _worker_data["non_zero"] - A_non_zero,
+        _worker_data["kpi_method"],
+    )
+
+
+def cal_permutation_test(
+    A_series,
+    B_series,
+    kpi_method=None,
+    n_permutations=None,
+    alternative=None,
+    significance_level=None,
+    early_stopping=None,
+    n_jobs=None,
+    seed=None,
+    max_block_bytes=None,
+):
+    """Permutation test of the difference of the KPIs of two series
+
+    The concatenated series are put once into a shared memory buffer, which
+    all worker processes read without copies. Permutations are generated in
+    vectorized blocks of index arrays, each block with its own seed spawned
+    from `seed`, and the blocks are spread over the processes.
+
+    With early stopping, the test stops as soon as the Clopper-Pearson
+    interval of the p-value at level `1 - early_stopping` lies entirely above
+    or below the significance level.
+
+    :param A_series: series of group A
+    :param B_series: series of group B
+    :param kpi_method: kpi method of `ABTestSeries`, defaults to `"sum"`
+    :param n_permutations: maximum number of permutations, defaults to 10000
+    :param alternative: `"two-sided"`, `"less"` or `"greater"` for the
+        difference B - A, defaults to `"two-sided"`
+    :param significance_level: significance level for early stopping, defaults to 0.05
+    :param early_stopping: error probability of early stopping, `0` to
+        disable it, defaults to 0.001
+    :param n_jobs: number of processes, defaults to all CPUs
+    :param seed: seed of the permutations, defaults to 42
+    :param max_block_bytes: memory bound of one block of permutations, defaults to 64 MB
+    :return: p-value, observed difference and number of permutations used
+    :rtype: dict
+    """
+
+    if kpi_method is None:
+        kpi_method = "sum"
+    if n_permutations is None:
+        n_permutations = 10000
+    if alternative is None:
+        alternative = "two-sided"
+    if significance_level is None:
+        significance_level = 0.05
+    if early_stopping is None:
+        early_stopping = 0.001
+    if seed is None:
+        seed = 42
+    if max_block_bytes is None:
+        max_block_bytes = 2**26
+    if alternative not in ("two-sided", "less", "greater"):
+        raise Exception(
+            f"alternative should be two-sided, less or greater: {alternative}"
+        )
+
+    A_series = np.asarray(A_series, dtype=float)
+    B_series = np.asarray(B_series, dtype=float)
+    A_total, B_total = len(A_series), len(B_series)
+    values = np.concatenate([A_series, B_series])
+
+    observed = cal_kpi_difference(
+        A_total,
+        A_series.sum(),
+        np.count_nonzero(A_series),
+        B_total,
+        B_series.sum(),
+        np.count_nonzero(B_series),
+        kpi_method,
+    )
+
+    block_size = int(max(1, min(n_permutations, max_block_bytes // (16 * len(values)))))
+    block_sizes = [block_size] * (n_permutations // block_size)
+    if n_permutations % block_size:
+        block_sizes.append(n_permutations % block_size)
+    tasks = zip(spawn_seeds(seed, len(block_sizes)), block_sizes)
+
+    n_jobs = get_n_jobs(n_jobs)
+    shared = SharedArray(values) if n_jobs > 1 else None
+    try:
+        blocks = imap_in_pool(
+            _permutation_block,
+            tasks,
+            n_jobs=n_jobs,
+            initializer=_init_worker,
+            initargs=(
+                shared.descriptor if shared else values,
+                A_total,
+                kpi_method,
+            ),
+        )
+
+        extreme, used = 0, 0
+        for differences in blocks:
+            if alternative == "greater":
+                extreme += np.count_nonzero(differences >= observed)
+            elif alternative == "less":
+                extreme += np.count_nonzero(differences <= observed)
+            else:
+                extreme += np.count_nonzero(np.abs(differences) >= np.abs(observed))
+            used += len(differences)
+
+            if early_stopping and used < n_permutations:
+                lower = np.nan_to_num(
+                    scs.beta.ppf(early_stopping / 2, extreme, used - extreme + 1),
+                    nan=0.0,
+                )
+                upper = np.nan_to_num(
+                    scs.beta.ppf(1 - early_stopping / 2, extreme + 1, used - extreme),
+                    nan=1.0,
+                )
+                if lower > significance_level or upper < significance_level:
+                    blocks.close()
+                    break
+    finally:
+        _worker_data.clear()
+        if shared is not None:
+            shared.close()
+
+    return {
+        "p_value": (extreme + 1) / (used + 1),
+        "difference": observed,
+        "n_permutations": used,
+    }
+
+
+if __name__ == "__main__":
+
+    import time
+
+    rng = np.random.default_rng(42)
+    A_series = rng.binomial(1, 0.03, size=100_000) * rng.lognormal(3, 1.5, size=100_000)
+    B_series = rng.binomial(1, 0.03, size=100_000) * rng.lognormal(3, 1.5, size=100_000)
+
+    start = time.perf_counter()
+    print(cal_permutation_test(A_series, B_series, kpi_method="all_avg"))
+    print(f"{time.perf_counter() - start:.3f}s")
+
+    print("END")
@@ -0,0 +1,241 @@
+import numpy as np
+import pandas as pd
+from dietbox.abtest.normal import norm_ppf, norm_sf
+from dietbox.abtest.stats_util import cal_z_score
+
+
+def _cal_treatment_rate(baseline_rate, minimum_detectable_effect, relative):
+    """Conversion rate of group B for a given effect"""
+
+    minimum_detectable_effect = np.asarray(minimum_detectable_effect, dtype=float)
+
+    if relative:
+        return baseline_rate * (1 + minimum_detectable_effect)
+
+    return baseline_rate + minimum_detectable_effect
+
+
+def _cal_standard_errors(A_rate, B_rate, ratio):
+    """Standard errors of the difference of the rates for one sample in group A
+
+    The error under the null hypothesis uses the pooled rate, as in
+    `cal_pooled_std_err`, the error under the alternative uses the rates of
+    both groups.
+    """
+
+    pooled_rate = (A_rate + ratio * B_rate) / (1 + ratio)
+    null_std_err = np.sqrt(pooled_rate * (1 - pooled_rate) * (1 + 1 / ratio))
+    alt_std_err = np.sqrt(A_rate * (1 - A_rate) + B_rate * (1 - B_rate) / ratio)
+
+    return null_std_err, alt_std_err
+
+
+def cal_sample_size(
+    baseline_rate,
+    minimum_detectable_effect,
+    significance_level=None,
+    power=None,
+    two_tailed=None,
+    relative=None,
+    ratio=None,
+):
+    """Sample size of group A needed to detect an effect on a conversion rate
+
+    All parameters can be arrays and are broadcast against each other. The
+    critical value comes from `cal_z_score`, so `two_tailed` has the same
+    meaning. For two tailed tests, the opposite tail is neglected.
+
+    :param baseline_rate: conversion rate of group A
+    :param minimum_detectable_effect: effect to detect
+    :param significance_level: significance level, defaults to 0.05
+    :param power: probability to detect the effect, defaults to 0.8
+    :param two_tailed: whether the test is two tailed, defaults to True
+    :param relative: whether the effect is relative to the baseline rate, defaults to True
+    :param ratio: size of group B divided by the size of group A, defaults to 1
+    :return: sample size of group A, rounded up
+    """
+
+    if significance_level is None:
+        significance_level = 0.05
+    if power is None:
+        power = 0.8
+    if relative is None:
+        relative = True
+    if ratio is None:
+        ratio = 1
+
+    A_rate = np.asarray(baseline_rate, dtype=float)
+    B_rate = _cal_treatment_rate(A_rate, minimum_detectable_effect, relative)
+    null_std_err, alt_std_err = _cal_standard_errors(A_rate, B_rate, ratio)
+
+    z_alpha = cal_z_score(significance_level, two_tailed=two_tailed)
+    z_beta = norm_ppf(power)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sample_size = (
+            (z_alpha * null_std_err + z_beta * alt_std_err) / (B_rate - A_rate)
+        ) ** 2
+
+    return np.ceil(sample_size)[()]
+
+
+def cal_power(
+    baseline_rate,
+    minimum_detectable_effect,
+    sample_size,
+    significance_level=None,
+    two_tailed=None,
+    relative=None,
+    ratio=None,
+):
+    """Power of a test on a conversion rate with a given sample size
+
+    All parameters can be arrays and are broadcast against each other. For
+    two tailed tests, both tails are included.
+
+    :param baseline_rate: conversion rate of group A
+    :param minimum_detectable_effect: effect to detect
+    :param sample_size: sample size of group A
+    :param significance_level: significance level, defaults to 0.05
+    :param two_tailed: whether the test is two tailed, defaults to True
+    :param relative: whether the effect is relative to the baseline rate, defaults to True
+    :param ratio: size of group B divided by the size of group A, defaults to 1
+    :return: power
+    """
+
+    if significance_level is None:
+        significance_level = 0.05
+    if two_tailed is None:
+        two_tailed = True
+    if relative is None:
+        relative = True
+    if ratio is None:
+        ratio = 1
+
+    A_rate = np.asarray(baseline_rate, dtype=float)
+    B_rate = _cal_treatment_rate(A_rate, minimum_detectable_effect, relative)
+    null_std_err, alt_std_err = _cal_standard_errors(A_rate, B_rate, ratio)
+
+    z_alpha = cal_z_score(significance_level, two_tailed=two_tailed)
+    shift = np.abs(B_rate - A_rate) * np.sqrt(sample_size)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        power = norm_sf((z_alpha * null_std_err - shift) / alt_std_err)
+        if two_tailed:
+            power = power + norm_sf((z_alpha * null_std_err + shift) / alt_std_err)
+
+    return power[()]
+
+
+def plan_sample_size(
+    baseline_rate,
+    minimum_detectable_effect,
+    significance_level=None,
+    power=None,
+    daily_traffic=None,
+    two_tailed=None,
+    relative=None,
+    ratio=None,
+):
+    """Sample sizes, achieved powers and durations for a grid of test setups
+
+    The grid is the cartesian product of all given values, so
+
+    ```python
+    plan_sample_size(
+        baseline_rate=[0.01, 0.05],
+        minimum_detectable_effect=np.linspace(0.01, 0.1, 10),
+        significance_level=[0.01, 0.05],
+        power=[0.8, 0.9],
+        daily_traffic=20000,
+    )
+    ```
+
+    returns 80 rows, all computed at once.
+
+    :param baseline_rate: conversion rates of group A
+    :param minimum_detectable_effect: effects to detect
+    :param significance_level: significance levels, defaults to 0.05
+    :param power: powers, defaults to 0.8
+    :param daily_traffic: daily samples of both groups together, for the duration
+    :param two_tailed: whether the tests are two tailed, defaults to True
+    :param relative: whether the effects are relative to the baseline rates, defaults to True
+    :param ratio: size of group B divided by the size of group A, defaults to 1
+    :return: one row per point of the grid
+    :rtype: pandas.DataFrame
+    """
+
+    if significance_level is None:
+        significance_level = 0.05
+    if power is None:
+        power = 0.8
+    if relative is None:
+        relative = True
+    if ratio is None:
+        ratio = 1
+
+    grid = {
+        "baseline_rate": baseline_rate,
+        "minimum_detectable_effect": minimum_detectable_effect,
+        "significance_level": significance_level,
+        "power": power,
+    }
+    if daily_traffic is not None:
+        grid["daily_traffic"] = daily_traffic
+
+    axes = np.meshgrid(
+        *(np.atleast_1d(np.asarray(v, dtype=float)) for v in grid.values()),
+        indexing="ij",
+    )
+    dataframe = pd.DataFrame({k: v.ravel() for k, v in zip(grid, axes)})
+
+    dataframe["treatment_rate"] = _cal_treatment_rate(
+        dataframe.baseline_rate.to_numpy(),
+        dataframe.minimum_detectable_effect.to_numpy(),
+        relative=relative,
+    )
+    sample_size_a = cal_sample_size(
+        dataframe.baseline_rate.to_numpy(),
+        dataframe.minimum_detectable_effect.to_numpy(),
+        significance_level=dataframe.significance_level.to_numpy(),
+        power=dataframe.power.to_numpy(),
+        two_tailed=two_tailed,
+        relative=relative,
+        ratio=ratio,
+    )
+    dataframe["sample_size_a"] = sample_size_a
+    dataframe["sample_size_b"] = np.ceil(ratio * sample_size_a)
+    dataframe["total_sample_size"] = dataframe.sample_size_a + dataframe.sample_size_b
+    dataframe["achieved_power"] = cal_power(
+        dataframe.baseline_rate.to_numpy(),
+        dataframe.minimum_detectable_effect.to_numpy(),
+        sample_size_a,
+        significance_level=dataframe.significance_level.to_numpy(),
+        two_tailed=two_tailed,
+        relative=relative,
+        ratio=ratio,
+    )
+    if daily_traffic is not None:
+        dataframe["duration_days"] = np.ceil(
+            dataframe.total_sample_size / dataframe.daily_traffic
+        )
+
+    return dataframe
+
+
+if __name__ == "__main__":
+
+    import time
+
+    start = time.perf_counter()
+    plan = plan_sample_size(
+        baseline_rate=np.linspace(0.001, 0.2, 200),
+        minimum_detectable_effect=np.linspace(0.01, 0.2, 100),
+        significance_level=[0.01, 0.05, 0.1],
+        power=[0.8, 0.9],
+        daily_traffic=[10_000, 100_000],
+    )
+    print(f"{len(plan)} setups in {time.perf_counter() - start:.3f}s")
+    print(plan.head())
+
+    print("END")
@@ -0,0 +1,318 @@
+import numpy as np
+import scipy.stats as scs
+from dietbox.abtest.normal import norm_sf
+
+
+def _as_numeric(series):
+    """Array of a series, with booleans viewed as 0 and 1 without a copy"""
+
+    series = np.asarray(series)
+    if series.dtype == bool:
+        return series.view(np.uint8)
+
+    return series
+
+
+def is_low_cardinality_integer(series, max_cardinality=None):
+    """Check if a series only holds integers within a small range
+
+    Binary and small integer KPIs are low cardinality, so their value counts
+    can be computed with `np.bincount` in O(n + k) instead of sorting.
+
+    :param series: input array
+    :param max_cardinality: maximum range of the values, defaults to 2**20
+    :rtype: bool
+    """
+
+    if max_cardinality is None:
+        max_cardinality = 2**20
+
+    series = _as_numeric(series)
+    if series.size == 0 or series.dtype.kind not in "iuf":
+        return False
+
+    lowest, highest = np.min(series), np.max(series)
+    if not (np.isfinite(lowest) and np.isfinite(highest)):
+        return False
+    if highest - lowest >= max_cardinality:
+        return False
+    if series.dtype.kind == "f" and not np.all(np.floor(series) == series):
+        return False
+
+    return True
+
+
+def cal_value_counts(series, max_cardinality=None):
+    """Sorted distinct values and their counts
+
+    Low cardinality integer data is counted with `np.bincount` in O(n + k),
+    other data with `np.unique`. Booleans are counted as the values 0 and 1.
+
+    :param series: input array
+    :param max_cardinality: maximum range of values counted with `np.bincount`,
+        defaults to 2**20
+    :return: values and counts
+    :rtype: tuple
+    """
+
+    series = _as_numeric(series)
+
+    if is_low_cardinality_integer(series, max_cardinality=max_cardinality):
+        lowest = np.min(series)
+        counts = np.bincount((series - lowest).astype(np.int64))
+        values = np.flatnonzero(counts)
+
+        return (values + lowest).astype(series.dtype), counts[values]
+
+    return np.unique(series, return_counts=True)
+
+
+def merge_value_counts(*value_counts):
+    """Merge several (values, counts) pairs into one
+
+    :param value_counts: pairs of values and counts, e.g., histograms of chunks
+    :return: values and counts
+    :rtype: tuple
+    """
+
+    values = np.concatenate([np.asarray(v) for v, _ in value_counts])
+    counts = np.concatenate([np.asarray(c) for _, c in value_counts])
+
+    values, inverse = np.unique(values, return_inverse=True)
+    counts = np.bincount(inverse.ravel(), weights=counts, minlength=len(values))
+
+    return values, counts.astype(np.int64)
+
+
+def cal_mannwhitneyu_from_counts(
+    A_values, A_counts, B_values, B_counts, alternative=None, use_continuity=None
+):
+    """Mann-Whitney U test from the value counts of both groups
+
+    Ties get mid ranks and the variance of U is tie corrected, so the result
+    is the same as `scipy.stats.mannwhitneyu(A, B, method="asymptotic")` on
+    the raw data, in O(k) for k distinct values.
+
+    :param A_values: distinct values of group A
+    :param A_counts: counts of the values of group A
+    :param B_values: distinct values of group B
+    :param B_counts: counts of the values of group B
+    :param alternative: `"two-sided"`, `"less"` or `"greater"`, defaults to `"two-sided"`
+    :param use_continuity: whether to apply the continuity correction, defaults to True
+    :return: U statistic of group A and p-value
+    :rtype: tuple
+    """
+
+    if alternative is None:
+        alternative = "two-sided"
+    if use_continuity is None:
+        use_continuity = True
+    if alternative not in ("two-sided", "less", "greater"):
+        raise Exception(
+            f"alternative should be two-sided, less or greater: {alternative}"
+        )
+
+    values, inverse = np.unique(
+        np.concatenate([np.asarray(A_values), np.asarray(B_values)]),
+        return_inverse=True,
+    )
+    inverse = inverse.ravel()
+    n_A_values = len(A_values)
+    A_counts = np.bincount(
+        inverse[:n_A_values], weights=A_counts, minlength=len(values)
+    )
+    B_counts = np.bincount(
+        inverse[n_A_values:], weights=B_counts, minlength=len(values)
+    )
+
+    n_A, n_B = A_counts.sum(), B_counts.sum()
+    n = n_A + n_B
+    tie_counts = A_counts + B_counts
+
+    # mid ranks of the distinct values
+    ranks = np.cumsum(tie_counts) - (tie_counts - 1) / 2
+    U_A = np.dot(A_counts, ranks) - n_A * (n_A + 1) / 2
+
+    if alternative == "greater":
+        U = U_A
+    elif alternative == "less":
+        U = n_A * n_B - U_A
+    else:
+        U = max(U_A, n_A * n_B - U_A)
+
+    tie_term = np.sum(tie_counts**3 - tie_counts)
+    std = np.sqrt(n_A * n_B / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+
+    numerator = U - n_A * n_B / 2
+    if use_continuity:
+        numerator -= 0.5
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p_value = norm_sf(numerator / std)
+    if alternative == "two-sided":
+        p_value *= 2
+
+    return U_A, float(np.clip(p_value, 0, 1))
+
+
+class MannWhitneyCounts:
+    """Value counts of both groups for the Mann-Whitney U test
+
+    Chunks of raw data or pre-aggregated histograms are added to the counts,
+    so the raw series never have to be in memory at once. Memory is O(k) for
+    k distinct values.
+
+    ```python
+    mw = MannWhitneyCounts()
+    for A_chunk, B_chunk in chunks:
+        mw.update(A_chunk, B_chunk)
+
+    U, p_value = mw.test()
+    ```
+
+    :param max_cardinality: maximum range of integer values counted with
+        `np.bincount`, defaults to 2**20
+    """
+
+    def __init__(self, max_cardinality=None):
+
+        self.max_cardinality = max_cardinality
+        self.A_values, self.A_counts = np.array([]), np.array([], dtype=np.int64)
+        self.B_values, self.B_counts = np.array([]), np.array([], dtype=np.int64)
+
+    def update_counts(self, group, values, counts):
+        """Add a histogram of one group
+
+        :param group: `"A"` or `"B"`
+        :param values: distinct values
+        :param counts: counts of the values
+        :return: the counts object itself
+        """
+
+        group = str(group).upper()
+        if group not in ("A", "B"):
+            raise Exception(f"Group should be A or B, got {group}")
+
+        merged = merge_value_counts(
+            (getattr(self, f"{group}_values"), getattr(self, f"{group}_counts")),
+            (values, counts),
+        )
+        setattr(self, f"{group}_values", merged[0])
+        setattr(self, f"{group}_counts", merged[1])
+
+        return self
+
+    def update(self, A_chunk=None, B_chunk=None):
+        """Add chunks of raw data of one or both groups
+
+        :return: the counts object itself
+        """
+
+        if A_chunk is not None:
+            self.update_counts(
+                "A", *cal_value_counts(A_chunk, max_cardinality=self.max_cardinality)
+            )
+        if B_chunk is not None:
+            self.update_counts(
+                "B", *cal_value_counts(B_chunk, max_cardinality=self.max_cardinality)
+            )
+
+        return self
+
+    def merge(self, other):
+        """Add the counts of another `MannWhitneyCounts`, e.g., from another worker"""
+
+        self.update_counts("A", other.A_values, other.A_counts)
+        self.update_counts("B", other.B_values, other.B_counts)
+
+        return self
+
+    def test(self, alternative=None, use_continuity=None):
+        """Mann-Whitney U test on the counts
+
+        :return: U statistic of group A and p-value
+        :rtype: tuple
+        """
+
+        return cal_mannwhitneyu_from_counts(
+            self.A_values,
+            self.A_counts,
+            self.B_values,
+            self.B_counts,
+            alternative=alternative,
+            use_continuity=use_continuity,
+        )
+
+
+def cal_mannwhitneyu(A_data, B_data, alternative=None, use_continuity=None):
+    """Mann-Whitney U test for arrays, histograms or chunked iterators
+
+    Each input can be
+
+    - an array; low cardinality integer arrays are counted in O(n + k),
+      other arrays are passed to `scipy.stats.mannwhitneyu`,
+    - a `(values, counts)` tuple of a histogram,
+    - an iterator of array chunks, which are counted chunk by chunk.
+
+    Small in-memory samples, where scipy may use the exact distribution, are
+    always passed to `scipy.stats.mannwhitneyu`.
+
+    :param A_data: data of group A
+    :param B_data: data of group B
+    :param alternative: `"two-sided"`, `"less"` or `"greater"`, defaults to `"two-sided"`
+    :param use_continuity: whether to apply the continuity correction, defaults to True
+    :return: U statistic of group A and p-value
+    :rtype: tuple
+    """
+
+    if alternative is None:
+        alternative = "two-sided"
+    if use_continuity is None:
+        use_continuity = True
+
+    is_array = [
+        isinstance(d, (np.ndarray, list)) or hasattr(d, "__array__")
+        for d in (A_data, B_data)
+    ]
+    if all(is_array):
+        A_data, B_data = np.asarray(A_data), np.asarray(B_data)
+        if (
+            min(len(A_data), len(B_data)) <= 8
+            or not is_low_cardinality_integer(A_data)
+            or not is_low_cardinality_integer(B_data)
+        ):
+            res = scs.mannwhitneyu(
+                A_data, B_data, use_continuity=use_continuity, alternative=alternative
+            )
+
+            return res.statistic, res.pvalue
+
+    counts = MannWhitneyCounts()
+    for group, data, array in zip("AB", (A_data, B_data), is_array):
+        if array:
+            counts.update_counts(group, *cal_value_counts(data))
+        elif isinstance(data, tuple):
+            counts.update_counts(group, *data)
+        else:
+            for chunk in data:
+                counts.update_counts(group, *cal_value_counts(chunk))
+
+    return counts.test(alternative=alternative, use_continuity=use_continuity)
+
+
+if __name__ == "__main__":
+
+    import time
+
+    A_series = np.random.choice([1, 0], size=(10_000_000,), p=[0.07, 1 - 0.07])
+    B_series = np.random.choice([1, 0], size=(10_000_000,), p=[0.071, 1 - 0.071])
+
+    start = time.perf_counter()
+    print(cal_mannwhitneyu(A_series, B_series))
+    print(f"counts: {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    print(scs.mannwhitneyu(A_series, B_series))
+    print(f"scipy: {time.perf_counter() - start:.3f}s")
+
+    print("END")
@@ -0,0 +1,255 @@
+import numpy as np
+import pandas as pd
+from dietbox.abtest.moments import MomentsAccumulator, cal_moments
+from dietbox.abtest.normal import norm_sf
+from dietbox.abtest.stats import ABTestReport, metric
+
+
+def cal_delta_method_ratio(moments):
+    """Ratio of sums and its delta method standard error
+
+    For units with numerators $Y_i$ and denominators $X_i$, the ratio is
+    $R = \\bar Y / \\bar X$ and its variance is approximately
+
+    $$
+    \\frac{1}{n \\bar X^2} \\left( Var(Y) - 2 R Cov(Y, X) + R^2 Var(X) \\right).
+    $$
+
+    :param moments: `MomentsAccumulator` of the numerators as the series and
+        the denominators as the covariate
+    :return: ratio and standard error
+    :rtype: tuple
+    """
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = moments.mean / moments.covariate_mean
+        variance = (
+            moments.variance
+            - 2 * ratio * moments.covariance
+            + ratio**2 * moments.covariate_variance
+        ) / (moments.total * moments.covariate_mean**2)
+
+    return ratio, np.sqrt(max(variance, 0))
+
+
+def _pad(array, size):
+    return np.pad(array, (0, size - len(array)))
+
+
+def _dense_to_frame(numerator, denominator, rows):
+    units = np.flatnonzero(rows)
+
+    return pd.DataFrame(
+        {"numerator": numerator[units], "denominator": denominator[units]},
+        index=units,
+    )
+
+
+def cal_unit_totals(chunks, max_dense_id=None):
+    """Numerator and denominator of each unit from chunks of event rows
+
+    Each chunk holds the unit ids, numerators and denominators of some rows,
+    e.g., sessions, and a unit can appear in many chunks. Chunks are reduced
+    to per unit sums one by one, so memory grows with the number of units
+    and not with the number of rows.
+
+    Non-negative integer ids below `max_dense_id` are summed into dense
+    arrays with `np.bincount`. Other ids are summed with pandas, which is
+    several times slower.
+
+    :param chunks: iterable of `(unit_ids, numerators, denominators)`
+    :param max_dense_id: largest integer id summed into dense arrays,
+        defaults to 2**26
+    :return: unit ids, numerators and denominators of the units
+    :rtype: tuple
+    """
+
+    if max_dense_id is None:
+        max_dense_id = 2**26
+
+    numerator, denominator, rows = np.zeros(0), np.zeros(0), np.zeros(0, dtype=int)
+    totals = None
+    for unit_ids, numerators, denominators in chunks:
+        unit_ids = np.asarray(unit_ids)
+        numerators = np.asarray(numerators, dtype=float)
+        denominators = np.asarray(denominators, dtype=float)
+        if not len(unit_ids):
+            continue
+
+        dense = (
+            totals is None
+            and unit_ids.dtype.kind in "iu"
+            and unit_ids.min() >= 0
+            and unit_ids.max() <= max_dense_id
+        )
+        if dense:
+            size = max(len(rows), int(unit_ids.max()) + 1)
+            numerator = np.bincount(unit_ids, numerators, size) + _pad(numerator, size)
+            denominator = np.bincount(unit_ids, denominators, size) + _pad(
+                denominator, size
+            )
+            rows = np.bincount(unit_ids, minlength=size) + _pad(rows, size)
+            continue
+
+        if totals is None:
+            totals = _dense_to_frame(numerator, denominator, rows)
+        chunk = pd.DataFrame(
+            {"numerator": numerators, "denominator": denominators}, index=unit_ids
+        )
+        chunk = chunk.groupby(level=0, sort=False).sum()
+        totals = totals.add(chunk, fill_value=0)
+
+    if totals is None:
+        totals = _dense_to_frame(numerator, denominator, rows)
+
+    return (
+        totals.index.to_numpy(),
+        totals.numerator.to_numpy(),
+        totals.denominator.to_numpy(),
+    )
+
+
+class ABTestRatioMetric(ABTestReport):
+    """AB test of a ratio metric of units, e.g., revenue per session per user
+
+    The KPI of a group is the ratio of sums of the numerators and the
+    denominators of its units. The units are randomized, not the elements of
+    the denominator, so the standard errors come from the delta method, see
+    `cal_delta_method_ratio`. The p-value is the two tailed z-test of the
+    difference of the ratios.
+
+    `ab_test_data` has the per unit arrays `A_numerator`, `A_denominator`,
+    `B_numerator` and `B_denominator`. Each of them can also be an iterator
+    of chunks, which are reduced to streaming moments, so the input never has
+    to be in memory at once. Already accumulated moments can be given as
+    `A_moments` and `B_moments`.
+
+    ```python
+    ab_test = ABTestRatioMetric(
+        {
+            "A_numerator": A_revenue,
+            "A_denominator": A_sessions,
+            "B_numerator": B_revenue,
+            "B_denominator": B_sessions,
+        }
+    )
+    ab_test.report()
+    ```
+
+    :param ab_test_data: per unit numerators and denominators of both groups
+    :param test_name: name of the test
+    :param chunk_size: size of the chunks of arrays, defaults to 2**20
+    """
+
+    report_metrics = {
+        "kpi": "kpi",
+        "std_err": "standard_error",
+        "uplift": "kpi_uplift",
+        "diff_std_err": "difference_std_err",
+        "p_value": "p_value",
+    }
+
+    def __init__(self, ab_test_data, test_name=None, chunk_size=None):
+
+        self.data = ab_test_data
+        self.chunk_size = chunk_size
+        if test_name:
+            self.name = test_name
+        else:
+            self.name = None
+
+    @metric()
+    def moments(self):
+        """Moments of the numerators and denominators of both groups"""
+
+        res = []
+        for group in ("A", "B"):
+            moments = self.data.get(f"{group}_moments")
+            if moments is None:
+                moments = cal_moments(
+                    self.data.get(f"{group}_numerator"),
+                    self.data.get(f"{group}_denominator"),
+                    chunk_size=self.chunk_size,
+                )
+            elif isinstance(moments, dict):
+                moments = MomentsAccumulator(moments)
+            res.append(moments)
+
+        self.A_moments, self.B_moments = res
+
+        return self.A_moments, self.B_moments
+
+    @metric("moments")
+    def kpi(self):
+        """Ratios of both groups"""
+
+        self.A_kpi, self.A_std_err = cal_delta_method_ratio(self.A_moments)
+        self.B_kpi, self.B_std_err = cal_delta_method_ratio(self.B_moments)
+
+        return self.A_kpi, self.B_kpi
+
+    @metric("kpi")
+    def standard_error(self):
+        """Delta method standard errors of the ratios"""
+
+        return self.A_std_err, self.B_std_err
+
+    @metric("kpi")
+    def kpi_uplift(self):
+        """Relative uplift of the ratio of B over A"""
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.uplift = (self.B_kpi - self.A_kpi) / self.A_kpi
+
+        return self.uplift
+
+    @metric("kpi")
+    def difference_std_err(self):
+        """Standard error of the difference of the ratios"""
+
+        self.diff_std_err = np.hypot(self.A_std_err, self.B_std_err)
+
+        return self.diff_std_err
+
+    @metric("kpi", "difference_std_err")
+    def p_value(self):
+        """Two tailed p-value of the difference of the ratios"""
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.p = 2 * norm_sf(np.abs(self.B_kpi - self.A_kpi) / self.diff_std_err)
+
+        return self.p
+
+
+if __name__ == "__main__":
+
+    import time
+
+    n_units = 2_000_000
+    n_sessions = 20_000_000
+    chunk_size = 2_000_000
+
+    def session_chunks(group, uplift):
+        rng = np.random.default_rng(group)
+        for _ in range(n_sessions // chunk_size):
+            units = rng.integers(0, n_units, size=chunk_size)
+            revenue = rng.exponential(1 + uplift, size=chunk_size) * (
+                rng.random(size=chunk_size) < 0.05
+            )
+            yield units, revenue, np.ones(chunk_size)
+
+    start = time.perf_counter()
+    data = {}
+    for group, uplift in (("A", 0), ("B", 0.02)):
+        _, numerators, denominators = cal_unit_totals(
+            session_chunks(ord(group), uplift)
+        )
+        data[f"{group}_numerator"] = numerators
+        data[f"{group}_denominator"] = denominators
+    print(f"{2 * n_sessions} sessions: {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    print(ABTestRatioMetric(data).report(with_data=False))
+    print(f"{2 * n_units} units: {time.perf_counter() - start:.3f}s")
+
+    print("END")
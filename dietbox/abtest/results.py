@@ -0,0 +1,315 @@
+import numpy as np
+import pandas as pd
+import simplejson as json
+from dietbox.data.wrangling.json import isoencode
+
+
+class ABTestResult:
+    """Compact result of one AB test with scalar fields
+
+    The result has `__slots__` and no per instance `__dict__`, and the input
+    data is only referenced, never copied. Missing metrics, e.g., the z-score
+    of `ABTestSeries`, are NaN.
+
+    ```python
+    result = ABTestResult.from_test(ABTestRatios(one_ab_test))
+    result.p_value
+    ```
+
+    :param name: name of the test
+    :param data: reference to the input data of the test
+    """
+
+    fields = (
+        "kpi_a",
+        "kpi_b",
+        "std_err_a",
+        "std_err_b",
+        "uplift",
+        "p_value",
+        "z_score",
+    )
+
+    __slots__ = ("name", "data") + fields
+
+    def __init__(self, name=None, data=None, **metrics):
+
+        self.name = name
+        self.data = data
+        for field in self.fields:
+            setattr(self, field, float(metrics.get(field, np.nan)))
+
+    @classmethod
+    def from_report(cls, report, data=None):
+        """Result from the dict returned by `report`
+
+        :param report: report of an AB test class
+        :param data: reference to the input data, defaults to the data in the report
+        """
+
+        metrics = {}
+        for key in ("kpi", "std_err"):
+            value = report.get(key)
+            if isinstance(value, dict):
+                metrics[f"{key}_a"], metrics[f"{key}_b"] = value["a"], value["b"]
+        for key in ("uplift", "p_value", "z_score"):
+            if report.get(key) is not None:
+                metrics[key] = report[key]
+
+        if data is None:
+            data = report.get("data")
+
+        return cls(name=report.get("name"), data=data, **metrics)
+
+    @classmethod
+    def from_test(cls, ab_test):
+        """Result of an AB test object, e.g., `ABTestRatios` or `ABTestSeries`"""
+
+        return cls.from_report(ab_test.report(with_data=False), data=ab_test.data)
+
+    def to_dict(self, with_data=None):
+        """Fields as a dict
+
+        :param with_data: whether to include the reference to the input data,
+            defaults to False
+        """
+
+        res = {"name": self.name}
+        res.update({field: getattr(self, field) for field in self.fields})
+        if with_data:
+            res["data"] = self.data
+
+        return res
+
+    def __eq__(self, other):
+        if not isinstance(other, ABTestResult):
+            return NotImplemented
+
+        return self.name == other.name and all(
+            np.isclose(getattr(self, f), getattr(other, f), equal_nan=True)
+            for f in self.fields
+        )
+
+    def __hash__(self):
+        # the metrics are compared with a tolerance, so only the name, which
+        # is compared exactly, can be hashed consistently with __eq__
+        return hash((self.__class__.__name__, self.name))
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.to_dict().items())
+
+        return f"{self.__class__.__name__}({fields})"
+
+
+class ABTestResultCollection:
+    """Many AB test results stored column-wise in NumPy arrays
+
+    Each field of `ABTestResult` is one float64 array, and names and data
+    references are object arrays. The arrays grow geometrically, so appending
+    is amortized O(1), and `to_frame` and `to_ndjson` export all results
+    without building one dict per result.
+
+    ```python
+    results = ABTestResultCollection()
+    for ab_test_data in experiments:
+        results.append(ABTestRatios(ab_test_data))
+
+    results.to_frame()
+    ```
+
+    :param capacity: initial number of results that fit without growing, defaults to 1024
+    :param keep_data: whether to keep the references to the input data, defaults to False
+    """
+
+    fields = ABTestResult.fields
+
+    def __init__(self, capacity=None, keep_data=None):
+
+        if capacity is None:
+            capacity = 1024
+        if keep_data is None:
+            keep_data = False
+
+        self.keep_data = keep_data
+        self.size = 0
+        self.columns = {field: np.full(capacity, np.nan) for field in self.fields}
+        self.names = np.empty(capacity, dtype=object)
+        self.data = np.empty(capacity if keep_data else 0, dtype=object)
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self, capacity):
+        for field, column in self.columns.items():
+            grown = np.full(capacity, np.nan)
+            grown[: self.size] = column[: self.size]
+            self.columns[field] = grown
+        self.names = np.concatenate(
+            [self.names[: self.size], np.empty(capacity - self.size, dtype=object)]
+        )
+        if self.keep_data:
+            self.data = np.concatenate(
+                [self.data[: self.size], np.empty(capacity - self.size, dtype=object)]
+            )
+
+    def append(self, result):
+        """Add one result
+
+        :param result: `ABTestResult`, report dict or AB test object
+        :return: the collection itself
+        """
+
+        if isinstance(result, dict):
+            result = ABTestResult.from_report(result)
+        elif not isinstance(result, ABTestResult):
+            result = ABTestResult.from_test(result)
+
+        if self.size == len(self.names):
+            self._grow(max(1, 2 * self.size))
+
+        for field in self.fields:
+            self.columns[field][self.size] = getattr(result, field)
+        self.names[self.size] = result.name
+        if self.keep_data:
+            self.data[self.size] = result.data
+        self.size += 1
+
+        return self
+
+    def extend(self, results):
+        """Add several results, see `append`
+
+        :return: the collection itself
+        """
+
+        for result in results:
+            self.append(result)
+
+        return self
+
+    def __getitem__(self, i):
+        if not -self.size <= i < self.size:
+            raise IndexError(f"index {i} out of range for {self.size} results")
+        i = i % self.size
+
+        return ABTestResult(
+            name=self.names[i],
+            data=self.data[i] if self.keep_data else None,
+            **{field: column[i] for field, column in self.columns.items()},
+        )
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self[i]
+
+    @property
+    def nbytes(self):
+        """Memory of the arrays of the collection, without the referenced objects"""
+
+        return (
+            sum(column.nbytes for column in self.columns.values())
+            + self.names.nbytes
+            + self.data.nbytes
+        )
+
+    def to_frame(self):
+        """All results as a DataFrame with one row per result"""
+
+        dataframe = pd.DataFrame(
+            {field: column[: self.size] for field, column in self.columns.items()}
+        )
+        dataframe.insert(0, "name", self.names[: self.size])
+
+        return dataframe
+
+    def to_ndjson(self, path=None):
+        """Export all results as newline delimited JSON
+
+        Floats are written at full precision, NaN and infinite values as null.
+
+        :param path: file to write to, defaults to returning the string
+        """
+
+        # floats are formatted column by column with the shortest repr that
+        # round trips, instead of one json.dumps per result
+        columns = [
+            [json.dumps(name, default=isoencode) for name in self.names[: self.size]]
+        ]
+        for field in self.fields:
+            column = self.columns[field][: self.size]
+            columns.append(
+                np.where(np.isfinite(column), column.astype(str), "null").tolist()
+            )
+
+        template = (
+            "{" + ", ".join(f'"{key}": %s' for key in ("name",) + self.fields) + "}\n"
+        )
+        lines = "".join(template % row for row in zip(*columns))
+
+        if path is None:
+            return lines
+
+        with open(path, "w") as fp:
+            fp.write(lines)
+
+    @classmethod
+    def from_frame(cls, dataframe):
+        """Collection from a DataFrame in the format of `to_frame`"""
+
+        collection = cls(capacity=max(1, len(dataframe)))
+        collection.size = len(dataframe)
+        for field in cls.fields:
+            if field in dataframe:
+                collection.columns[field][: collection.size] = dataframe[field]
+        if "name" in dataframe:
+            collection.names[: collection.size] = dataframe["name"].to_numpy()
+
+        return collection
+
+    @classmethod
+    def from_ndjson(cls, path):
+        """Collection from a file written by `to_ndjson`"""
+
+        return cls.from_frame(
+            pd.read_json(path, orient="records", lines=True, precise_float=True)
+        )
+
+
+if __name__ == "__main__":
+
+    import time
+    import tracemalloc
+
+    from dietbox.abtest.stats import ABTestRatios
+
+    n = 100_000
+    converted = np.random.binomial(17200, 0.003, size=(n, 2))
+
+    tracemalloc.start()
+    reports = [
+        ABTestRatios(
+            {
+                "A_converted": int(converted[i, 0]),
+                "A_total": 17207,
+                "B_converted": int(converted[i, 1]),
+                "B_total": 17198,
+            },
+            test_name=f"test_{i}",
+        ).report()
+        for i in range(n)
+    ]
+    print(f"{n} reports: {tracemalloc.get_traced_memory()[0] / 1e6:.1f}MB")
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    results = ABTestResultCollection()
+    for report in reports:
+        results.append(report)
+    print(f"collection: {tracemalloc.get_traced_memory()[0] / 1e6:.1f}MB")
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    results.to_ndjson()
+    print(f"NDJSON export in {time.perf_counter() - start:.3f}s")
+
+    print("END")
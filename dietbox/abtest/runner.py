@@ -0,0 +1,158 @@
+import numpy as np
+from dietbox.abtest.parallel import (
+    SharedArray,
+    attach_shared_array,
+    get_n_jobs,
+    map_in_pool,
+)
+from dietbox.abtest.results import ABTestResult, ABTestResultCollection
+from dietbox.abtest.stats import ABTestSeries
+
+# shared buffers of the packed series, set once per worker process
+_worker_data = {}
+
+
+def _init_worker(buffers):
+    _worker_data.clear()
+    for key, buffer in buffers.items():
+        if isinstance(buffer, tuple):
+            # keep the shared memory object alive together with its view
+            _worker_data[f"shm_{key}"], buffer = attach_shared_array(buffer)
+        _worker_data[key] = buffer
+
+
+def _run_series_test(task):
+    """Result of one `ABTestSeries` from views of the shared buffers"""
+
+    name, layout, scalars, kpi_method, pipeline = task
+
+    ab_test_data = dict(scalars)
+    for key, (dtype, start, stop) in layout.items():
+        ab_test_data[key] = _worker_data[dtype][start:stop]
+
+    ab_test = ABTestSeries(ab_test_data, kpi_method=kpi_method, test_name=name)
+    # the data is not sent back, the views are only valid in the worker
+    return ABTestResult.from_report(
+        ab_test.report(with_data=False, pipeline=pipeline), data=None
+    )
+
+
+def pack_series(experiments):
+    """Layout of the array values of many experiments in one buffer per dtype
+
+    :param experiments: dict of experiment names to `ab_test_data`
+    :return: sizes of the buffers by dtype, and for each experiment the
+        `(dtype, start, stop)` of its numeric arrays and its other values
+    :rtype: tuple
+    """
+
+    sizes = {}
+    layouts, scalars = {}, {}
+    for name, ab_test_data in experiments.items():
+        layouts[name], scalars[name] = {}, {}
+        for key, value in ab_test_data.items():
+            # sufficient statistics, e.g., lists of partial moments, and non
+            # numeric values are passed as they are
+            if key.endswith("_moments") or np.ndim(value) == 0:
+                scalars[name][key] = value
+                continue
+            array = np.asarray(value)
+            if array.dtype.kind not in "biuf":
+                scalars[name][key] = value
+                continue
+            start = sizes.get(array.dtype.str, 0)
+            sizes[array.dtype.str] = start + len(array)
+            layouts[name][key] = (array.dtype.str, start, start + len(array))
+
+    return sizes, layouts, scalars
+
+
+def run_series_tests(experiments, kpi_method=None, n_jobs=None, pipeline=None):
+    """Results of many `ABTestSeries` evaluated in a process pool
+
+    The series of all experiments are copied once into shared memory, one
+    block per dtype, and the workers get zero-copy views of them, so only
+    names and offsets are pickled per test. Tests are scheduled over the pool
+    and the results are in the order of `experiments`, regardless of
+    `n_jobs`.
+
+    ```python
+    results = run_series_tests(
+        {"revenue": {"A_series": A_revenue, "B_series": B_revenue}, ...},
+        kpi_method={"revenue": "all_avg", ...},
+        n_jobs=8,
+    )
+    results.to_frame()
+    ```
+
+    :param experiments: dict of experiment names to `ab_test_data` of `ABTestSeries`
+    :param kpi_method: kpi method of all experiments, or dict of experiment
+        names to kpi methods, see `ABTestSeries`
+    :param n_jobs: number of processes, defaults to all CPUs
+    :param pipeline: metrics to evaluate, defaults to all metrics of the report,
+        e.g., `["kpi", "std_err", "uplift"]` skips the p-value
+    :return: results in the order of the experiments
+    :rtype: ABTestResultCollection
+    """
+
+    if not isinstance(kpi_method, dict):
+        kpi_method = {name: kpi_method for name in experiments}
+
+    sizes, layouts, scalars = pack_series(experiments)
+    tasks = [
+        (name, layouts[name], scalars[name], kpi_method.get(name), pipeline)
+        for name in experiments
+    ]
+
+    shared = {
+        dtype: SharedArray(shape=(size,), dtype=dtype) for dtype, size in sizes.items()
+    }
+    try:
+        for name, ab_test_data in experiments.items():
+            for key, (dtype, start, stop) in layouts[name].items():
+                shared[dtype].array[start:stop] = ab_test_data[key]
+
+        if min(get_n_jobs(n_jobs), len(tasks)) == 1:
+            buffers = {dtype: array.array for dtype, array in shared.items()}
+        else:
+            buffers = {dtype: array.descriptor for dtype, array in shared.items()}
+
+        res = map_in_pool(
+            _run_series_test,
+            tasks,
+            n_jobs=n_jobs,
+            initializer=_init_worker,
+            initargs=(buffers,),
+        )
+    finally:
+        _worker_data.clear()
+        for array in shared.values():
+            array.close()
+
+    return ABTestResultCollection(capacity=max(1, len(res))).extend(res)
+
+
+if __name__ == "__main__":
+
+    import time
+
+    n_metrics = 200
+    size = 500_000
+    rng = np.random.default_rng(42)
+    experiments = {
+        f"metric_{i}": {
+            "A_series": rng.exponential(1, size=size),
+            "B_series": rng.exponential(1.01, size=size),
+        }
+        for i in range(n_metrics)
+    }
+
+    for n_jobs in (1, None):
+        start = time.perf_counter()
+        results = run_series_tests(
+            experiments, kpi_method="all_avg", n_jobs=n_jobs, pipeline=["kpi", "uplift"]
+        )
+        print(f"n_jobs={n_jobs}: {time.perf_counter() - start:.3f}s")
+    print(results.to_frame().head())
+
+    print("END")
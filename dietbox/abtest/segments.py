@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+from dietbox.abtest.batch import ABTestRatiosBatch
+
+
+def cal_segment_counts(
+    events, segments, group_column=None, converted_column=None, groups=None
+):
+    """Totals and conversions of both groups in every segment of an event table
+
+    All columns are factorized once and the segment and group codes are
+    combined into one integer key, which is counted with `np.bincount` in a
+    single pass. Categorical columns are factorized from their codes without
+    hashing, so they are the fastest input for large event tables. Rows with
+    missing segments or with groups not in `groups` are ignored.
+
+    :param events: event table with one row per event
+    :type events: pandas.DataFrame
+    :param segments: name or list of names of the segment columns
+    :param group_column: column of the groups, defaults to `"group"`
+    :param converted_column: column of whether each event converted, defaults to `"converted"`
+    :param groups: values of group A and group B in `group_column`, defaults to `("A", "B")`
+    :return: `A_total`, `A_converted`, `B_total`, `B_converted` with one row per segment
+    :rtype: pandas.DataFrame
+    """
+
+    if group_column is None:
+        group_column = "group"
+    if converted_column is None:
+        converted_column = "converted"
+    if groups is None:
+        groups = ("A", "B")
+    if isinstance(segments, str):
+        segments = [segments]
+    segments = list(segments)
+
+    codes, levels = [], []
+    for column in segments:
+        column_codes, uniques = pd.factorize(events[column], sort=True)
+        codes.append(column_codes)
+        levels.append(uniques)
+
+    group_codes, group_uniques = pd.factorize(events[group_column])
+    # the last entry maps missing groups (code -1) to -1
+    group_of_unique = np.append(pd.Index(groups).get_indexer(group_uniques), -1)
+    codes.append(group_of_unique[group_codes])
+
+    valid = np.ones(len(events), dtype=bool)
+    for c in codes:
+        valid &= c >= 0
+
+    converted = events[converted_column].to_numpy()[valid].astype(bool)
+    dims = tuple(len(level) for level in levels) + (2,)
+    key = np.ravel_multi_index(tuple(c[valid] for c in codes), dims)
+
+    n_keys = int(np.prod(dims))
+    if n_keys <= max(2**20, 2 * len(key)):
+        totals = np.bincount(key, minlength=n_keys)
+        conversions = np.bincount(key[converted], minlength=n_keys)
+        keys = np.arange(0, n_keys, 2)
+        totals, conversions = totals.reshape(-1, 2), conversions.reshape(-1, 2)
+        observed = totals.sum(axis=1) > 0
+        keys, totals, conversions = (
+            keys[observed],
+            totals[observed],
+            conversions[observed],
+        )
+    else:
+        # too many possible segments for dense counts, count the observed keys
+        segment_key, inverse = np.unique(key // 2, return_inverse=True)
+        inverse = 2 * inverse.ravel() + key % 2
+        totals = np.bincount(inverse, minlength=2 * len(segment_key)).reshape(-1, 2)
+        conversions = np.bincount(
+            inverse[converted], minlength=2 * len(segment_key)
+        ).reshape(-1, 2)
+        keys = 2 * segment_key
+
+    segment_codes = np.unravel_index(keys, dims)[:-1]
+    if len(segments) == 1:
+        index = pd.Index(levels[0].take(segment_codes[0]), name=segments[0])
+    else:
+        index = pd.MultiIndex(levels=levels, codes=segment_codes, names=segments)
+
+    return pd.DataFrame(
+        {
+            "A_total": totals[:, 0],
+            "A_converted": conversions[:, 0],
+            "B_total": totals[:, 1],
+            "B_converted": conversions[:, 1],
+        },
+        index=index,
+    )
+
+
+def segment_report(
+    events,
+    segments,
+    group_column=None,
+    converted_column=None,
+    groups=None,
+    test=None,
+):
+    """AB test report of every segment of an event table
+
+    The counts come from `cal_segment_counts` and all segments are tested at
+    once with `ABTestRatiosBatch`.
+
+    ```python
+    segment_report(events, ["country", "platform", "device"])
+    ```
+
+    :param events: event table with one row per event
+    :type events: pandas.DataFrame
+    :param segments: name or list of names of the segment columns
+    :param group_column: column of the groups, defaults to `"group"`
+    :param converted_column: column of whether each event converted, defaults to `"converted"`
+    :param groups: values of group A and group B in `group_column`, defaults to `("A", "B")`
+    :param test: test of `ABTestRatiosBatch`, defaults to `"normal"`
+    :return: counts and metrics with one row per segment
+    :rtype: pandas.DataFrame
+    """
+
+    counts = cal_segment_counts(
+        events,
+        segments,
+        group_column=group_column,
+        converted_column=converted_column,
+        groups=groups,
+    )
+    report = ABTestRatiosBatch(
+        counts.reset_index(drop=True), test_name=np.arange(len(counts)), test=test
+    ).to_frame()
+    report.index = counts.index
+
+    return pd.concat([counts, report], axis=1)
+
+
+if __name__ == "__main__":
+
+    import time
+
+    size = 10_000_000
+    events = pd.DataFrame(
+        {
+            "country": np.random.choice(["DE", "FR", "US", "JP", "BR"], size=size),
+            "platform": np.random.choice(["web", "app"], size=size),
+            "device": np.random.choice(["mobile", "desktop", "tablet"], size=size),
+            "group": np.random.choice(["A", "B"], size=size),
+        }
+    )
+    events["converted"] = np.random.binomial(1, 0.03, size=size)
+
+    start = time.perf_counter()
+    res = segment_report(events, ["country", "platform", "device"])
+    print(f"{size} events: {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    events.groupby(["country", "platform", "device", "group"]).converted.agg(
+        ["size", "sum"]
+    )
+    print(f"groupby: {time.perf_counter() - start:.3f}s")
+    print(res)
+
+    print("END")
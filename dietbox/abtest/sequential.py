@@ -0,0 +1,209 @@
+import numpy as np
+from dietbox.abtest.stats_util import cal_conversion_rate
+
+
+def cal_msprt_likelihood_ratio(difference, variance, mixing_variance):
+    """Mixture likelihood ratio of the mSPRT for a normal mean
+
+    The mixture is taken over a normal prior $N(0, \\tau^2)$ on the difference,
+    which gives a closed form, see Johari et al., Always Valid Inference:
+    https://arxiv.org/abs/1512.04922
+
+    Experiments without variance, e.g., without any data, get a likelihood
+    ratio of 1.
+
+    :param difference: estimated difference between the groups
+    :param variance: variance of the estimated difference
+    :param mixing_variance: variance $\\tau^2$ of the mixing distribution
+    :return: likelihood ratio of the alternative against the null
+    """
+
+    difference = np.asarray(difference, dtype=float)
+    variance = np.asarray(variance, dtype=float)
+    has_variance = variance > 0
+    variance = np.where(has_variance, variance, 1)
+
+    likelihood_ratio = np.sqrt(variance / (variance + mixing_variance)) * np.exp(
+        mixing_variance * difference**2 / (2 * variance * (variance + mixing_variance))
+    )
+
+    return np.where(has_variance, likelihood_ratio, 1.0)
+
+
+def cal_msprt_confidence_interval(
+    difference, variance, mixing_variance, significance_level
+):
+    """Confidence interval of the mSPRT at one look
+
+    The running intersection of these intervals is a confidence sequence,
+    which covers the true difference at all looks simultaneously.
+
+    :param difference: estimated difference between the groups
+    :param variance: variance of the estimated difference
+    :param mixing_variance: variance $\\tau^2$ of the mixing distribution
+    :param significance_level: significance level $\\alpha$
+    :return: lower and upper bounds
+    :rtype: tuple
+    """
+
+    difference = np.asarray(difference, dtype=float)
+    variance = np.asarray(variance, dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        half_width = np.sqrt(
+            variance
+            * (variance + mixing_variance)
+            / mixing_variance
+            * (
+                -2 * np.log(significance_level)
+                + np.log((variance + mixing_variance) / variance)
+            )
+        )
+    half_width = np.where(variance > 0, half_width, np.inf)
+
+    return difference - half_width, difference + half_width
+
+
+class ABTestSequential:
+    """Always valid sequential ratio AB test (mixture SPRT)
+
+    The fixed horizon p-values of `ABTestRatios` are not valid if the test is
+    looked at repeatedly. This class keeps the cumulative counts and the
+    running always valid p-values and confidence sequences of the difference
+    of conversion rates $d = B_cr - A_cr$. Each call to `update` is one look.
+    All computations are vectorized over experiments, so many experiments
+    can be updated at once with arrays of counts.
+
+    ```python
+    seq = ABTestSequential(mixing_variance=1e-4)
+    seq.update({"A_total": 1000, "A_converted": 43, "B_total": 1000, "B_converted": 68})
+    seq.update({"A_total": 1000, "A_converted": 51, "B_total": 1000, "B_converted": 70})
+
+    seq.report()
+    ```
+
+    :param mixing_variance: variance $\\tau^2$ of the normal mixing
+        distribution of the difference, of the order of the squared effect
+        that is expected, defaults to 1e-4
+    :param significance_level: significance level $\\alpha$, defaults to 0.05
+    :param test_name: name of the test or names of the experiments
+    """
+
+    def __init__(self, mixing_variance=None, significance_level=None, test_name=None):
+
+        if mixing_variance is None:
+            mixing_variance = 1e-4
+        if significance_level is None:
+            significance_level = 0.05
+
+        self.mixing_variance = mixing_variance
+        self.significance_level = significance_level
+        if test_name is not None:
+            self.name = test_name
+        else:
+            self.name = None
+
+        self.looks = 0
+        self.A_total = 0
+        self.A_converted = 0
+        self.B_total = 0
+        self.B_converted = 0
+        self.p = 1.0
+        self.lower = -np.inf
+        self.upper = np.inf
+
+    def update(self, ab_test_data):
+        """Add new counts and update the running statistics
+
+        :param ab_test_data: counts since the last update in the
+            `ab_test_data` format, scalars for one experiment or arrays for
+            many experiments
+        :type ab_test_data: dict or pandas.DataFrame
+        :return: the test itself
+        """
+
+        self.A_total = self.A_total + np.asarray(ab_test_data.get("A_total"))
+        self.A_converted = self.A_converted + np.asarray(
+            ab_test_data.get("A_converted")
+        )
+        self.B_total = self.B_total + np.asarray(ab_test_data.get("B_total"))
+        self.B_converted = self.B_converted + np.asarray(
+            ab_test_data.get("B_converted")
+        )
+        self.looks += 1
+
+        self.A_cr = cal_conversion_rate(self.A_total, self.A_converted)
+        self.B_cr = cal_conversion_rate(self.B_total, self.B_converted)
+        self.difference = self.B_cr - self.A_cr
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.variance = np.nan_to_num(
+                self.A_cr * (1 - self.A_cr) / self.A_total
+                + self.B_cr * (1 - self.B_cr) / self.B_total
+            )
+
+        self.likelihood_ratio = cal_msprt_likelihood_ratio(
+            self.difference, self.variance, self.mixing_variance
+        )
+        self.p = np.minimum(self.p, np.minimum(1, 1 / self.likelihood_ratio))
+
+        lower, upper = cal_msprt_confidence_interval(
+            self.difference,
+            self.variance,
+            self.mixing_variance,
+            self.significance_level,
+        )
+        self.lower = np.maximum(self.lower, lower)
+        self.upper = np.minimum(self.upper, upper)
+
+        return self
+
+    def report(self, with_data=None):
+        """Report of the running statistics after the latest update"""
+
+        if with_data is None:
+            with_data = True
+
+        if not self.looks:
+            raise Exception("No data yet, call update first")
+
+        res = {
+            "kpi": {"a": self.A_cr, "b": self.B_cr},
+            "difference": self.difference,
+            "likelihood_ratio": self.likelihood_ratio,
+            "p_value": self.p,
+            "confidence_sequence": {"lower": self.lower, "upper": self.upper},
+            "significant": self.p <= self.significance_level,
+            "looks": self.looks,
+        }
+
+        if self.name is not None:
+            res["name"] = self.name
+        if with_data:
+            res["data"] = {
+                "A_total": self.A_total,
+                "A_converted": self.A_converted,
+                "B_total": self.B_total,
+                "B_converted": self.B_converted,
+            }
+
+        return res
+
+
+if __name__ == "__main__":
+
+    seq = ABTestSequential()
+    for _ in range(24):
+        seq.update(
+            {
+                "A_total": np.full(1000, 500),
+                "A_converted": np.random.binomial(500, 0.05, size=1000),
+                "B_total": np.full(1000, 500),
+                "B_converted": np.random.binomial(500, 0.05, size=1000),
+            }
+        )
+
+    res = seq.report(with_data=False)
+    print("A/A false positive rate after 24 looks:", np.mean(res["significant"]))
+
+    print("END")
@@ -0,0 +1,267 @@
+import numpy as np
+import pandas as pd
+import scipy.stats as scs
+from dietbox.abtest.batch import ABTestRatiosBatch
+from dietbox.abtest.power import cal_power
+
+
+def _chunk_sizes(n_experiments, chunk_size):
+    for start in range(0, n_experiments, chunk_size):
+        yield min(chunk_size, n_experiments - start)
+
+
+def _cal_rejection_rate(rejections, n_experiments):
+    rate = rejections / n_experiments
+
+    return {
+        "n_experiments": n_experiments,
+        "rejections": rejections,
+        "rejection_rate": rate,
+        "std_err": np.sqrt(rate * (1 - rate) / n_experiments),
+    }
+
+
+def simulate_ratio_experiments(
+    A_rate,
+    B_rate,
+    A_total,
+    B_total=None,
+    n_experiments=None,
+    seed=None,
+    chunk_size=None,
+):
+    """Synthetic conversion experiments in chunks
+
+    The conversions of both groups are binomial draws. Each chunk is a dict of
+    arrays in the format of `ABTestRatiosBatch`.
+
+    :param A_rate: conversion rate of group A
+    :param B_rate: conversion rate of group B
+    :param A_total: sample size of group A
+    :param B_total: sample size of group B, defaults to `A_total`
+    :param n_experiments: number of experiments, defaults to 100_000
+    :param seed: seed of the random generator
+    :param chunk_size: number of experiments per chunk, defaults to 2**16
+    :return: generator of dicts of arrays
+    """
+
+    if B_total is None:
+        B_total = A_total
+    if n_experiments is None:
+        n_experiments = 100_000
+    if chunk_size is None:
+        chunk_size = 2**16
+
+    rng = np.random.default_rng(seed)
+    for size in _chunk_sizes(n_experiments, chunk_size):
+        yield {
+            "A_total": np.full(size, A_total),
+            "A_converted": rng.binomial(A_total, A_rate, size=size),
+            "B_total": np.full(size, B_total),
+            "B_converted": rng.binomial(B_total, B_rate, size=size),
+        }
+
+
+def simulate_ratio_rejection_rate(
+    A_rate,
+    B_rate=None,
+    A_total=None,
+    B_total=None,
+    n_experiments=None,
+    test=None,
+    significance_level=None,
+    seed=None,
+    chunk_size=None,
+):
+    """Empirical rejection rate of the tests of `ABTestRatios`
+
+    Experiments are simulated with `simulate_ratio_experiments` and tested
+    chunk by chunk with `ABTestRatiosBatch`, so memory is bounded by the chunk
+    size. An experiment is rejected if its p-value is at most the significance
+    level. With `B_rate` equal to `A_rate`, i.e., an A/A test, the rejection
+    rate is the type I error, otherwise it is the power.
+
+    :param A_rate: conversion rate of group A
+    :param B_rate: conversion rate of group B, defaults to `A_rate`
+    :param A_total: sample size of group A, defaults to 10_000
+    :param B_total: sample size of group B, defaults to `A_total`
+    :param n_experiments: number of experiments, defaults to 100_000
+    :param test: `"normal"` for `ABTestRatios` or `"binom"` for `cal_p_value`,
+        defaults to `"normal"`
+    :param significance_level: significance level, defaults to 0.05
+    :param seed: seed of the random generator
+    :param chunk_size: number of experiments per chunk, defaults to 2**16
+    :return: number of experiments and rejections, rejection rate and its
+        Monte Carlo standard error
+    :rtype: dict
+    """
+
+    if B_rate is None:
+        B_rate = A_rate
+    if A_total is None:
+        A_total = 10_000
+    if n_experiments is None:
+        n_experiments = 100_000
+    if significance_level is None:
+        significance_level = 0.05
+
+    rejections = 0
+    for chunk in simulate_ratio_experiments(
+        A_rate,
+        B_rate,
+        A_total,
+        B_total,
+        n_experiments=n_experiments,
+        seed=seed,
+        chunk_size=chunk_size,
+    ):
+        p_value = ABTestRatiosBatch(chunk, test=test).p_value()
+        rejections += int(np.count_nonzero(p_value <= significance_level))
+
+    return _cal_rejection_rate(rejections, n_experiments)
+
+
+def simulate_power_curve(
+    baseline_rate,
+    uplifts,
+    sample_size,
+    n_experiments=None,
+    test=None,
+    significance_level=None,
+    seed=None,
+    chunk_size=None,
+):
+    """Empirical power of the tests of `ABTestRatios` over relative uplifts
+
+    Each uplift is simulated with `simulate_ratio_rejection_rate`; an uplift
+    of 0 gives the type I error. The analytic two tailed power of
+    `dietbox.abtest.power.cal_power` is included for comparison.
+
+    :param baseline_rate: conversion rate of group A
+    :param uplifts: relative uplifts of group B
+    :param sample_size: sample size of each group
+    :param n_experiments: number of experiments per uplift, defaults to 100_000
+    :return: one row per uplift
+    :rtype: pandas.DataFrame
+    """
+
+    if significance_level is None:
+        significance_level = 0.05
+
+    uplifts = np.atleast_1d(np.asarray(uplifts, dtype=float))
+    seeds = np.random.SeedSequence(seed).spawn(len(uplifts))
+
+    rows = []
+    for uplift, uplift_seed in zip(uplifts, seeds):
+        res = simulate_ratio_rejection_rate(
+            baseline_rate,
+            baseline_rate * (1 + uplift),
+            sample_size,
+            n_experiments=n_experiments,
+            test=test,
+            significance_level=significance_level,
+            seed=uplift_seed,
+            chunk_size=chunk_size,
+        )
+        rows.append(
+            {
+                "uplift": uplift,
+                "treatment_rate": baseline_rate * (1 + uplift),
+                "rejection_rate": res["rejection_rate"],
+                "std_err": res["std_err"],
+                "expected_power": cal_power(
+                    baseline_rate,
+                    uplift,
+                    sample_size,
+                    significance_level=significance_level,
+                ),
+            }
+        )
+
+    return pd.DataFrame(rows)
+
+
+def simulate_series_rejection_rate(
+    A_distribution,
+    B_distribution=None,
+    A_size=None,
+    B_size=None,
+    n_experiments=None,
+    significance_level=None,
+    seed=None,
+    chunk_size=None,
+):
+    """Empirical rejection rate of the p-value of `ABTestSeries`
+
+    The distributions are functions of a `numpy.random.Generator` and a shape
+    that return an array of that shape, e.g.,
+    `lambda rng, size: rng.binomial(1, 0.1, size) * rng.lognormal(0, 1, size)`
+    for zero inflated revenue. Each chunk of experiments is one matrix per
+    group with one experiment per row, and all rows are tested at once with
+    the Mann-Whitney U test of `ABTestSeries.p_value`.
+
+    :param A_distribution: distribution of the series of group A
+    :param B_distribution: distribution of the series of group B, defaults to `A_distribution`
+    :param A_size: length of the series of group A, defaults to 1000
+    :param B_size: length of the series of group B, defaults to `A_size`
+    :param n_experiments: number of experiments, defaults to 10_000
+    :param significance_level: significance level, defaults to 0.05
+    :param seed: seed of the random generator
+    :param chunk_size: number of experiments per chunk, defaults to about 2**22
+        values per chunk
+    :return: see `simulate_ratio_rejection_rate`
+    :rtype: dict
+    """
+
+    if B_distribution is None:
+        B_distribution = A_distribution
+    if A_size is None:
+        A_size = 1000
+    if B_size is None:
+        B_size = A_size
+    if n_experiments is None:
+        n_experiments = 10_000
+    if significance_level is None:
+        significance_level = 0.05
+    if chunk_size is None:
+        chunk_size = max(1, 2**22 // (A_size + B_size))
+
+    # the exact distribution is only used for tiny samples without ties,
+    # which can not be decided for the whole chunk at once
+    method = "asymptotic" if min(A_size, B_size) > 8 else "auto"
+
+    rng = np.random.default_rng(seed)
+    rejections = 0
+    for size in _chunk_sizes(n_experiments, chunk_size):
+        A_series = A_distribution(rng, (size, A_size))
+        B_series = B_distribution(rng, (size, B_size))
+        p_value = scs.mannwhitneyu(
+            A_series, B_series, alternative="two-sided", method=method, axis=1
+        ).pvalue
+        rejections += int(np.count_nonzero(p_value <= significance_level))
+
+    return _cal_rejection_rate(rejections, n_experiments)
+
+
+if __name__ == "__main__":
+
+    import time
+
+    start = time.perf_counter()
+    for test in ("normal", "binom"):
+        res = simulate_ratio_rejection_rate(0.05, A_total=10_000, test=test, seed=42)
+        print(f"A/A type I error of {test}: {res}")
+    print(f"in {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    print(simulate_power_curve(0.05, [0, 0.05, 0.1, 0.15], 10_000, seed=42))
+    print(f"in {time.perf_counter() - start:.3f}s")
+
+    def revenue(rng, size):
+        return rng.binomial(1, 0.1, size) * rng.lognormal(0, 1, size)
+
+    start = time.perf_counter()
+    print(simulate_series_rejection_rate(revenue, A_size=2000, seed=42))
+    print(f"in {time.perf_counter() - start:.3f}s")
+
+    print("END")
@@ -0,0 +1,260 @@
+import numpy as np
+import pandas as pd
+from dietbox.abtest.batch import ABTestRatiosBatch
+from dietbox.abtest.cuped import cal_cuped
+from dietbox.abtest.moments import MomentsAccumulator
+
+
+def _as_list(columns):
+    if columns is None:
+        return []
+    if isinstance(columns, str):
+        return [columns]
+
+    return list(columns)
+
+
+def build_aggregation_query(
+    table,
+    value_column,
+    segments=None,
+    group_column=None,
+    covariate_column=None,
+    where=None,
+):
+    """SQL of the sufficient statistics of an AB test per group and segment
+
+    The query returns one row per group and segment with the count of rows,
+    the count of non zero values, the sum and the sum of squares of the
+    values and, with a covariate, the sums of the covariate, of its squares
+    and of the cross products. The statistics are cast to floating point
+    before summing, so large integer columns do not overflow. Only standard
+    SQL is used, and the query runs on MySQL, Postgres and SQLite.
+
+    The table, columns and the where clause are inserted verbatim, so they
+    can be expressions, e.g., a subquery as the table, but must not come from
+    untrusted input.
+
+    :param table: table or subquery of the events, one row per unit
+    :param value_column: column of the values of the series
+    :param segments: name or list of names of the segment columns, defaults to no segments
+    :param group_column: column of the groups, defaults to `"variant"`
+    :param covariate_column: column of the pre-period covariate, defaults to no covariate
+    :param where: condition of the where clause, defaults to all rows
+    :return: SQL query
+    :rtype: str
+    """
+
+    if group_column is None:
+        group_column = "variant"
+
+    keys = [group_column] + _as_list(segments)
+    value, covariate = value_column, covariate_column
+    statistics = [
+        "COUNT(*) AS total",
+        f"SUM(CASE WHEN {value} <> 0 THEN 1 ELSE 0 END) AS non_zero",
+        f"SUM(1.0 * {value}) AS value_sum",
+        f"SUM(1.0 * {value} * {value}) AS value_sum_squares",
+    ]
+    if covariate is not None:
+        statistics += [
+            f"SUM(1.0 * {covariate}) AS covariate_sum",
+            f"SUM(1.0 * {covariate} * {covariate}) AS covariate_sum_squares",
+            f"SUM(1.0 * {value} * {covariate}) AS cross_sum",
+        ]
+
+    query = f"SELECT {', '.join(keys + statistics)}\nFROM {table}\n"
+    if where is not None:
+        query += f"WHERE {where}\n"
+    query += f"GROUP BY {', '.join(keys)}\nORDER BY {', '.join(keys)}"
+
+    return query
+
+
+def query_aggregates(query, connection=None, config=None):
+    """Run an aggregation query and return the aggregate rows
+
+    With `connection`, the query runs with `pandas.read_sql_query`, e.g., on
+    a `sqlite3` connection or the engine `session.bind` of
+    `dietbox.lab.data.extraction.postgres`. Otherwise it runs on the MySQL
+    server of `config` with `dietbox.lab.data.extraction.sql.query_data`.
+
+    :param query: SQL query, see `build_aggregation_query`
+    :param connection: database connection or SQLAlchemy engine
+    :param config: MySQL config of `query_data`
+    :return: one row per group and segment
+    :rtype: pandas.DataFrame
+    """
+
+    if connection is not None:
+        return pd.read_sql_query(query, connection)
+
+    from dietbox.lab.data.extraction.sql import query_data
+
+    return query_data([{"name": "abtest_aggregates", "query": query}], config)[0][
+        "data"
+    ]
+
+
+def aggregates_to_moments(aggregates):
+    """Moments of the aggregate rows of `build_aggregation_query`
+
+    See `dietbox.abtest.moments.MomentsAccumulator.from_sums`.
+
+    :param aggregates: aggregate rows
+    :type aggregates: pandas.DataFrame
+    :return: one `MomentsAccumulator` per row
+    :rtype: list
+    """
+
+    columns = {
+        "total": "total",
+        "non_zero": "non_zero",
+        "sum": "value_sum",
+        "sum_squares": "value_sum_squares",
+        "covariate_sum": "covariate_sum",
+        "covariate_sum_squares": "covariate_sum_squares",
+        "cross_sum": "cross_sum",
+    }
+    columns = {key: column for key, column in columns.items() if column in aggregates}
+
+    return [
+        MomentsAccumulator.from_sums(
+            **{key: float(row[column]) for key, column in columns.items()}
+        )
+        for _, row in aggregates.iterrows()
+    ]
+
+
+def aggregate_report(
+    aggregates, segments=None, group_column=None, groups=None, kpi_method=None
+):
+    """AB test report of every segment from the aggregate rows
+
+    For the kpi methods `all_avg` and `sum`, the KPIs are tested with
+    `dietbox.abtest.cuped.cal_cuped` on the moments, which is the z-test of
+    the difference and, with a covariate in the aggregates, its CUPED
+    adjusted version. For `count`, the non zero counts are the conversions of
+    `ABTestRatiosBatch`.
+
+    ```python
+    query = build_aggregation_query("events", "revenue", segments="country")
+    aggregate_report(query_aggregates(query, config=config), segments="country")
+    ```
+
+    :param aggregates: aggregate rows of `build_aggregation_query`
+    :param segments: name or list of names of the segment columns, defaults to no segments
+    :param group_column: column of the groups, defaults to `"variant"`
+    :param groups: values of group A and group B in `group_column`, defaults to `("A", "B")`
+    :param kpi_method: `"all_avg"`, `"sum"` or `"count"`, defaults to `"all_avg"`
+    :return: counts and metrics with one row per segment
+    :rtype: pandas.DataFrame
+    """
+
+    if group_column is None:
+        group_column = "variant"
+    if groups is None:
+        groups = ("A", "B")
+    if kpi_method is None:
+        kpi_method = "all_avg"
+    segments = _as_list(segments)
+
+    aggregates = aggregates.assign(moments=aggregates_to_moments(aggregates))
+    if not segments:
+        aggregates = aggregates.assign(segment=0)
+    wide = aggregates.set_index((segments or ["segment"]) + [group_column])[
+        ["total", "non_zero", "moments"]
+    ].unstack(group_column)
+    if not segments:
+        wide.index = pd.RangeIndex(len(wide))
+
+    missing = [group for group in groups if group not in wide["total"]]
+    if missing:
+        raise Exception(f"groups {missing} not found in {group_column}")
+
+    res = pd.DataFrame(index=wide.index)
+    for column in ("total", "non_zero"):
+        for suffix, group in zip("ab", groups):
+            res[f"{column}_{suffix}"] = (
+                wide[column][group].fillna(0).to_numpy(dtype=float)
+            )
+
+    if kpi_method == "count":
+        batch = ABTestRatiosBatch(
+            {
+                "A_total": res.total_a,
+                "A_converted": res.non_zero_a,
+                "B_total": res.total_b,
+                "B_converted": res.non_zero_b,
+            },
+            test_name=res.index,
+        ).to_frame()
+        columns = ["kpi_a", "kpi_b", "std_err_a", "std_err_b", "uplift", "p_value"]
+        return pd.concat([res, batch[columns]], axis=1)
+
+    rows = []
+    for A_moments, B_moments in zip(
+        wide["moments"][groups[0]], wide["moments"][groups[1]]
+    ):
+        if not isinstance(A_moments, MomentsAccumulator):
+            A_moments = MomentsAccumulator()
+        if not isinstance(B_moments, MomentsAccumulator):
+            B_moments = MomentsAccumulator()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cuped = cal_cuped(A_moments, B_moments, kpi_method=kpi_method)
+        rows.append(
+            {
+                "kpi_a": cuped["kpi"][0],
+                "kpi_b": cuped["kpi"][1],
+                "std_err_a": cuped["std_err"][0],
+                "std_err_b": cuped["std_err"][1],
+                "uplift": cuped["uplift"],
+                "p_value": cuped["p_value"],
+                "theta": cuped["theta"],
+                "variance_reduction": cuped["variance_reduction"],
+            }
+        )
+
+    return pd.concat([res, pd.DataFrame(rows, index=res.index)], axis=1)
+
+
+if __name__ == "__main__":
+
+    import sqlite3
+    import time
+
+    n = 2_000_000
+    rng = np.random.default_rng(42)
+    covariate = rng.lognormal(1, 1, size=n)
+    events = pd.DataFrame(
+        {
+            "variant": rng.choice(["A", "B"], size=n),
+            "country": rng.choice(["DE", "FR", "NL"], size=n),
+            "revenue": 0.8 * covariate + rng.normal(0, 1, size=n),
+            "pre_revenue": covariate,
+        }
+    )
+    connection = sqlite3.connect(":memory:")
+    events.to_sql("events", connection, index=False)
+
+    start = time.perf_counter()
+    raw = pd.read_sql_query("SELECT * FROM events", connection)
+    print(
+        f"raw rows: {time.perf_counter() - start:.3f}s, "
+        f"{raw.memory_usage().sum() / 1e6:.1f}MB"
+    )
+
+    start = time.perf_counter()
+    query = build_aggregation_query(
+        "events", "revenue", segments="country", covariate_column="pre_revenue"
+    )
+    aggregates = query_aggregates(query, connection=connection)
+    report = aggregate_report(aggregates, segments="country")
+    print(
+        f"aggregates: {time.perf_counter() - start:.3f}s, "
+        f"{aggregates.memory_usage().sum() / 1e3:.1f}kB"
+    )
+    print(query)
+    print(report)
+
+    print("END")
@@ -1,5 +1,22 @@
+import inspect
+from functools import wraps
+
 import numpy as np
 import scipy.stats as scs
+from dietbox.abtest.bootstrap import cal_bootstrap_uplift_interval
+from dietbox.abtest.cuped import cal_cuped, cal_cuped_series
+from dietbox.abtest.moments import (
+    MomentsAccumulator,
+    cal_moments,
+    cal_welch_test,
+    is_series_file,
+    is_series_stream,
+    iter_series_chunks,
+    open_series,
+)
+from dietbox.abtest.normal import norm_sf
+from dietbox.abtest.permutation import cal_permutation_test
+from dietbox.abtest.results import ABTestResult
 from dietbox.abtest.stats_util import (
     cal_conversion_rate,
     cal_conversion_uplift,
@@ -12,9 +29,130 @@ from dietbox.abtest.stats_util import (
 )
 
 
-class ABTestRatiosNaive:
+def metric(*depends_on):
+    """Declare a method of an AB test class as a cached metric
+
+    The metric is computed on the first call, after the metrics it depends on,
+    and the result is reused for all later calls with the same arguments.
+    The result of the default arguments, which `report` uses, is cached under
+    the name of the method.
+
+    ```python
+    class MyTest(ABTestReport):
+        @metric("conversion_rate")
+        def conversion_uplift(self):
+            return (self.B_cr - self.A_cr) / self.A_cr
+    ```
+
+    :param depends_on: names of the metrics that have to be computed first
+    """
+
+    def decorator(method):
+        signature = inspect.signature(method)
+        defaults = tuple(
+            parameter.default for parameter in signature.parameters.values()
+        )[1:]
+
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = method.__name__
+            if args or kwargs:
+                bound = signature.bind(self, *args, **kwargs)
+                bound.apply_defaults()
+                arguments = bound.args[1:]
+                if arguments != defaults:
+                    key = (method.__name__, arguments)
+
+            cache = self.__dict__.setdefault("_metric_cache", {})
+            if key not in cache:
+                for dependency in depends_on:
+                    getattr(self, dependency)()
+                cache[key] = method(self, *args, **kwargs)
+
+            return cache[key]
+
+        wrapper.depends_on = depends_on
+
+        return wrapper
+
+    return decorator
+
+
+class ABTestReport:
+    """Report generation for the AB test classes
+
+    `report_metrics` maps the keys of the report to the metrics that compute
+    them. Metrics returning one value per group are reported as `{"a": .., "b": ..}`.
+    """
+
+    report_metrics = {}
+
+    def report(self, with_data=None, pipeline=None):
+        """Run pipeline and generate report
+
+        :param with_data: whether to include the input data in the report, defaults to True
+        :param pipeline: report keys or metric names to compute, defaults to "all".
+            Only the requested metrics and the metrics they depend on are computed.
+        :return: report of the requested metrics
+        :rtype: dict
+        """
+        if pipeline is None:
+            pipeline = "all"
+        if with_data is None:
+            with_data = True
+
+        if pipeline == "all":
+            pipeline = list(self.report_metrics)
+        elif isinstance(pipeline, str):
+            pipeline = [pipeline]
+
+        report_keys = {meth: key for key, meth in self.report_metrics.items()}
+
+        res = {}
+        for key in pipeline:
+            key = report_keys.get(key, key)
+            if key not in self.report_metrics:
+                raise Exception(
+                    f"{key} is not a metric of {self.__class__.__name__}, "
+                    f"available metrics: {list(self.report_metrics)}"
+                )
+
+            value = getattr(self, self.report_metrics[key])()
+            if isinstance(value, tuple):
+                value = {"a": value[0], "b": value[1]}
+            res[key] = value
+
+        if self.name is not None:
+            res["name"] = self.name
+        if with_data:
+            res["data"] = self.data
+
+        return res
+
+    def result(self):
+        """Compact result with scalar fields that references the input data
+
+        See `dietbox.abtest.results.ABTestResult`.
+        """
+
+        return ABTestResult.from_test(self)
+
+
+class ABTestRatiosNaive(ABTestReport):
     """A naive AB Test ratios class
     """
+
+    report_metrics = {
+        "kpi": "conversion_rate",
+        "std_err": "standard_error",
+        "pooled_std_err": "pooled_std_err",
+        "probability": "pooled_probability",
+        "uplift": "conversion_uplift",
+        "p_value": "p_value",
+        "z_score": "z_score",
+        "diff_std_err": "difference_std_err",
+    }
+
     def __init__(self, ab_test_data, test_name=None):
 
         self.data = ab_test_data
@@ -27,6 +165,7 @@ class ABTestRatiosNaive:
         else:
             self.name = None
 
+    @metric()
     def conversion_rate(self):
         """Conversion rate for a specific group"""
 
@@ -35,6 +174,7 @@ class ABTestRatiosNaive:
 
         return self.A_cr, self.B_cr
 
+    @metric()
     def standard_error(self):
         """standard error"""
 
@@ -43,6 +183,7 @@ class ABTestRatiosNaive:
 
         return self.A_std_err, self.B_std_err
 
+    @metric()
     def pooled_probability(self):
         """Pooled probability for two samples
 
@@ -62,6 +203,7 @@ class ABTestRatiosNaive:
 
         return self.probability
 
+    @metric("pooled_probability")
     def pooled_std_err(self):
         """Pooled standard error for two samples
 
@@ -69,14 +211,13 @@ class ABTestRatiosNaive:
         https://en.wikipedia.org/wiki/Pooled_variance
         """
 
-        self.pooled_probability()
-
         # Pooled standard error
         pp = self.probability
         self.pld_std_err = cal_pooled_std_err(pp, self.A_total, self.B_total)
 
         return self.pld_std_err
 
+    @metric()
     def conversion_uplift(self):
         """Uplift in conversion rate
 
@@ -94,20 +235,20 @@ class ABTestRatiosNaive:
 
         return self.uplift
 
+    @metric()
     def p_value(self, test=None):
         """calculate p-value"""
 
-        # self.conversion_rate()
-
         self.p = cal_p_value(self.data)
 
         return self.p
 
+    @metric()
     def z_score(self, significance_level=None, two_tailed=None):
         """Calculate z-score"""
 
         if significance_level is None:
-            significance_level = self.p
+            significance_level = self.p_value()
 
         if two_tailed is None:
             two_tailed = True
@@ -116,6 +257,7 @@ class ABTestRatiosNaive:
 
         return self.z
 
+    @metric()
     def difference_std_err(self):
         """"""
 
@@ -132,42 +274,8 @@ class ABTestRatiosNaive:
 
         return self.diff_std_err
 
-    def report(self, with_data=None, pipeline=None):
-        """Run pipeline and"""
-        if pipeline is None:
-            pipeline = "all"
-        if with_data is None:
-            with_data = True
-
-        all_pipes = [
-            meth
-            for meth in dir(self)
-            if callable(getattr(self, meth)) and "__" not in meth and meth != "report"
-        ]
-
-        for method in all_pipes:
-            getattr(self, method)()
-
-        res = {
-            "kpi": {"a": self.A_cr, "b": self.B_cr},
-            "std_err": {"a": self.A_std_err, "b": self.B_std_err},
-            "pooled_std_err": self.pld_std_err,
-            "probability": self.probability,
-            "uplift": self.uplift,
-            "p_value": self.p,
-            "z_score": self.z,
-            "diff_std_err": self.diff_std_err,
-        }
-
-        if self.name:
-            res["name"] = self.name
-        if with_data:
-            res["data"] = self.data
-
-        return res
 
-
-class ABTestRatios:
+class ABTestRatios(ABTestReport):
     """This test uses the difference between the ratios $d=A_cr - B_cr$ as the signature.
 
     According to central limit theorem, we could approximate the distribution of d as a normal distribution.
@@ -177,6 +285,17 @@ class ABTestRatios:
 
     """
 
+    report_metrics = {
+        "kpi": "conversion_rate",
+        "std_err": "standard_error",
+        "pooled_std_err": "pooled_std_err",
+        "probability": "pooled_probability",
+        "uplift": "conversion_uplift",
+        "p_value": "p_value",
+        "z_score": "z_score",
+        "diff_std_err": "difference_std_err",
+    }
+
     def __init__(self, ab_test_data, test_name=None):
 
         self.data = ab_test_data
@@ -189,6 +308,7 @@ class ABTestRatios:
         else:
             self.name = None
 
+    @metric()
     def conversion_rate(self):
         """Conversion rate for a specific group"""
 
@@ -197,6 +317,7 @@ class ABTestRatios:
 
         return self.A_cr, self.B_cr
 
+    @metric()
     def standard_error(self):
         """standard error"""
 
@@ -205,6 +326,7 @@ class ABTestRatios:
 
         return self.A_std_err, self.B_std_err
 
+    @metric()
     def conversion_uplift(self):
         """Uplift in conversion rate
 
@@ -222,6 +344,7 @@ class ABTestRatios:
 
         return self.uplift
 
+    @metric()
     def pooled_probability(self):
         """Pooled probability for two samples
 
@@ -241,6 +364,7 @@ class ABTestRatios:
 
         return self.probability
 
+    @metric("pooled_probability")
     def pooled_std_err(self):
         """Pooled standard error for two samples
 
@@ -248,14 +372,13 @@ class ABTestRatios:
         https://en.wikipedia.org/wiki/Pooled_variance
         """
 
-        self.pooled_probability()
-
         # Pooled standard error
         pp = self.probability
         self.pld_std_err = cal_pooled_std_err(pp, self.A_total, self.B_total)
 
         return self.pld_std_err
 
+    @metric()
     def difference_std_err(self):
         """"""
 
@@ -272,34 +395,42 @@ class ABTestRatios:
 
         return self.diff_std_err
 
+    @metric("pooled_std_err")
     def null_distribution(self):
-        """Generate the distribution for the null hypothesis"""
+        """Generate the distribution for the null hypothesis
 
-        self.pooled_std_err()
+        :return: frozen `scipy.stats.norm`
+        """
 
         return scs.norm(0, self.pld_std_err)
 
+    @metric("conversion_uplift", "pooled_std_err")
     def alt_distribution(self):
-        """Generate the distribution for the null hypothesis"""
+        """Generate the distribution for the alternative hypothesis
 
-        self.conversion_uplift()
-        self.pooled_std_err()
+        :return: frozen `scipy.stats.norm`
+        """
 
         return scs.norm(self.uplift, self.pld_std_err)
 
+    @metric("conversion_uplift", "pooled_std_err")
     def p_value(self):
+        """p-value of the uplift under the null distribution
 
-        self.conversion_uplift()
+        The survival function of the null distribution is evaluated with the
+        kernel `dietbox.abtest.normal.norm_sf`, without creating the frozen
+        scipy distribution.
+        """
 
-        nd = self.null_distribution()
-        ad = self.alt_distribution()
+        self.p = norm_sf(self.uplift, loc=0, scale=self.pld_std_err)
 
-        self.p = nd.sf(self.uplift)
+        return self.p
 
+    @metric()
     def z_score(self, significance_level=None, two_tailed=None):
 
         if significance_level is None:
-            significance_level = self.p
+            significance_level = self.p_value()
 
         if two_tailed is None:
             two_tailed = True
@@ -308,44 +439,112 @@ class ABTestRatios:
 
         return self.z
 
-    def report(self, with_data=None, pipeline=None):
-        """Run pipeline and generate report"""
-        if pipeline is None:
-            pipeline = "all"
-        if with_data is None:
-            with_data = True
 
-        all_pipes = [
-            meth
-            for meth in dir(self)
-            if callable(getattr(self, meth)) and "__" not in meth and meth != "report"
-        ]
-
-        for method in all_pipes:
-            getattr(self, method)()
-
-        res = {
-            "kpi": {"a": self.A_cr, "b": self.B_cr},
-            "std_err": {"a": self.A_std_err, "b": self.B_std_err},
-            "pooled_std_err": self.pld_std_err,
-            "probability": self.probability,
-            "uplift": self.uplift,
-            "p_value": self.p,
-            "z_score": self.z,
-            "diff_std_err": self.diff_std_err,
-        }
-
-        if self.name:
-            res["name"] = self.name
-        if with_data:
-            res["data"] = self.data
+def _as_moments(moments):
+    """`MomentsAccumulator` from sums, moments or a list of partial statistics"""
+
+    if moments is None:
+        raise Exception(
+            "ab_test_data requires A_series and B_series, or A_moments and B_moments"
+        )
+    if isinstance(moments, (list, tuple)):
+        merged = MomentsAccumulator()
+        for partial in moments:
+            merged.merge(_as_moments(partial))
+        return merged
+    if isinstance(moments, MomentsAccumulator):
+        return moments
+    if "sum_squares" in moments:
+        return MomentsAccumulator.from_sums(**moments)
+
+    accumulator = MomentsAccumulator(moments)
+    if "non_zero" not in moments:
+        # unknown, instead of no non zero elements
+        accumulator.non_zero = np.nan
+
+    return accumulator
 
-        return res
 
+def _stream_series(series, kpi_method, chunk_size, dtype):
+    """Chunks of a streamed series, whether each value is non zero for `count`
 
-class ABTestSeries:
-    """AB test of series data"""
-    def __init__(self, ab_test_data, kpi_method=None, test_name=None):
+    The moments of the indicator give the same counts as the moments of the
+    series, and CUPED of `count` adjusts the mean of the indicator.
+    """
+
+    chunks = iter_series_chunks(series, chunk_size=chunk_size, dtype=dtype)
+    if kpi_method == "count":
+        return (chunk != 0 for chunk in chunks)
+
+    return chunks
+
+
+def _keep_series(series, dtype):
+    """Series kept after streaming, files are opened as memory maps"""
+
+    if is_series_file(series):
+        return open_series(series, dtype=dtype)
+    if isinstance(series, np.ndarray) or hasattr(series, "__len__"):
+        return series
+
+    # iterators of chunks are used up
+    return None
+
+
+class ABTestSeries(ABTestReport):
+    """AB test of series data
+
+    With pre-period covariates `A_covariate` and `B_covariate` in
+    `ab_test_data`, the report also includes the CUPED adjusted KPIs for the
+    kpi methods of `cuped_kpi_methods`, see `cuped`.
+
+    Instead of the series, `ab_test_data` can hold the sufficient statistics
+    of each group as `A_moments` and `B_moments`, e.g., aggregated in SQL,
+    Spark or a streaming job:
+
+    - a dict of sums `{"total": n, "sum": ..., "sum_squares": ..., "non_zero": ...}`,
+    - a `dietbox.abtest.moments.MomentsAccumulator` or its `to_dict`,
+    - a list of the above, e.g., partial statistics of chunks or workers,
+      which are merged.
+
+    Without series, the p-value is Welch's t-test of the KPIs, see
+    `dietbox.abtest.moments.cal_welch_test`. If the moments include a
+    covariate, e.g., with the `covariate_sum`, `covariate_sum_squares` and
+    `cross_sum` sums, the report includes CUPED for `sum` and `all_avg`.
+
+    `A_series` and `B_series`, and the covariates, can also be paths of
+    `.npy` files or raw binary dumps of `dtype`, `np.memmap` objects or
+    iterators of chunks. They are reduced to moments in one chunked pass,
+    see `dietbox.abtest.moments.iter_series_chunks`, so the memory stays
+    bounded however long the series are. Files and memory maps are kept for
+    the default Mann-Whitney p-value, which counts the values chunk by chunk,
+    so its memory grows with the number of distinct values instead of the
+    length of the series, and for the tests that need the whole series, e.g.,
+    the permutation test, which then loads them. Iterators of chunks are used
+    up, so their default p-value is Welch's t-test.
+
+    ```python
+    ABTestSeries(
+        {
+            "A_moments": {"total": 1000, "sum": 70.5, "sum_squares": 84.2},
+            "B_moments": {"total": 1100, "sum": 95.1, "sum_squares": 110.7},
+        },
+        kpi_method="all_avg",
+    ).report()
+    ```
+    """
+
+    report_metrics = {
+        "kpi": "kpi",
+        "std_err": "standard_error",
+        "uplift": "kpi_uplift",
+        "p_value": "p_value",
+    }
+    cuped_kpi_methods = ("sum", "count", "all_avg")
+
+    def __init__(
+        self, ab_test_data, kpi_method=None, test_name=None, chunk_size=None, dtype=None
+    ):
 
         if test_name:
             self.name = test_name
@@ -356,14 +555,60 @@ class ABTestSeries:
         self.A_series = ab_test_data.get("A_series")
         self.B_series = ab_test_data.get("B_series")
 
-        self.A_total = len(self.A_series)
-        self.B_total = len(self.B_series)
+        self.A_covariate = ab_test_data.get("A_covariate")
+        self.B_covariate = ab_test_data.get("B_covariate")
 
         if kpi_method is None:
             self.kpi_method = "sum"
         else:
             self.kpi_method = kpi_method
 
+        if (
+            self.A_covariate is not None
+            and self.B_covariate is not None
+            and self.kpi_method in self.cuped_kpi_methods
+        ):
+            self.report_metrics = dict(self.report_metrics, cuped="cuped")
+
+        self.chunk_size = chunk_size
+        self.A_moments, self.B_moments = None, None
+        self.streaming = any(
+            series is not None and is_series_stream(series)
+            for series in (self.A_series, self.B_series)
+        )
+        if self.streaming:
+            if self.A_covariate is None or self.B_covariate is None:
+                covariates = (None, None)
+            else:
+                covariates = (self.A_covariate, self.B_covariate)
+            self.A_moments, self.B_moments = (
+                cal_moments(
+                    _stream_series(series, self.kpi_method, chunk_size, dtype),
+                    covariate,
+                    chunk_size=chunk_size,
+                    dtype=dtype,
+                )
+                for series, covariate in zip((self.A_series, self.B_series), covariates)
+            )
+            self.A_series = _keep_series(self.A_series, dtype)
+            self.B_series = _keep_series(self.B_series, dtype)
+        elif self.A_series is None or self.B_series is None:
+            self.A_moments = _as_moments(ab_test_data.get("A_moments"))
+            self.B_moments = _as_moments(ab_test_data.get("B_moments"))
+            # moments with a covariate support CUPED of sums and means
+            pooled = self.A_moments + self.B_moments
+            if pooled.covariate_m2 > 0 and self.kpi_method in ("sum", "all_avg"):
+                self.report_metrics = dict(self.report_metrics, cuped="cuped")
+
+        if self.A_moments is not None:
+            self.A_total, self.B_total = self.A_moments.total, self.B_moments.total
+            self.A_converted = self._cal_converted(self.A_moments)
+            self.B_converted = self._cal_converted(self.B_moments)
+            return
+
+        self.A_total = len(self.A_series)
+        self.B_total = len(self.B_series)
+
         if self.kpi_method == "sum":
             self.A_converted = np.sum(self.A_series)
             self.B_converted = np.sum(self.B_series)
@@ -377,6 +622,43 @@ class ABTestSeries:
             self.A_converted = np.sum(self.A_series) / len(self.A_series)
             self.B_converted = np.sum(self.B_series) / len(self.B_series)
 
+    def _cal_converted(self, moments):
+        """`A_converted` or `B_converted` from the moments of a group"""
+
+        if self.kpi_method in ("count", "non_zero_avg") and np.isnan(moments.non_zero):
+            raise Exception(
+                f"kpi_method {self.kpi_method} requires non_zero in the moments "
+                "of both groups"
+            )
+
+        if self.kpi_method == "sum":
+            return moments.sum
+        elif self.kpi_method == "count":
+            return moments.non_zero
+        elif self.kpi_method == "non_zero_avg":
+            return moments.sum / moments.non_zero
+        elif self.kpi_method == "all_avg":
+            return moments.mean
+
+    def _require_series(self, method):
+        if self.A_series is None or self.B_series is None:
+            raise Exception(f"{method} requires A_series and B_series in ab_test_data")
+
+    @metric()
+    def moments(self):
+        """Moments of the series of both groups, or the given sufficient statistics
+
+        For streamed series and the kpi method `count`, these are the moments
+        of whether each value is non zero.
+        """
+
+        if self.A_moments is None:
+            self.A_moments = cal_moments(self.A_series)
+            self.B_moments = cal_moments(self.B_series)
+
+        return self.A_moments, self.B_moments
+
+    @metric()
     def kpi(self):
         """Conversion rate for a specific group"""
 
@@ -389,6 +671,7 @@ class ABTestSeries:
 
         return self.A_kpi, self.B_kpi
 
+    @metric()
     def standard_error(self):
         """standard error"""
 
@@ -397,6 +680,7 @@ class ABTestSeries:
 
         return self.A_std_err, self.B_std_err
 
+    @metric("kpi")
     def kpi_uplift(self):
         """Uplift in conversion rate
 
@@ -407,44 +691,133 @@ class ABTestSeries:
 
         return self.uplift
 
-    def p_value(self):
-        """calculate p-value"""
+    @metric()
+    def p_value(self, method=None, n_permutations=None, n_jobs=None, seed=None):
+        """calculate p-value
 
-        self.kpi()
+        The default method is the Mann-Whitney U test. `method="permutation"`
+        runs a permutation test of the difference of the KPIs on a process
+        pool, with early stopping once the p-value is clearly above or below
+        0.05, see `dietbox.abtest.permutation.cal_permutation_test`.
 
-        self.p = cal_p_value(self.data, test="mannwhitney")
+        `method="welch"` and `method="z"` test the difference of the KPIs
+        from the moments of the groups, see
+        `dietbox.abtest.moments.cal_welch_test`. Without series, the default
+        method is `"welch"`.
+        """
+
+        if method is None:
+            if self.A_series is None or self.B_series is None:
+                method = "welch"
+            else:
+                method = "mannwhitney"
+
+        if method in ("welch", "z"):
+            self.welch_test = cal_welch_test(
+                *self.moments(), kpi_method=self.kpi_method, test=method
+            )
+            self.p = self.welch_test["p_value"]
+            return self.p
+
+        self._require_series(f"p-value method {method}")
+        if method == "mannwhitney":
+            A_data, B_data = self.A_series, self.B_series
+            if self.streaming:
+                # files and memory maps are counted chunk by chunk
+                A_data, B_data = (
+                    iter_series_chunks(series, chunk_size=self.chunk_size)
+                    for series in (A_data, B_data)
+                )
+            self.p = cal_p_value(
+                {"A_series": A_data, "B_series": B_data}, test="mannwhitney"
+            )
+        elif method == "permutation":
+            self.permutation_test = cal_permutation_test(
+                self.A_series,
+                self.B_series,
+                kpi_method=self.kpi_method,
+                n_permutations=n_permutations,
+                n_jobs=n_jobs,
+                seed=seed,
+            )
+            self.p = self.permutation_test["p_value"]
+        else:
+            raise Exception(
+                f"method should be mannwhitney, permutation, welch or z: {method}"
+            )
 
         return self.p
 
-    def report(self, with_data=None, pipeline=None):
-        """Run pipeline and"""
-        if pipeline is None:
-            pipeline = "all"
-        if with_data is None:
-            with_data = True
+    @metric()
+    def cuped(self, chunk_size=None):
+        """CUPED adjusted KPIs using the pre-period covariates
 
-        all_pipes = [
-            meth
-            for meth in dir(self)
-            if callable(getattr(self, meth)) and "__" not in meth and meth != "report"
-        ]
+        The series and covariates are reduced chunk by chunk to streaming
+        moments, see `dietbox.abtest.cuped.cal_cuped`. Supported for the kpi
+        methods `sum`, `all_avg` and `count`, where the series is reduced to
+        whether each value is non zero.
 
-        for method in all_pipes:
-            getattr(self, method)()
+        Without series, the CUPED adjusted KPIs are computed from
+        `A_moments` and `B_moments`, which then have to include the moments
+        of the covariate, for the kpi methods `sum` and `all_avg`.
+        """
 
-        res = {
-            "kpi": {"a": self.A_kpi, "b": self.B_kpi},
-            "std_err": {"a": self.A_std_err, "b": self.B_std_err},
-            "uplift": self.uplift,
-            "p_value": self.p,
-        }
+        if self.A_series is None or self.B_series is None or self.streaming:
+            kpi_method = self.kpi_method
+            if self.streaming and kpi_method == "count":
+                # the moments are of whether each value is non zero
+                kpi_method = "all_avg"
+            self.cuped_result = cal_cuped(
+                self.A_moments, self.B_moments, kpi_method=kpi_method
+            )
+            self.cuped_theta = self.cuped_result["theta"]
+            return self.cuped_result
 
-        if self.name:
-            res["name"] = self.name
-        if with_data:
-            res["data"] = self.data
+        if self.A_covariate is None or self.B_covariate is None:
+            raise Exception("CUPED requires A_covariate and B_covariate in ab_test_data")
 
-        return res
+        if self.kpi_method == "count":
+            A_series = np.asarray(self.A_series) != 0
+            B_series = np.asarray(self.B_series) != 0
+            kpi_method = "all_avg"
+        else:
+            A_series, B_series = self.A_series, self.B_series
+            kpi_method = self.kpi_method
+
+        self.cuped_result = cal_cuped_series(
+            A_series,
+            B_series,
+            self.A_covariate,
+            self.B_covariate,
+            kpi_method=kpi_method,
+            chunk_size=chunk_size,
+        )
+        self.cuped_theta = self.cuped_result["theta"]
+
+        return self.cuped_result
+
+    def bootstrap_interval(
+        self, n_resamples=None, confidence_level=None, n_jobs=None, seed=None
+    ):
+        """Bootstrap percentile and BCa confidence intervals of the KPI uplift
+
+        The resamples are spread over a process pool, see
+        `dietbox.abtest.bootstrap.cal_bootstrap_uplift_interval`.
+        """
+
+        self._require_series("bootstrap_interval")
+
+        self.uplift_interval = cal_bootstrap_uplift_interval(
+            self.A_series,
+            self.B_series,
+            kpi_method=self.kpi_method,
+            n_resamples=n_resamples,
+            confidence_level=confidence_level,
+            n_jobs=n_jobs,
+            seed=seed,
+        )
+
+        return self.uplift_interval
 
 
 if __name__ == "__main__":
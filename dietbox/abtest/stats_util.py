@@ -1,11 +1,25 @@
 import numpy as np
 import scipy.stats as scs
+from dietbox.abtest.normal import cal_critical_value
+from dietbox.abtest.rank import cal_mannwhitneyu
 
 
 def cal_conversion_rate(X_total, X_converted):
-    """Conversion rate for a specific group"""
+    """Conversion rate for a specific group
 
-    X_cr = X_converted / X_total if X_total != 0 else 0
+    Array inputs are broadcast against each other; groups with zero total get a
+    conversion rate of 0, the same as for scalar inputs.
+    """
+
+    if np.ndim(X_total) == 0 and np.ndim(X_converted) == 0:
+        X_cr = X_converted / X_total if X_total != 0 else 0
+    else:
+        X_total, X_converted = np.broadcast_arrays(
+            np.asarray(X_total, dtype=float), np.asarray(X_converted, dtype=float)
+        )
+        X_cr = np.divide(
+            X_converted, X_total, out=np.zeros(X_total.shape), where=X_total != 0
+        )
 
     return X_cr
 
@@ -43,6 +57,37 @@ def cal_conversion_uplift(A_total, B_total, A_converted, B_converted):
     return the_uplift
 
 
+def cal_series_kpi(X_total, X_sum, X_non_zero, kpi_method=None):
+    """KPI of a series from its length, sum and number of non-zero elements
+
+    The KPIs are the ones of `ABTestSeries`:
+
+    - `"sum"`: sum of the series,
+    - `"count"`: fraction of non-zero elements,
+    - `"non_zero_avg"`: average of the non-zero elements,
+    - `"all_avg"`: average of all elements.
+
+    :param X_total: length of the series
+    :param X_sum: sum of the series
+    :param X_non_zero: number of non-zero elements of the series
+    :param kpi_method: kpi method, defaults to `"sum"`
+    """
+
+    if kpi_method is None:
+        kpi_method = "sum"
+
+    if kpi_method == "sum":
+        return X_sum
+    elif kpi_method == "count":
+        return cal_conversion_rate(X_total, X_non_zero)
+    elif kpi_method == "non_zero_avg":
+        return X_sum / X_non_zero
+    elif kpi_method == "all_avg":
+        return X_sum / X_total
+    else:
+        raise Exception(f"kpi_method {kpi_method} is not supported")
+
+
 def cal_pooled_probability(A_total, B_total, A_converted, B_converted):
     """Pooled probability for two samples
 
@@ -76,6 +121,8 @@ def cal_z_score(significance_level=None, two_tailed=None):
 
     It is better that the user read this Nature article before using this function:
     https://www.nature.com/articles/d41586-019-00857-9
+
+    The significance level can also be an array, e.g., a grid of levels.
     """
 
     if significance_level is None:
@@ -84,17 +131,7 @@ def cal_z_score(significance_level=None, two_tailed=None):
     if two_tailed is None:
         two_tailed = True
 
-    ## construct a z distribution
-    z_distribution = scs.norm()
-
-    if two_tailed:
-        significance_level = significance_level / 2
-        no_rejection_level = 1 - significance_level
-    else:
-        no_rejection_level = 1 - significance_level
-
-    ## generate z distribution
-    z_score = z_distribution.ppf(no_rejection_level)
+    z_score = cal_critical_value(significance_level, two_tailed)
 
     return z_score
 
@@ -114,8 +151,68 @@ def cal_confidence_interval(sample_mean=0, sample_std=1, sample_size=1, sig_leve
     return (left, right)
 
 
+def cal_binom_test_p_value(X_converted, X_total, probability, log=None):
+    """Exact one-sided binomial test
+
+    The p-value is the upper tail $P(X \\geq X_{converted})$ of
+    $X \\sim Binom(X_{total}, probability)$, the same as
+    `scipy.stats.binom_test(..., alternative="greater")`, computed with
+    `binom.sf` for scalar or array inputs.
+
+    With `log=True`, tails that underflow in double precision, e.g., for
+    totals of tens of millions, are computed in log space from the first term
+    of the tail and the geometric series bounding the rest of it. For those
+    tails the result is an upper bound of the log p-value, not its exact
+    value. The bound is tight when the terms of the tail decay quickly, e.g.,
+    it exceeds the exact log tail of $P(X \geq 5000)$ for
+    $X \sim Binom(10^6, 0.001)$, about -4060.16, by about $10^{-5}$.
+
+    :param X_converted: number of conversions
+    :param X_total: number of trials
+    :param probability: conversion probability under the null hypothesis
+    :param log: whether to return the log of the p-value, defaults to False
+    :return: p-value or its log
+    """
+
+    if log is None:
+        log = False
+
+    X_converted = np.asarray(X_converted, dtype=float)
+    X_total = np.asarray(X_total, dtype=float)
+    probability = np.asarray(probability, dtype=float)
+
+    p_value = np.asarray(scs.binom.sf(X_converted - 1, X_total, probability))
+
+    if not log:
+        return p_value[()]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_p_value = np.log(p_value)
+
+        underflow = (p_value == 0) & (X_converted > X_total * probability)
+        if np.any(underflow):
+            ratio = (
+                (X_total - X_converted)
+                / (X_converted + 1)
+                * probability
+                / (1 - probability)
+            )
+            log_tail = scs.binom.logpmf(X_converted, X_total, probability) - np.log1p(
+                -ratio
+            )
+            log_p_value = np.where(underflow, log_tail, log_p_value)
+
+    return log_p_value[()]
+
+
 def cal_p_value(data, test=None):
-    """p-value for the ratio test"""
+    """p-value for the ratio test
+
+    The data can hold scalars for one experiment or arrays for many
+    experiments for the binomial test. For the Mann-Whitney U test, the
+    series can also be histograms or iterators of chunks, see
+    `dietbox.abtest.rank.cal_mannwhitneyu`.
+    """
 
     if test is None:
         test = "binom"
@@ -127,17 +224,14 @@ def cal_p_value(data, test=None):
             data.get("A_converted"),
             data.get("B_converted"),
         )
-        if data.get("A_cr") and data.get("B_cr"):
+        if data.get("A_cr") is not None:
             p_A = data.get("A_cr")
-            p_B = data.get("B_cr")
         else:
             p_A = cal_conversion_rate(A_total, A_converted)
-            p_B = cal_conversion_rate(B_total, B_converted)
-        return scs.binom_test(B_converted, n=B_total, p=p_A, alternative="greater")
-        # return scs.binom(A_total, p_A).sf(B_total * p_B)
+        return cal_binom_test_p_value(B_converted, B_total, p_A)
     elif test == "mannwhitney":
         A_data, B_data = data.get("A_series"), data.get("B_series")
-        _, test_mannwhitney_p_value = scs.mannwhitneyu(x=A_data, y=B_data)
+        _, test_mannwhitney_p_value = cal_mannwhitneyu(A_data, B_data)
 
         return test_mannwhitney_p_value
 
@@ -155,7 +249,7 @@ def ab_dist(stderr, d_hat=0, group_type="control"):
         group_type (string): 'control' and 'test' are supported
 
     Returns:
-        dist (scipy.stats distribution object)
+        dist (frozen scipy.stats.norm)
     """
     if group_type == "control":
         sample_mean = 0
@@ -0,0 +1,343 @@
+import datetime
+import hashlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+import simplejson as json
+from dietbox.abtest.moments import MomentsAccumulator
+from dietbox.abtest.results import ABTestResult, ABTestResultCollection
+from dietbox.data.wrangling.json import isoencode
+
+
+def _update_hash_buffer(digest, array, chunk_bytes=None):
+    """Feed the elements of an array in C order into a hash
+
+    Contiguous arrays are hashed from their buffer. Other arrays, e.g.,
+    slices or Fortran ordered arrays, are copied in blocks of rows of about
+    `chunk_bytes`, which give the same bytes as one contiguous copy.
+    """
+
+    if chunk_bytes is None:
+        chunk_bytes = 2**20
+
+    if array.flags.c_contiguous or array.ndim == 0:
+        digest.update(memoryview(np.ascontiguousarray(array)).cast("B"))
+        return
+
+    rows = max(1, chunk_bytes // max(1, array[0].nbytes))
+    for start in range(0, len(array), rows):
+        block = np.ascontiguousarray(array[start : start + rows])
+        digest.update(memoryview(block).cast("B"))
+
+
+def _update_hash_file(digest, path, chunk_bytes=None):
+    """Feed the content of a file into a hash, read in blocks of `chunk_bytes`
+
+    Modification times can be too coarse to notice a rewritten file, so the
+    content is hashed, which is still much cheaper than a test on it.
+    """
+
+    if chunk_bytes is None:
+        chunk_bytes = 2**20
+
+    digest.update(f"file{os.path.getsize(path)}".encode())
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(chunk_bytes), b""):
+            digest.update(block)
+
+
+def _update_hash(digest, value, key=None):
+    """Feed a value of `ab_test_data` into a hash
+
+    :raises TypeError: for values that can not be hashed, e.g., iterators
+    """
+
+    if isinstance(value, pd.DataFrame):
+        for column in sorted(value.columns, key=str):
+            digest.update(str(column).encode())
+            _update_hash(digest, value[column].to_numpy())
+        _update_hash(digest, value.index.to_numpy())
+    elif isinstance(value, dict):
+        for name in sorted(value, key=str):
+            digest.update(str(name).encode())
+            _update_hash(digest, value[name], key=name)
+    elif isinstance(value, MomentsAccumulator):
+        _update_hash(digest, value.to_dict())
+    elif isinstance(value, (np.ndarray, pd.Series, list, tuple)):
+        array = np.asarray(value)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        if array.dtype == object:
+            for item in array.ravel():
+                _update_hash(digest, item)
+        else:
+            _update_hash_buffer(digest, array)
+    elif isinstance(value, os.PathLike) or (
+        # strings of series are paths of files, see ABTestSeries
+        isinstance(value, str)
+        and str(key).endswith(("_series", "_covariate"))
+    ):
+        _update_hash_file(digest, value)
+    elif isinstance(value, np.generic):
+        digest.update(repr(value.item()).encode())
+    elif value is None or isinstance(value, (bool, int, float, str)):
+        digest.update(repr(value).encode())
+    elif isinstance(value, (datetime.date, datetime.datetime)):
+        digest.update(json.dumps(value, default=isoencode).encode())
+    else:
+        raise TypeError(
+            f"can not fingerprint {type(value).__name__}, e.g., iterators of "
+            "chunks are used up by the test"
+        )
+
+
+def cal_fingerprint(ab_test_data, **config):
+    """Hash of the inputs and configuration of an AB test
+
+    Contiguous arrays are hashed from their buffers without copies, and other
+    arrays in small contiguous blocks, so fingerprinting is much cheaper than
+    rerunning a test on large series. Files, i.e., paths and strings of
+    series, are hashed by their content, and `MomentsAccumulator` by its
+    moments.
+
+    :param ab_test_data: input data of the test
+    :param config: configuration of the test, e.g., the class name and kpi method
+    :return: hex digest
+    :rtype: str
+    :raises TypeError: for values that can not be fingerprinted, e.g.,
+        iterators of chunks
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    _update_hash(digest, config)
+    _update_hash(digest, ab_test_data)
+
+    return digest.hexdigest()
+
+
+class ABTestResultStore:
+    """Persistent store of AB test results keyed by input fingerprints
+
+    Results are kept in an SQLite table with one column per field of
+    `ABTestResult`. `run` computes only the experiments whose inputs or
+    configuration changed since they were stored and serves the rest from
+    the store.
+
+    ```python
+    with ABTestResultStore("results.sqlite") as store:
+        results = store.run(ABTestRatios, experiments)
+        store.mark_finished(["old_experiment"])
+        store.evict(finished_ttl=30 * 86400)
+    ```
+
+    :param path: SQLite database file, defaults to an in-memory database
+    """
+
+    fields = ABTestResult.fields
+
+    def __init__(self, path=None):
+
+        if path is None:
+            path = ":memory:"
+
+        self.path = str(path)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "fingerprint TEXT PRIMARY KEY, name TEXT, "
+            + ", ".join(f"{field} REAL" for field in self.fields)
+            + ", finished INTEGER DEFAULT 0, created_at REAL, used_at REAL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS results_name ON results (name)"
+        )
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def get_many(self, fingerprints):
+        """Stored results of fingerprints
+
+        :param fingerprints: list of fingerprints
+        :return: results of the fingerprints found in the store
+        :rtype: dict
+        """
+
+        res = {}
+        fingerprints = list(fingerprints)
+        # stay below the limit of SQLite on the number of parameters
+        for start in range(0, len(fingerprints), 500):
+            chunk = fingerprints[start : start + 500]
+            rows = self.connection.execute(
+                f"SELECT fingerprint, name, {', '.join(self.fields)} FROM results "
+                f"WHERE fingerprint IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            for fingerprint, name, *values in rows:
+                metrics = {
+                    field: np.nan if value is None else value
+                    for field, value in zip(self.fields, values)
+                }
+                res[fingerprint] = ABTestResult(name=name, **metrics)
+
+        if res:
+            now = time.time()
+            self.connection.executemany(
+                "UPDATE results SET used_at = ? WHERE fingerprint = ?",
+                ((now, fingerprint) for fingerprint in res),
+            )
+            self.connection.commit()
+
+        return res
+
+    def get(self, fingerprint):
+        """Stored result of a fingerprint, or None"""
+
+        return self.get_many([fingerprint]).get(fingerprint)
+
+    def put_many(self, results):
+        """Store results
+
+        :param results: dict of fingerprint to `ABTestResult`
+        """
+
+        now = time.time()
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO results "
+            f"(fingerprint, name, {', '.join(self.fields)}, created_at, used_at) "
+            f"VALUES ({', '.join('?' * (len(self.fields) + 4))})",
+            (
+                (
+                    fingerprint,
+                    None if result.name is None else str(result.name),
+                    *(getattr(result, field) for field in self.fields),
+                    now,
+                    now,
+                )
+                for fingerprint, result in results.items()
+            ),
+        )
+        self.connection.commit()
+
+    def put(self, fingerprint, result):
+        """Store one result"""
+
+        self.put_many({fingerprint: result})
+
+    def run(self, ab_test_class, experiments, **config):
+        """Results of many experiments, recomputing only changed ones
+
+        :param ab_test_class: AB test class, e.g., `ABTestRatios`
+        :param experiments: dict of experiment names to `ab_test_data`
+        :param config: keyword arguments of the AB test class, also part of
+            the fingerprint
+        :return: results in the order of the experiments
+        :rtype: ABTestResultCollection
+        """
+
+        fingerprints = {
+            name: cal_fingerprint(
+                ab_test_data, ab_test_class=ab_test_class.__name__, name=name, **config
+            )
+            for name, ab_test_data in experiments.items()
+        }
+        stored = self.get_many(fingerprints.values())
+
+        computed = {}
+        for name, ab_test_data in experiments.items():
+            if fingerprints[name] not in stored:
+                ab_test = ab_test_class(ab_test_data, test_name=name, **config)
+                computed[fingerprints[name]] = ab_test.result()
+        self.put_many(computed)
+
+        self.hits += len(stored)
+        self.misses += len(computed)
+
+        results = ABTestResultCollection(capacity=max(1, len(experiments)))
+        for name in experiments:
+            fingerprint = fingerprints[name]
+            results.append(stored.get(fingerprint) or computed[fingerprint])
+
+        return results
+
+    def mark_finished(self, names):
+        """Mark experiments as finished, so they can be evicted
+
+        :param names: names of the experiments
+        """
+
+        self.connection.executemany(
+            "UPDATE results SET finished = 1 WHERE name = ?",
+            ((str(name),) for name in names),
+        )
+        self.connection.commit()
+
+    def evict(self, finished_ttl=None, max_entries=None):
+        """Remove results from the store
+
+        :param finished_ttl: remove finished experiments not used for this many
+            seconds, defaults to 0, i.e., all finished experiments
+        :param max_entries: keep at most this many results, removing the least
+            recently used ones, defaults to no limit
+        :return: number of removed results
+        """
+
+        if finished_ttl is None:
+            finished_ttl = 0
+
+        removed = self.connection.execute(
+            "DELETE FROM results WHERE finished = 1 AND used_at <= ?",
+            (time.time() - finished_ttl,),
+        ).rowcount
+        if max_entries is not None:
+            removed += self.connection.execute(
+                "DELETE FROM results WHERE fingerprint NOT IN "
+                "(SELECT fingerprint FROM results ORDER BY used_at DESC LIMIT ?)",
+                (max_entries,),
+            ).rowcount
+        self.connection.commit()
+
+        return removed
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+if __name__ == "__main__":
+
+    from dietbox.abtest.stats import ABTestRatios
+
+    n = 20000
+    converted = np.random.binomial(17200, 0.003, size=(n, 2))
+    experiments = {
+        f"test_{i}": {
+            "A_converted": int(converted[i, 0]),
+            "A_total": 17207,
+            "B_converted": int(converted[i, 1]),
+            "B_total": 17198,
+        }
+        for i in range(n)
+    }
+
+    with ABTestResultStore() as store:
+        for night in range(2):
+            start = time.perf_counter()
+            store.run(ABTestRatios, experiments)
+            print(
+                f"night {night}: {time.perf_counter() - start:.3f}s, "
+                f"{store.hits} hits, {store.misses} misses"
+            )
+            experiments["test_0"]["B_converted"] += 1
+
+    print("END")
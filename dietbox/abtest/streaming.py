@@ -0,0 +1,170 @@
+import numpy as np
+from dietbox.abtest.stats import ABTestRatios
+
+
+class ABTestRatiosAccumulator:
+    """Incremental counts for a ratio AB test fed by event streams
+
+    Only the four counts that `ABTestRatios` consumes are kept, so updates are
+    O(1) and no raw events are stored. Accumulators of different workers can
+    be merged with `merge` or `+`.
+
+    ```python
+    acc = ABTestRatiosAccumulator()
+    acc.update("A", True)
+    acc.update_batch(["A", "B", "B"], [0, 1, 0])
+
+    acc.report()
+    ```
+
+    :param ab_test_data: initial counts in the `ab_test_data` format, e.g. a
+        partial state saved with `to_dict`, defaults to zero counts
+    :param test_name: name of the test
+    """
+
+    groups = ("A", "B")
+
+    def __init__(self, ab_test_data=None, test_name=None):
+
+        if ab_test_data is None:
+            ab_test_data = {}
+
+        self.A_total = int(ab_test_data.get("A_total", 0))
+        self.A_converted = int(ab_test_data.get("A_converted", 0))
+        self.B_total = int(ab_test_data.get("B_total", 0))
+        self.B_converted = int(ab_test_data.get("B_converted", 0))
+        if test_name:
+            self.name = test_name
+        else:
+            self.name = None
+
+    def _group(self, group):
+        group = str(group).upper()
+        if group not in self.groups:
+            raise Exception(f"Group should be one of {self.groups}, got {group}")
+
+        return group
+
+    def update(self, group, converted):
+        """Add one event
+
+        :param group: group of the event, `"A"` or `"B"`
+        :param converted: whether the event converted
+        :return: the accumulator itself
+        """
+
+        group = self._group(group)
+
+        setattr(self, f"{group}_total", getattr(self, f"{group}_total") + 1)
+        if converted:
+            setattr(self, f"{group}_converted", getattr(self, f"{group}_converted") + 1)
+
+        return self
+
+    def update_batch(self, groups, converted):
+        """Add a batch of events
+
+        :param groups: array of the groups of the events, `"A"` or `"B"`
+        :param converted: array of whether each event converted
+        :return: the accumulator itself
+        """
+
+        groups = np.char.upper(np.asarray(groups, dtype=str))
+        converted = np.asarray(converted).astype(bool)
+
+        if groups.shape != converted.shape:
+            raise Exception(
+                f"groups and converted have different shapes: "
+                f"{groups.shape} and {converted.shape}"
+            )
+
+        is_A = groups == "A"
+        is_B = groups == "B"
+        if np.count_nonzero(is_A) + np.count_nonzero(is_B) != groups.size:
+            raise Exception(
+                f"Group should be one of {self.groups}, got {np.unique(groups)}"
+            )
+
+        self.A_total += int(np.count_nonzero(is_A))
+        self.A_converted += int(np.count_nonzero(converted & is_A))
+        self.B_total += int(np.count_nonzero(is_B))
+        self.B_converted += int(np.count_nonzero(converted & is_B))
+
+        return self
+
+    def update_records(self, records, group_key=None, converted_key=None):
+        """Add events from an iterable of records
+
+        Records are consumed one by one, so a generator over an NDJSON file or
+        a message consumer can be passed without loading all events.
+
+        :param records: iterable of dicts
+        :param group_key: key of the group in the records, defaults to `"group"`
+        :param converted_key: key of the conversion flag in the records,
+            defaults to `"converted"`
+        :return: the accumulator itself
+        """
+
+        if group_key is None:
+            group_key = "group"
+        if converted_key is None:
+            converted_key = "converted"
+
+        for record in records:
+            self.update(record.get(group_key), record.get(converted_key))
+
+        return self
+
+    def merge(self, other):
+        """Add the counts of another accumulator to this one
+
+        :param other: accumulator or `ab_test_data` dict from another worker
+        :return: the accumulator itself
+        """
+
+        if isinstance(other, dict):
+            other = ABTestRatiosAccumulator(other)
+
+        self.A_total += other.A_total
+        self.A_converted += other.A_converted
+        self.B_total += other.B_total
+        self.B_converted += other.B_converted
+
+        return self
+
+    def __add__(self, other):
+        return ABTestRatiosAccumulator(self.to_dict(), test_name=self.name).merge(other)
+
+    def __iadd__(self, other):
+        return self.merge(other)
+
+    def to_dict(self):
+        """Current counts in the `ab_test_data` format"""
+
+        return {
+            "A_total": self.A_total,
+            "A_converted": self.A_converted,
+            "B_total": self.B_total,
+            "B_converted": self.B_converted,
+        }
+
+    def report(self, with_data=None, pipeline=None):
+        """Report of `ABTestRatios` on the current counts"""
+
+        return ABTestRatios(self.to_dict(), test_name=self.name).report(
+            with_data=with_data, pipeline=pipeline
+        )
+
+
+if __name__ == "__main__":
+
+    acc = ABTestRatiosAccumulator(test_name="streaming")
+    for _ in range(10):
+        acc.update_batch(
+            np.random.choice(["A", "B"], size=1000),
+            np.random.choice([True, False], size=1000, p=[0.1, 0.9]),
+        )
+
+    print(acc.report())
+
+    print("END")
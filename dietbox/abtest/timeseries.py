@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+from dietbox.abtest.batch import ABTestRatiosBatch
+from dietbox.abtest.stats_util import cal_z_score
+
+count_columns = ("A_total", "A_converted", "B_total", "B_converted")
+
+
+def cal_cumulative_metrics(ab_test_data, test=None, significance_level=None):
+    """Metrics of `ABTestRatios` on cumulative counts of every day
+
+    Each of `A_total`, `A_converted`, `B_total` and `B_converted` in
+    `ab_test_data` is an array of daily counts with the days on the last
+    axis, e.g., of shape `(n_experiments, n_days)`. The counts are summed
+    with one `np.cumsum` per column and all experiments and days are tested
+    at once with `ABTestRatiosBatch`, which gives the same numbers as one
+    `ABTestRatios` per experiment and day on the cumulative counts.
+
+    The confidence interval is the normal interval of the difference of the
+    conversion rates $B_{cr} - A_{cr}$ with the unpooled standard error.
+
+    :param ab_test_data: daily counts of both groups
+    :param test: `"normal"` or `"binom"`, see `ABTestRatiosBatch`
+    :param significance_level: significance level of the two tailed
+        confidence interval, defaults to 0.05
+    :return: arrays of the shape of the daily counts with the cumulative
+        counts, KPIs, uplift, pooled standard error, p-value, difference and
+        its confidence interval
+    :rtype: dict
+    """
+
+    if significance_level is None:
+        significance_level = 0.05
+
+    res = {
+        column: np.cumsum(np.asarray(ab_test_data[column], dtype=float), axis=-1)
+        for column in count_columns
+    }
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        batch = ABTestRatiosBatch(res, test=test)
+        report = batch.report(
+            with_data=False, pipeline=["kpi", "uplift", "pooled_std_err", "p_value"]
+        )
+        res["kpi_a"], res["kpi_b"] = report["kpi"]["a"], report["kpi"]["b"]
+        res["uplift"] = report["uplift"]
+        res["pooled_std_err"] = report["pooled_std_err"]
+        res["p_value"] = report["p_value"]
+
+        res["difference"] = res["kpi_b"] - res["kpi_a"]
+        half_width = cal_z_score(significance_level) * batch.difference_std_err()
+        res["ci_lower"] = res["difference"] - half_width
+        res["ci_upper"] = res["difference"] + half_width
+
+    return res
+
+
+def cumulative_report(
+    dataframe,
+    experiment_column=None,
+    date_column=None,
+    test=None,
+    significance_level=None,
+):
+    """Cumulative metrics of many experiments from a long table of daily counts
+
+    The table has one row per experiment and day with the count columns of
+    `cal_cumulative_metrics`. It is pivoted to one array per column of shape
+    `(n_experiments, n_days)`, where missing days count as 0, and all days of
+    all experiments are computed in one pass.
+
+    ```python
+    cumulative_report(daily_counts).loc["experiment_1"].p_value.plot()
+    ```
+
+    :param dataframe: daily counts
+    :param experiment_column: column of the experiment names, defaults to `"experiment"`
+    :param date_column: column of the dates, defaults to `"date"`
+    :return: one row per experiment and date, see `cal_cumulative_metrics`
+    :rtype: pandas.DataFrame
+    """
+
+    if experiment_column is None:
+        experiment_column = "experiment"
+    if date_column is None:
+        date_column = "date"
+
+    wide = dataframe.pivot_table(
+        index=experiment_column,
+        columns=date_column,
+        values=list(count_columns),
+        aggfunc="sum",
+        fill_value=0,
+    )
+    experiments = wide.index
+    dates = wide.columns.levels[1]
+    wide = wide.reindex(
+        columns=pd.MultiIndex.from_product([count_columns, dates]), fill_value=0
+    )
+
+    metrics = cal_cumulative_metrics(
+        {column: wide[column].to_numpy() for column in count_columns},
+        test=test,
+        significance_level=significance_level,
+    )
+
+    return pd.DataFrame(
+        {key: value.ravel() for key, value in metrics.items()},
+        index=pd.MultiIndex.from_product(
+            [experiments, dates], names=[experiment_column, date_column]
+        ),
+    )
+
+
+if __name__ == "__main__":
+
+    import time
+
+    from dietbox.abtest.stats import ABTestRatios
+
+    n_experiments = 500
+    n_days = 365
+    rng = np.random.default_rng(42)
+    daily = {
+        "A_total": rng.poisson(1000, size=(n_experiments, n_days)),
+        "B_total": rng.poisson(1000, size=(n_experiments, n_days)),
+    }
+    daily["A_converted"] = rng.binomial(daily["A_total"], 0.05)
+    daily["B_converted"] = rng.binomial(daily["B_total"], 0.052)
+
+    start = time.perf_counter()
+    cal_cumulative_metrics(daily)
+    print(
+        f"{n_experiments} experiments x {n_days} days: "
+        f"{time.perf_counter() - start:.3f}s"
+    )
+
+    start = time.perf_counter()
+    cumulative = {column: daily[column].cumsum(axis=1) for column in count_columns}
+    for day in range(n_days):
+        ABTestRatios(
+            {column: cumulative[column][0, day] for column in count_columns}
+        ).report()
+    print(f"one experiment day by day: {time.perf_counter() - start:.3f}s")
+
+    print("END")
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from dietbox.abtest.bandit import ThompsonSamplingBandit, replay_bandit
+from dietbox.abtest.bayesian import ABTestBayesian
+
+one_ab_test = {
+    "A_converted": 43,
+    "A_total": 17207,
+    "B_converted": 68,
+    "B_total": 17198,
+}
+
+
+def test_thompson_sampling_bandit():
+
+    bandit = ThompsonSamplingBandit(["A", "B", "C"], seed=42)
+    bandit.update(["A", "B", "B", "C"], [1, 0, 1, 0])
+
+    np.testing.assert_array_equal(bandit.total, [1, 2, 1])
+    np.testing.assert_array_equal(bandit.converted, [1, 1, 0])
+    np.testing.assert_allclose(bandit.allocation_probabilities().sum(), 1)
+
+    bandit.update_counts([1000, 1000, 1000], [10, 50, 10])
+    arms = bandit.choose(10000)
+    assert set(arms) <= {"A", "B", "C"}
+    assert np.mean(arms == "B") > 0.99
+    assert bandit.to_frame().allocation_probability.idxmax() == "B"
+
+
+def test_thompson_sampling_bandit_probability():
+
+    bandit = ThompsonSamplingBandit.from_ab_test_data(
+        one_ab_test, method="probability", seed=42
+    )
+    prob_b_better = ABTestBayesian(one_ab_test).prob_b_better()
+
+    np.testing.assert_allclose(
+        bandit.allocation_probabilities(), [1 - prob_b_better, prob_b_better]
+    )
+    sampled = ThompsonSamplingBandit.from_ab_test_data(one_ab_test, seed=42)
+    for b in (bandit, sampled):
+        assert abs(np.mean(b.choose(100000) == "B") - prob_b_better) < 0.01
+
+
+def test_replay_bandit():
+
+    rng = np.random.default_rng(42)
+    rates = pd.Series({"A": 0.05, "B": 0.2})
+    arms = rng.choice(rates.index, size=20000)
+    converted = rng.random(20000) < rates[arms].to_numpy()
+
+    res = replay_bandit(ThompsonSamplingBandit(["A", "B"], seed=42), arms, converted)
+
+    assert res["total"] == sum(res["allocation"].values())
+    assert res["allocation"]["B"] > 10 * res["allocation"]["A"]
+    assert res["conversion_rate"] > converted.mean()
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from dietbox.abtest.batch import ABTestRatiosBatch
+from dietbox.abtest.stats import ABTestRatios, ABTestRatiosNaive
+
+
+def test_ab_test_ratios_batch():
+
+    ab_tests = pd.DataFrame(
+        {
+            "A_converted": [43, 70, 0, 120],
+            "A_total": [17207, 1000, 500, 2000],
+            "B_converted": [68, 110, 3, 100],
+            "B_total": [17198, 1100, 520, 2100],
+        },
+        index=["a", "b", "c", "d"],
+    )
+
+    batch = ABTestRatiosBatch(ab_tests).report(with_data=False)
+
+    for i, (name, row) in enumerate(ab_tests.iterrows()):
+        if row["A_converted"] == 0:
+            continue
+        single = ABTestRatios(row.to_dict()).report(with_data=False)
+        np.testing.assert_allclose(batch["kpi"]["a"][i], single["kpi"]["a"])
+        np.testing.assert_allclose(batch["kpi"]["b"][i], single["kpi"]["b"])
+        for key in ["pooled_std_err", "uplift", "p_value", "z_score", "diff_std_err"]:
+            np.testing.assert_allclose(batch[key][i], single[key])
+
+    frame = ABTestRatiosBatch(ab_tests).to_frame()
+    assert list(frame.index) == ["a", "b", "c", "d"]
+    assert np.isinf(frame.loc["c", "uplift"])
+
+
+def test_ab_test_ratios_batch_binom():
+
+    ab_tests = {
+        "A_converted": [43, 70],
+        "A_total": [17207, 1000],
+        "B_converted": [68, 110],
+        "B_total": [17198, 1100],
+    }
+
+    batch = ABTestRatiosBatch(ab_tests, test="binom").report(with_data=False)
+
+    for i in range(2):
+        single = ABTestRatiosNaive({k: v[i] for k, v in ab_tests.items()}).report()
+        np.testing.assert_allclose(batch["p_value"][i], single["p_value"])
+        np.testing.assert_allclose(batch["z_score"][i], single["z_score"])
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+from dietbox.abtest.bayesian import (
+    ABTestBayesian,
+    cal_beta_comparison,
+    cal_beta_comparison_monte_carlo,
+)
+
+
+def test_cal_beta_comparison():
+
+    alpha_A = np.array([44, 2, 1, 1001, 31, 2.5])
+    beta_A = np.array([17165, 3, 1, 1e6, 1e4, 100])
+    alpha_B = np.array([69, 5, 1, 31, 1001, 4])
+    beta_B = np.array([17131, 4, 1, 1e4, 1e6, 90])
+
+    quadrature = cal_beta_comparison(alpha_A, beta_A, alpha_B, beta_B)
+    monte_carlo = cal_beta_comparison_monte_carlo(
+        alpha_A, beta_A, alpha_B, beta_B, n_samples=200000
+    )
+
+    np.testing.assert_allclose(quadrature[0], monte_carlo[0], atol=5e-3)
+    np.testing.assert_allclose(quadrature[1], monte_carlo[1], rtol=2e-2, atol=1e-6)
+    np.testing.assert_allclose(quadrature[2], monte_carlo[2], rtol=2e-2, atol=1e-6)
+    # P(B > A) for Beta(1, 1) priors without data
+    np.testing.assert_allclose(quadrature[0][2], 0.5)
+    np.testing.assert_allclose(quadrature[1][2], 1 / 6)
+
+
+def test_ab_test_bayesian():
+
+    one_ab_test = {
+        "A_converted": 43,
+        "A_total": 17207,
+        "B_converted": 68,
+        "B_total": 17198,
+    }
+    ab_tests = pd.DataFrame([one_ab_test, {**one_ab_test, "B_converted": 0}])
+
+    single = ABTestBayesian(one_ab_test).report(with_data=False)
+    batch = ABTestBayesian(ab_tests, prior=(0.5, 0.5)).to_frame()
+
+    assert 0.98 < single["prob_b_better"] < 1
+    assert single["credible_interval"]["a"][0] < single["kpi"]["a"]
+    assert single["kpi"]["a"] < single["credible_interval"]["a"][1]
+    assert list(batch.index) == [0, 1]
+    assert batch.loc[1, "prob_b_better"] < 1e-6
+    np.testing.assert_allclose(
+        batch.loc[0, "prob_b_better"], single["prob_b_better"], atol=1e-3
+    )
@@ -0,0 +1,67 @@
+import numpy as np
+import scipy.stats as scs
+from dietbox.abtest.bootstrap import (
+    cal_bootstrap_uplift_interval,
+    cal_multinomial_weights,
+)
+from dietbox.abtest.stats import ABTestSeries
+
+
+def test_cal_multinomial_weights():
+
+    rng = np.random.default_rng(42)
+    counts = np.array([900, 1, 1, 2, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 3])
+
+    weights = cal_multinomial_weights(rng, counts, 2000)
+
+    assert weights.shape == (2000, len(counts))
+    np.testing.assert_array_equal(weights.sum(axis=1), np.sum(counts))
+    np.testing.assert_allclose(weights.mean(axis=0), counts, rtol=0.1)
+
+
+def test_cal_bootstrap_uplift_interval():
+
+    rng = np.random.default_rng(3)
+    A_series = rng.binomial(1, 0.3, size=400) * rng.lognormal(1, 1, size=400)
+    B_series = rng.binomial(1, 0.3, size=500) * rng.lognormal(1.2, 1, size=500)
+
+    res = cal_bootstrap_uplift_interval(
+        A_series, B_series, kpi_method="all_avg", n_resamples=5000, n_jobs=1
+    )
+    in_pool = cal_bootstrap_uplift_interval(
+        A_series,
+        B_series,
+        kpi_method="all_avg",
+        n_resamples=5000,
+        n_jobs=2,
+        max_block_bytes=2**14,
+    )
+
+    def uplift(a, b, axis=-1):
+        return (b.mean(axis=axis) - a.mean(axis=axis)) / a.mean(axis=axis)
+
+    for method in ["percentile", "BCa"]:
+        expected = scs.bootstrap(
+            (A_series, B_series),
+            uplift,
+            n_resamples=20000,
+            method=method,
+            random_state=1,
+        ).confidence_interval
+        np.testing.assert_allclose(res[method.lower()], expected, atol=0.03)
+
+    np.testing.assert_allclose(res["uplift"], uplift(A_series, B_series))
+    # the seeds belong to the blocks, not the workers
+    assert in_pool == cal_bootstrap_uplift_interval(
+        A_series,
+        B_series,
+        kpi_method="all_avg",
+        n_resamples=5000,
+        n_jobs=1,
+        max_block_bytes=2**14,
+    )
+
+    ab_test = ABTestSeries(
+        {"A_series": A_series, "B_series": B_series}, kpi_method="all_avg"
+    )
+    assert ab_test.bootstrap_interval(n_resamples=5000, n_jobs=1) == res
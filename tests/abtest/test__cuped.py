@@ -0,0 +1,105 @@
+import numpy as np
+from dietbox.abtest.cuped import cal_cuped, cal_cuped_series
+from dietbox.abtest.moments import MomentsAccumulator, cal_moments
+from dietbox.abtest.stats import ABTestSeries
+
+
+def test_moments_accumulator():
+
+    rng = np.random.default_rng(42)
+    covariate = rng.lognormal(1, 1, size=10000)
+    series = 0.5 * covariate + rng.normal(1e6, 1, size=10000)
+
+    moments = cal_moments(series, covariate, chunk_size=999)
+    merged = cal_moments(series[:3000], covariate[:3000]) + cal_moments(
+        iter(np.array_split(series[3000:], 7)),
+        iter(np.array_split(covariate[3000:], 7)),
+    )
+
+    for m in (moments, merged):
+        assert m.total == 10000
+        np.testing.assert_allclose(m.mean, series.mean(), rtol=1e-14)
+        np.testing.assert_allclose(m.variance, np.var(series, ddof=1), rtol=1e-9)
+        np.testing.assert_allclose(
+            m.covariance, np.cov(series, covariate)[0, 1], rtol=1e-9
+        )
+    assert MomentsAccumulator(moments.to_dict()).to_dict() == moments.to_dict()
+
+
+def test_cal_cuped():
+
+    rng = np.random.default_rng(42)
+    size = 20000
+    A_covariate = rng.lognormal(1, 1, size=size)
+    B_covariate = rng.lognormal(1, 1, size=size)
+    A_series = 0.8 * A_covariate + rng.normal(0, 1, size=size)
+    B_series = 0.8 * B_covariate + rng.normal(0.05, 1, size=size)
+
+    res = cal_cuped_series(A_series, B_series, A_covariate, B_covariate)
+
+    # regression adjustment with theta estimated on both groups
+    covariate = np.concatenate([A_covariate, B_covariate])
+    theta = np.cov(np.concatenate([A_series, B_series]), covariate)[0, 1] / np.var(
+        covariate, ddof=1
+    )
+    A_adjusted = A_series - theta * (A_covariate - covariate.mean())
+    B_adjusted = B_series - theta * (B_covariate - covariate.mean())
+
+    np.testing.assert_allclose(res["theta"], theta)
+    np.testing.assert_allclose(res["kpi"], (A_adjusted.mean(), B_adjusted.mean()))
+    np.testing.assert_allclose(
+        res["std_err"][0], np.std(A_adjusted, ddof=1) / np.sqrt(size)
+    )
+    assert res["variance_reduction"] > 0.9
+    assert res["p_value"] < 0.01
+
+    total = cal_cuped(
+        cal_moments(A_series, A_covariate),
+        cal_moments(B_series, B_covariate),
+        kpi_method="sum",
+    )
+    np.testing.assert_allclose(total["kpi"][0], size * res["kpi"][0])
+    np.testing.assert_allclose(total["uplift"], res["uplift"])
+
+    ab_test = ABTestSeries(
+        {
+            "A_series": A_series,
+            "B_series": B_series,
+            "A_covariate": A_covariate,
+            "B_covariate": B_covariate,
+        },
+        kpi_method="all_avg",
+    )
+    report = ab_test.report(with_data=False)
+    assert report["cuped"] == res
+    np.testing.assert_allclose(report["kpi"]["a"], A_series.mean())
+
+    from_moments = ABTestSeries(
+        {
+            "A_moments": cal_moments(A_series, A_covariate),
+            "B_moments": cal_moments(B_series, B_covariate).to_dict(),
+        },
+        kpi_method="all_avg",
+    ).report(with_data=False)
+    assert list(from_moments) == list(report)
+    np.testing.assert_allclose(from_moments["cuped"]["uplift"], res["uplift"])
+
+
+def test_ab_test_series_cuped_kpi_methods():
+
+    rng = np.random.default_rng(7)
+    A_covariate = rng.lognormal(1, 1, size=3000)
+    B_covariate = rng.lognormal(1, 1, size=3000)
+    ab_test_data = {
+        "A_series": rng.binomial(1, 0.3, size=3000) * A_covariate,
+        "B_series": rng.binomial(1, 0.35, size=3000) * B_covariate,
+        "A_covariate": A_covariate,
+        "B_covariate": B_covariate,
+    }
+
+    for kpi_method in ("sum", "count", "non_zero_avg", "all_avg"):
+        ab_test = ABTestSeries(ab_test_data, kpi_method=kpi_method)
+        report = ab_test.report(with_data=False)
+
+        assert ("cuped" in report) == (kpi_method != "non_zero_avg")
+        assert ab_test.result().uplift == report["uplift"]
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import scipy.stats as scs
+from dietbox.abtest.experiment import (
+    cal_group_moments,
+    cal_mannwhitneyu_columns,
+    experiment_report,
+)
+from dietbox.abtest.stats import ABTestSeries
+
+rng = np.random.default_rng(42)
+n = 3000
+sessions = pd.DataFrame(
+    {
+        "group": rng.choice(["A", "B"], size=n),
+        "revenue": rng.binomial(1, 0.3, size=n) * rng.lognormal(1, 1, size=n),
+        "orders": rng.poisson(0.4, size=n),
+        "page_views": rng.poisson(5, size=n) + 1,
+    }
+)
+kpi_methods = {"revenue": "all_avg", "orders": "count", "page_views": "sum"}
+
+
+def test_cal_group_moments():
+
+    values = sessions[["revenue", "orders"]].to_numpy(dtype=float)
+    moments = cal_group_moments(values)
+
+    assert moments[1].non_zero == np.count_nonzero(sessions.orders)
+    np.testing.assert_allclose(moments[0].mean, sessions.revenue.mean())
+    np.testing.assert_allclose(moments[0].variance, sessions.revenue.var())
+
+
+def test_cal_mannwhitneyu_columns():
+
+    A_values = sessions.loc[sessions.group == "A", list(kpi_methods)].to_numpy()
+    B_values = sessions.loc[sessions.group == "B", list(kpi_methods)].to_numpy()
+    expected = scs.mannwhitneyu(A_values, B_values, axis=0).pvalue
+
+    np.testing.assert_allclose(cal_mannwhitneyu_columns(A_values, B_values), expected)
+    np.testing.assert_allclose(
+        cal_mannwhitneyu_columns(A_values, B_values, max_block_size=4000), expected
+    )
+    np.testing.assert_allclose(
+        cal_mannwhitneyu_columns(A_values[:5], B_values[:6]),
+        scs.mannwhitneyu(A_values[:5], B_values[:6], axis=0).pvalue,
+    )
+
+    # NaN propagates per column, as in scipy
+    A_values = A_values.astype(float)
+    A_values[3, 0] = np.nan
+    p_values = cal_mannwhitneyu_columns(A_values, B_values)
+    assert np.isnan(p_values[0])
+    np.testing.assert_allclose(p_values[1:], expected[1:])
+    assert np.isnan(scs.mannwhitneyu(A_values, B_values, axis=0).pvalue[0])
+
+    report = experiment_report(
+        sessions.assign(revenue=sessions.revenue.where(sessions.index != 3))
+    )
+    assert report.loc["revenue", ["uplift", "p_value"]].isna().all()
+
+
+def test_experiment_report():
+
+    report = experiment_report(sessions, kpi_method=kpi_methods)
+    welch = experiment_report(sessions, kpi_method=kpi_methods, test="welch")
+
+    assert list(report.index) == list(kpi_methods)
+    assert list(report.kpi_method) == list(kpi_methods.values())
+    for metric, kpi_method in kpi_methods.items():
+        ab_test = ABTestSeries(
+            {
+                "A_series": sessions.loc[sessions.group == "A", metric].to_numpy(),
+                "B_series": sessions.loc[sessions.group == "B", metric].to_numpy(),
+            },
+            kpi_method=kpi_method,
+        )
+        expected = ab_test.report(with_data=False)
+
+        np.testing.assert_allclose(report.loc[metric, "kpi_a"], expected["kpi"]["a"])
+        np.testing.assert_allclose(report.loc[metric, "kpi_b"], expected["kpi"]["b"])
+        np.testing.assert_allclose(report.loc[metric, "uplift"], expected["uplift"])
+        np.testing.assert_allclose(report.loc[metric, "p_value"], expected["p_value"])
+        np.testing.assert_allclose(
+            welch.loc[metric, "p_value"], ab_test.p_value(method="welch")
+        )
@@ -0,0 +1,87 @@
+import numpy as np
+import scipy.stats as scs
+from dietbox.abtest.moments import (
+    MomentsAccumulator,
+    cal_moments,
+    cal_welch_test,
+    iter_series_chunks,
+)
+
+rng = np.random.default_rng(42)
+A_series = rng.binomial(1, 0.3, size=3000) * rng.lognormal(1, 1, size=3000)
+B_series = rng.binomial(1, 0.35, size=2500) * rng.lognormal(1, 1.2, size=2500)
+
+
+def test_from_sums():
+
+    covariate = rng.normal(size=3000)
+    moments = MomentsAccumulator.from_sums(
+        total=3000,
+        sum=A_series.sum(),
+        sum_squares=np.dot(A_series, A_series),
+        non_zero=np.count_nonzero(A_series),
+        covariate_sum=covariate.sum(),
+        covariate_sum_squares=np.dot(covariate, covariate),
+        cross_sum=np.dot(A_series, covariate),
+    )
+    expected = cal_moments(A_series, covariate)
+
+    for field in MomentsAccumulator.fields:
+        np.testing.assert_allclose(
+            getattr(moments, field), getattr(expected, field), rtol=1e-10
+        )
+    assert (
+        MomentsAccumulator.from_sums(0, 0, 0, non_zero=0).to_dict()
+        == MomentsAccumulator().to_dict()
+    )
+    assert np.isnan(MomentsAccumulator.from_sums(3, 1.5, 2.25).non_zero)
+
+
+def test_cal_welch_test():
+
+    A_moments, B_moments = cal_moments(A_series), cal_moments(B_series)
+
+    for kpi_method, transform in (
+        ("all_avg", lambda x: x),
+        ("count", lambda x: x != 0),
+        ("non_zero_avg", lambda x: x[x != 0]),
+    ):
+        res = cal_welch_test(A_moments, B_moments, kpi_method=kpi_method)
+        expected = scs.ttest_ind(
+            transform(B_series), transform(A_series), equal_var=False
+        )
+        np.testing.assert_allclose(res["statistic"], expected.statistic)
+        np.testing.assert_allclose(res["p_value"], expected.pvalue)
+
+    res = cal_welch_test(A_moments, B_moments, kpi_method="sum", test="z")
+    np.testing.assert_allclose(res["kpi"], [A_series.sum(), B_series.sum()])
+    np.testing.assert_allclose(
+        res["diff_std_err"],
+        np.hypot(
+            np.sqrt(3000) * np.std(A_series, ddof=1),
+            np.sqrt(2500) * np.std(B_series, ddof=1),
+        ),
+    )
+    np.testing.assert_allclose(
+        res["p_value"], 2 * scs.norm.sf(abs(res["difference"]) / res["diff_std_err"])
+    )
+
+
+def test_iter_series_chunks(tmp_path):
+
+    np.save(tmp_path / "A.npy", A_series)
+    A_series.tofile(tmp_path / "A.bin")
+    memmap = np.load(tmp_path / "A.npy", mmap_mode="r")
+
+    for series, expected in (
+        (A_series, A_series),
+        (tmp_path / "A.npy", A_series),
+        (str(tmp_path / "A.bin"), A_series),
+        (memmap, A_series),
+        (memmap[::2], A_series[::2]),
+        (iter(np.array_split(A_series, 7)), A_series),
+    ):
+        chunks = list(iter_series_chunks(series, chunk_size=1000))
+
+        assert max(len(chunk) for chunk in chunks) <= 1000
+        np.testing.assert_array_equal(np.concatenate(chunks), expected)
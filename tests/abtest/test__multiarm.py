@@ -0,0 +1,50 @@
+import numpy as np
+from dietbox.abtest.multiarm import (
+    ABTestMultiArm,
+    cal_benjamini_hochberg_adjusted,
+    cal_dunnett_adjusted,
+    cal_holm_adjusted,
+)
+from dietbox.abtest.stats_util import cal_pooled_probability, cal_pooled_std_err
+
+
+def test_corrections():
+
+    p_values = [0.01, 0.04, 0.03, 0.005]
+
+    np.testing.assert_allclose(cal_holm_adjusted(p_values), [0.03, 0.06, 0.06, 0.02])
+    np.testing.assert_allclose(
+        cal_benjamini_hochberg_adjusted(p_values), [0.02, 0.04, 0.04, 0.02]
+    )
+    # critical values of Dunnett's tables for 3 treatments of equal size
+    weights = np.full(3, np.sqrt(0.5))
+    np.testing.assert_allclose(cal_dunnett_adjusted([2.349], weights), 0.05, atol=5e-4)
+    np.testing.assert_allclose(
+        cal_dunnett_adjusted([2.061], weights, two_tailed=False), 0.05, atol=5e-4
+    )
+
+
+def test_ab_test_multi_arm():
+
+    data = {"total": [17207, 17198, 17250, 17190], "converted": [43, 68, 51, 60]}
+
+    multi_arm = ABTestMultiArm(data, arm_names=["a", "b", "c", "d"])
+    res = multi_arm.to_frame()
+
+    assert res.arm_a.tolist() == ["a", "a", "a"]
+    assert res.arm_b.tolist() == ["b", "c", "d"]
+    std_err = cal_pooled_std_err(
+        cal_pooled_probability(17207, 17198, 43, 68), 17207, 17198
+    )
+    np.testing.assert_allclose(res.z_score[0], (68 / 17198 - 43 / 17207) / std_err)
+    np.testing.assert_allclose(
+        res.adjusted_p_value, cal_holm_adjusted(res.p_value.to_numpy())
+    )
+
+    pairwise = ABTestMultiArm(data, comparisons="pairwise", correction="bh")
+    assert len(pairwise.to_frame()) == 6
+
+    dunnett = ABTestMultiArm(data, correction="dunnett").to_frame()
+    assert np.all(dunnett.adjusted_p_value >= dunnett.p_value)
+    # Dunnett is less conservative than Bonferroni
+    assert dunnett.adjusted_p_value.min() < 3 * dunnett.p_value.min()
@@ -0,0 +1,56 @@
+import numpy as np
+import scipy.stats as scs
+from dietbox.abtest.normal import NormalDistribution, cal_critical_value
+from dietbox.abtest.stats import ABTestRatios
+from dietbox.abtest.stats_util import ab_dist, cal_z_score
+
+
+def test_normal_distribution():
+
+    x = np.linspace(-10, 10, 101)
+    q = np.linspace(1e-12, 1 - 1e-12, 101)
+
+    for loc, scale in [(0, 1), (0.58, 0.0006), (-3, 20)]:
+        dist = NormalDistribution(loc, scale)
+        reference = scs.norm(loc, scale)
+        for method, args in [
+            ("cdf", x),
+            ("sf", x),
+            ("pdf", x),
+            ("ppf", q),
+            ("isf", q),
+        ]:
+            np.testing.assert_allclose(
+                getattr(dist, method)(args),
+                getattr(reference, method)(args),
+                rtol=1e-12,
+            )
+        np.testing.assert_allclose(dist.interval(0.9), reference.interval(0.9))
+
+    # the public distributions are frozen scipy distributions
+    dist = ab_dist(0.1, 0.5, group_type="test")
+    assert dist.mean() == 0.5
+    np.testing.assert_allclose(dist.interval(0.9), scs.norm(0.5, 0.1).interval(0.9))
+    assert dist.rvs(size=3, random_state=0).shape == (3,)
+    assert np.isfinite(dist.logpdf(0.4))
+
+    ab_test = ABTestRatios(
+        {"A_converted": 43, "A_total": 17207, "B_converted": 68, "B_total": 17198}
+    )
+    assert ab_test.alt_distribution().rvs(random_state=0) > 0
+    np.testing.assert_allclose(
+        ab_test.null_distribution().sf(ab_test.conversion_uplift()), ab_test.p_value()
+    )
+
+
+def test_cal_critical_value():
+
+    np.testing.assert_allclose(cal_z_score(), scs.norm.ppf(0.975), rtol=1e-14)
+    np.testing.assert_allclose(
+        cal_z_score(0.05, two_tailed=False), scs.norm.ppf(0.95), rtol=1e-14
+    )
+    np.testing.assert_allclose(
+        cal_critical_value([0.01, 0.05]), scs.norm.isf([0.005, 0.025]), rtol=1e-14
+    )
+    # tiny significance levels do not round to an infinite z score
+    assert np.isfinite(cal_z_score(1e-20))
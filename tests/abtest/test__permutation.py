@@ -0,0 +1,87 @@
+import subprocess
+import sys
+
+import numpy as np
+import scipy.stats as scs
+from dietbox.abtest.parallel import SharedArray, attach_shared_array
+from dietbox.abtest.permutation import cal_permutation_test
+from dietbox.abtest.stats import ABTestSeries
+
+
+def test_cal_permutation_test():
+
+    rng = np.random.default_rng(0)
+    A_series = rng.binomial(1, 0.3, size=2000) * rng.lognormal(1, 1, size=2000)
+    B_series = rng.binomial(1, 0.3, size=2500) * rng.lognormal(1, 1, size=2500)
+    B_shifted = B_series * 1.5
+
+    no_effect = cal_permutation_test(
+        A_series, B_series, kpi_method="all_avg", n_permutations=2000, n_jobs=1
+    )
+    effect = cal_permutation_test(
+        A_series, B_shifted, kpi_method="all_avg", n_permutations=2000, n_jobs=1
+    )
+    full = cal_permutation_test(
+        A_series,
+        B_series,
+        kpi_method="non_zero_avg",
+        n_permutations=1000,
+        early_stopping=0,
+        n_jobs=1,
+        max_block_bytes=2**18,
+    )
+    in_pool = cal_permutation_test(
+        A_series,
+        B_series,
+        kpi_method="non_zero_avg",
+        n_permutations=1000,
+        early_stopping=0,
+        n_jobs=2,
+        max_block_bytes=2**18,
+    )
+
+    reference = scs.permutation_test(
+        (A_series, B_series),
+        lambda a, b: np.mean(b[b != 0]) - np.mean(a[a != 0]),
+        n_resamples=1000,
+        random_state=0,
+    )
+
+    assert abs(full["p_value"] - reference.pvalue) < 0.05
+    assert no_effect["p_value"] > 0.05
+    assert no_effect["n_permutations"] < 2000
+    assert effect["p_value"] < 0.05
+    assert full["n_permutations"] == 1000
+    # the seeds belong to the blocks, not the workers
+    assert in_pool == full
+
+    ab_test = ABTestSeries(
+        {"A_series": A_series, "B_series": B_shifted}, kpi_method="all_avg"
+    )
+    assert (
+        ab_test.p_value(method="permutation", n_permutations=2000, n_jobs=1)
+        == effect["p_value"]
+    )
+
+
+def test_attach_shared_array_untracked():
+
+    # a process with its own resource tracker attaches and exits, which must
+    # not unlink the block of the creating process
+    with SharedArray(np.arange(5.0)) as shared:
+        code = (
+            "from dietbox.abtest.parallel import attach_shared_array\n"
+            f"shm, values = attach_shared_array({shared.descriptor!r})\n"
+            "print(values.sum())\n"
+            "shm.close()\n"
+        )
+        res = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+
+        assert res.stdout.strip() == "10.0"
+        assert "leaked" not in res.stderr
+        shm, values = attach_shared_array(shared.descriptor)
+        np.testing.assert_array_equal(values, np.arange(5.0))
+        del values
+        shm.close()
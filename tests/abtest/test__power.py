@@ -0,0 +1,39 @@
+import numpy as np
+from dietbox.abtest.power import cal_power, cal_sample_size, plan_sample_size
+
+
+def test_cal_sample_size():
+
+    # 10% to 12%, two tailed, alpha = 0.05 and power = 0.8
+    assert cal_sample_size(0.1, 0.02, relative=False) == 3841
+    assert cal_sample_size(0.1, 0.2) == 3841
+    assert cal_sample_size(0.1, 0.2, two_tailed=False) < 3841
+
+    sample_size = cal_sample_size(0.1, [0.1, 0.2], power=[0.8, 0.9])
+    assert sample_size.shape == (2,)
+    assert np.all(cal_power(0.1, [0.1, 0.2], sample_size) >= [0.8, 0.9])
+    assert np.all(cal_power(0.1, [0.1, 0.2], sample_size - 1) < [0.8, 0.9])
+
+
+def test_plan_sample_size():
+
+    plan = plan_sample_size(
+        baseline_rate=[0.01, 0.1],
+        minimum_detectable_effect=[0.1, 0.2, 0.3],
+        significance_level=[0.01, 0.05],
+        power=[0.8, 0.9],
+        daily_traffic=1000,
+        ratio=2,
+    )
+
+    assert len(plan) == 24
+    row = plan[
+        (plan.baseline_rate == 0.1)
+        & (plan.minimum_detectable_effect == 0.2)
+        & (plan.significance_level == 0.05)
+        & (plan.power == 0.8)
+    ].iloc[0]
+    assert row.sample_size_a == cal_sample_size(0.1, 0.2, ratio=2)
+    assert row.sample_size_b == 2 * row.sample_size_a
+    assert row.duration_days == np.ceil(row.total_sample_size / 1000)
+    assert np.all(plan.achieved_power >= plan.power)
@@ -0,0 +1,79 @@
+import numpy as np
+import scipy.stats as scs
+from dietbox.abtest.rank import (
+    MannWhitneyCounts,
+    cal_mannwhitneyu,
+    cal_value_counts,
+    is_low_cardinality_integer,
+)
+from dietbox.abtest.stats import ABTestSeries
+
+
+def test_cal_value_counts():
+
+    values, counts = cal_value_counts(np.array([3, -1, 3, 0, 3]))
+
+    np.testing.assert_array_equal(values, [-1, 0, 3])
+    np.testing.assert_array_equal(counts, [1, 1, 3])
+    assert is_low_cardinality_integer(np.array([0.0, 1.0, 1.0]))
+    assert not is_low_cardinality_integer(np.array([0.5, 1.0]))
+    assert not is_low_cardinality_integer(np.array([0, 2**30]))
+
+
+def test_cal_mannwhitneyu():
+
+    rng = np.random.default_rng(42)
+    A_series = rng.poisson(1.0, size=5000)
+    B_series = rng.poisson(1.05, size=6000)
+
+    for alternative in ["two-sided", "less", "greater"]:
+        expected = scs.mannwhitneyu(A_series, B_series, alternative=alternative)
+        np.testing.assert_allclose(
+            cal_mannwhitneyu(A_series, B_series, alternative=alternative),
+            (expected.statistic, expected.pvalue),
+            rtol=1e-10,
+        )
+
+    expected = scs.mannwhitneyu(A_series, B_series)
+    histograms = cal_mannwhitneyu(
+        cal_value_counts(A_series), cal_value_counts(B_series)
+    )
+    chunked = cal_mannwhitneyu(
+        iter(np.array_split(A_series, 7)), iter(np.array_split(B_series, 3))
+    )
+    np.testing.assert_allclose(histograms, (expected.statistic, expected.pvalue))
+    np.testing.assert_allclose(chunked, (expected.statistic, expected.pvalue))
+
+    workers = [
+        MannWhitneyCounts().update(A, B)
+        for A, B in [
+            (A_series[:2000], B_series[:1000]),
+            (A_series[2000:], B_series[1000:]),
+        ]
+    ]
+    np.testing.assert_allclose(
+        workers[0].merge(workers[1]).test(), (expected.statistic, expected.pvalue)
+    )
+
+    continuous = rng.normal(size=100), rng.normal(size=120)
+    expected = scs.mannwhitneyu(*continuous)
+    np.testing.assert_allclose(
+        cal_mannwhitneyu(*continuous), (expected.statistic, expected.pvalue)
+    )
+
+
+def test_cal_mannwhitneyu_bool():
+
+    rng = np.random.default_rng(0)
+    A_series = rng.random(2000) < 0.3
+    B_series = rng.random(2100) < 0.33
+    expected = scs.mannwhitneyu(A_series, B_series)
+
+    values, counts = cal_value_counts(A_series)
+    np.testing.assert_array_equal(values, [0, 1])
+    np.testing.assert_array_equal(counts, [(~A_series).sum(), A_series.sum()])
+    np.testing.assert_allclose(
+        cal_mannwhitneyu(A_series, B_series), (expected.statistic, expected.pvalue)
+    )
+    report = ABTestSeries({"A_series": A_series, "B_series": B_series}).report()
+    np.testing.assert_allclose(report["p_value"], expected.pvalue)
@@ -0,0 +1,75 @@
+import numpy as np
+from dietbox.abtest.moments import cal_moments
+from dietbox.abtest.ratio import (
+    ABTestRatioMetric,
+    cal_delta_method_ratio,
+    cal_unit_totals,
+)
+
+
+def _simulate_units(rng, size, replicates=1):
+    sessions = rng.poisson(3, size=(replicates, size)) + 1
+    revenue = rng.gamma(sessions * 0.2, 5.0)
+
+    return revenue, sessions
+
+
+def test_cal_delta_method_ratio():
+
+    rng = np.random.default_rng(42)
+    revenue, sessions = _simulate_units(rng, 2000, replicates=500)
+
+    ratios = revenue.sum(axis=1) / sessions.sum(axis=1)
+    std_errs = [
+        cal_delta_method_ratio(cal_moments(r, s))[1] for r, s in zip(revenue, sessions)
+    ]
+
+    np.testing.assert_allclose(np.mean(std_errs), np.std(ratios), rtol=0.1)
+    ratio, _ = cal_delta_method_ratio(cal_moments(revenue[0], sessions[0]))
+    np.testing.assert_allclose(ratio, ratios[0])
+
+
+def test_cal_unit_totals():
+
+    rng = np.random.default_rng(42)
+    units = rng.integers(0, 100, size=1000)
+    values = rng.random(1000)
+    chunks = [
+        (units[i : i + 300], values[i : i + 300], np.ones(len(units[i : i + 300])))
+        for i in range(0, 1000, 300)
+    ]
+
+    unit_ids, numerators, denominators = cal_unit_totals(chunks)
+    np.testing.assert_array_equal(unit_ids, np.unique(units))
+    np.testing.assert_allclose(numerators, np.bincount(units, values)[unit_ids])
+    np.testing.assert_array_equal(denominators, np.bincount(units)[unit_ids])
+
+    # mixed with ids that are not small integers
+    chunks.append((np.array([-1, 5]), np.array([1.0, 2.0]), np.ones(2)))
+    unit_ids, numerators, _ = cal_unit_totals(chunks)
+    assert unit_ids.tolist().count(-1) == 1
+    np.testing.assert_allclose(
+        numerators[unit_ids == 5], np.bincount(units, values)[5] + 2
+    )
+
+
+def test_ab_test_ratio_metric():
+
+    rng = np.random.default_rng(42)
+    A_revenue, A_sessions = (i[0] for i in _simulate_units(rng, 5000))
+    B_revenue, B_sessions = (i[0] for i in _simulate_units(rng, 5000))
+    B_revenue = B_revenue * 1.1
+
+    ab_test = ABTestRatioMetric(
+        {
+            "A_numerator": A_revenue,
+            "A_denominator": A_sessions,
+            "B_numerator": iter(np.array_split(B_revenue, 4)),
+            "B_denominator": iter(np.array_split(B_sessions, 4)),
+        }
+    )
+    res = ab_test.report(with_data=False)
+
+    np.testing.assert_allclose(res["kpi"]["a"], A_revenue.sum() / A_sessions.sum())
+    np.testing.assert_allclose(res["kpi"]["b"], B_revenue.sum() / B_sessions.sum())
+    assert res["p_value"] < 0.05
@@ -0,0 +1,60 @@
+import numpy as np
+from dietbox.abtest.results import ABTestResult, ABTestResultCollection
+from dietbox.abtest.stats import ABTestRatios, ABTestSeries
+
+
+def test_ab_test_result():
+
+    one_ab_test = {
+        "A_converted": 43,
+        "A_total": 17207,
+        "B_converted": 68,
+        "B_total": 17198,
+    }
+    ab_test = ABTestRatios(one_ab_test, test_name="button")
+    report = ab_test.report()
+    result = ab_test.result()
+
+    assert result.name == "button"
+    assert result.data is one_ab_test
+    assert result.kpi_b == report["kpi"]["b"]
+    assert result.p_value == report["p_value"]
+    assert not hasattr(result, "__dict__")
+
+    series_data = {"A_series": np.arange(100) % 3, "B_series": np.arange(100) % 4}
+    series_result = ABTestSeries(series_data).result()
+    assert series_result.data is series_data
+    assert np.isnan(series_result.z_score)
+
+
+def test_ab_test_result_collection(tmp_path):
+
+    results = ABTestResultCollection(capacity=2, keep_data=True)
+    for i in range(5):
+        ab_test_data = {
+            "A_converted": 40 + i,
+            "A_total": 17207,
+            "B_converted": 68,
+            "B_total": 17198,
+        }
+        results.append(ABTestRatios(ab_test_data, test_name=f"test_{i}"))
+
+    assert len(results) == 5
+    assert results[-1].data["A_converted"] == 44
+    result = ABTestRatios(results[3].data, test_name="test_3").result()
+    assert results[3] == result
+    assert len({results[3], result}) == 1
+    assert len({results[i]: i for i in range(5)}) == 5
+
+    dataframe = results.to_frame()
+    assert dataframe.name.tolist() == [f"test_{i}" for i in range(5)]
+    assert dataframe.columns.tolist() == ["name"] + list(ABTestResult.fields)
+
+    path = tmp_path / "results.ndjson"
+    results.to_ndjson(path)
+    loaded = ABTestResultCollection.from_ndjson(path)
+    assert len(loaded) == 5
+    for field in ("kpi_a", "uplift", "p_value"):
+        np.testing.assert_allclose(
+            loaded.to_frame()[field], dataframe[field], rtol=1e-14
+        )
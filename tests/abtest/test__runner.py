@@ -0,0 +1,100 @@
+import numpy as np
+from dietbox.abtest.moments import cal_moments
+from dietbox.abtest.results import ABTestResult
+from dietbox.abtest.runner import pack_series, run_series_tests
+from dietbox.abtest.stats import ABTestSeries
+
+rng = np.random.default_rng(42)
+
+experiments = {
+    "revenue": {
+        "A_series": rng.exponential(1, size=300),
+        "B_series": rng.exponential(1.2, size=280),
+    },
+    "orders": {
+        "A_series": rng.poisson(0.3, size=200),
+        "B_series": rng.poisson(0.4, size=210),
+    },
+    "sessions": {
+        "A_series": rng.exponential(2, size=150),
+        "B_series": rng.exponential(2, size=160),
+    },
+}
+
+kpi_methods = {"revenue": "all_avg", "orders": "count", "sessions": "sum"}
+
+
+def test_pack_series():
+
+    moments = [{"total": 1, "mean": 1.0}, {"total": 2, "mean": 0.5}]
+    sizes, layouts, scalars = pack_series(
+        {
+            "a": {"A_series": np.ones(3), "B_series": np.arange(4), "note": "x"},
+            "b": {"A_moments": moments, "labels": ["x", "y"]},
+        }
+    )
+
+    assert sizes == {np.dtype(float).str: 3, np.dtype(int).str: 4}
+    assert layouts["a"]["A_series"] == (np.dtype(float).str, 0, 3)
+    assert layouts["a"]["B_series"] == (np.dtype(int).str, 0, 4)
+    assert layouts["b"] == {}
+    assert scalars == {
+        "a": {"note": "x"},
+        "b": {"A_moments": moments, "labels": ["x", "y"]},
+    }
+
+
+def test_run_series_tests():
+
+    results = run_series_tests(experiments, kpi_method=kpi_methods, n_jobs=1)
+
+    assert [result.name for result in results] == list(experiments)
+    for result in results:
+        expected = ABTestResult.from_test(
+            ABTestSeries(
+                experiments[result.name],
+                kpi_method=kpi_methods[result.name],
+                test_name=result.name,
+            )
+        )
+        assert result == expected
+
+
+def test_run_series_tests_n_jobs():
+
+    res = run_series_tests(experiments, kpi_method="all_avg", n_jobs=1).to_frame()
+    res_parallel = run_series_tests(
+        experiments, kpi_method="all_avg", n_jobs=2
+    ).to_frame()
+
+    assert res.equals(res_parallel)
+
+
+def test_run_series_tests_pipeline():
+
+    res = run_series_tests(experiments, pipeline=["kpi", "uplift"], n_jobs=1)
+
+    assert np.isnan(res.to_frame().p_value).all()
+    assert np.isfinite(res.to_frame().uplift).all()
+
+
+def test_run_series_tests_moments():
+
+    A_series, B_series = experiments["revenue"].values()
+    partials = [cal_moments(chunk).to_dict() for chunk in np.array_split(A_series, 2)]
+    results = run_series_tests(
+        {
+            "revenue": {"A_moments": partials, "B_moments": cal_moments(B_series)},
+            "sessions": experiments["sessions"],
+        },
+        kpi_method="all_avg",
+        n_jobs=1,
+    )
+    expected = ABTestSeries(
+        {"A_moments": partials, "B_moments": cal_moments(B_series)},
+        kpi_method="all_avg",
+        test_name="revenue",
+    ).result()
+
+    assert results[0] == expected
+    assert results[1].name == "sessions"
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from dietbox.abtest.batch import ABTestRatiosBatch
+from dietbox.abtest.segments import cal_segment_counts, segment_report
+
+
+def test_cal_segment_counts():
+
+    rng = np.random.default_rng(42)
+    size = 10000
+    events = pd.DataFrame(
+        {
+            "country": rng.choice(["DE", "FR", "US", None], size=size),
+            "device": pd.Categorical(rng.choice(["mobile", "desktop"], size=size)),
+            "variant": rng.choice(["control", "treatment", "other"], size=size),
+            "converted": rng.binomial(1, 0.1, size=size),
+        }
+    )
+
+    counts = cal_segment_counts(
+        events,
+        ["country", "device"],
+        group_column="variant",
+        groups=("control", "treatment"),
+    )
+    expected = (
+        events[events.variant != "other"]
+        .groupby(["country", "device", "variant"], observed=True)
+        .converted.agg(["size", "sum"])
+        .unstack("variant")
+    )
+
+    assert counts.index.names == ["country", "device"]
+    assert len(counts) == 6
+    np.testing.assert_array_equal(
+        counts.A_total, expected[("size", "control")].loc[counts.index]
+    )
+    np.testing.assert_array_equal(
+        counts.B_converted, expected[("sum", "treatment")].loc[counts.index]
+    )
+
+    by_country = cal_segment_counts(
+        events.rename(columns={"variant": "group"}).replace(
+            {"group": {"control": "A", "treatment": "B"}}
+        ),
+        "country",
+    )
+    assert by_country.index.tolist() == ["DE", "FR", "US"]
+    np.testing.assert_array_equal(
+        by_country.A_total, counts.A_total.groupby("country").sum()
+    )
+
+
+def test_segment_report():
+
+    events = pd.DataFrame(
+        {
+            "segment": ["x"] * 6 + ["y"] * 4,
+            "group": ["A", "A", "A", "B", "B", "B", "A", "A", "B", "B"],
+            "converted": [1, 0, 0, 1, 1, 0, 0, 1, 1, 1],
+        }
+    )
+
+    res = segment_report(events, "segment")
+    expected = ABTestRatiosBatch(
+        {
+            "A_total": [3, 2],
+            "A_converted": [1, 1],
+            "B_total": [3, 2],
+            "B_converted": [2, 2],
+        }
+    ).to_frame()
+
+    assert res.index.tolist() == ["x", "y"]
+    np.testing.assert_allclose(res.p_value, expected.p_value)
+    np.testing.assert_allclose(res.uplift, expected.uplift)
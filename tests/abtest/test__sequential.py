@@ -0,0 +1,52 @@
+import numpy as np
+from dietbox.abtest.sequential import ABTestSequential
+
+
+def test_ab_test_sequential():
+
+    rng = np.random.default_rng(42)
+    n_experiments = 500
+    true_difference = np.where(np.arange(n_experiments) < 250, 0, 0.02)
+
+    seq = ABTestSequential(mixing_variance=1e-4)
+    p_values = []
+    for _ in range(30):
+        seq.update(
+            {
+                "A_total": np.full(n_experiments, 200),
+                "A_converted": rng.binomial(200, 0.05, size=n_experiments),
+                "B_total": np.full(n_experiments, 200),
+                "B_converted": rng.binomial(
+                    200, 0.05 + true_difference, size=n_experiments
+                ),
+            }
+        )
+        p_values.append(seq.report(with_data=False)["p_value"])
+
+    res = seq.report()
+    p_values = np.array(p_values)
+
+    assert res["looks"] == 30
+    assert res["data"]["A_total"][0] == 6000
+    assert np.all(np.diff(p_values, axis=0) <= 0)
+    assert np.mean(res["significant"][:250]) < 0.05
+    assert np.mean(res["significant"][250:]) > 0.8
+
+    lower, upper = (
+        res["confidence_sequence"]["lower"],
+        res["confidence_sequence"]["upper"],
+    )
+    covered = (lower <= true_difference) & (true_difference <= upper)
+    assert np.mean(covered) > 0.95
+
+
+def test_ab_test_sequential_scalar():
+
+    seq = ABTestSequential()
+    seq.update({"A_total": 0, "A_converted": 0, "B_total": 0, "B_converted": 0})
+    assert seq.report()["p_value"] == 1
+
+    seq.update(
+        {"A_total": 17207, "A_converted": 43, "B_total": 17198, "B_converted": 68}
+    )
+    assert 0 < seq.report()["p_value"] < 1
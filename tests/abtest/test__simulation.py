@@ -0,0 +1,73 @@
+import numpy as np
+from dietbox.abtest.batch import ABTestRatiosBatch
+from dietbox.abtest.simulation import (
+    simulate_power_curve,
+    simulate_ratio_experiments,
+    simulate_ratio_rejection_rate,
+    simulate_series_rejection_rate,
+)
+
+
+def test_simulate_ratio_experiments():
+
+    chunks = list(
+        simulate_ratio_experiments(
+            0.1, 0.2, 1000, 2000, n_experiments=250, seed=42, chunk_size=100
+        )
+    )
+
+    assert [len(chunk["A_converted"]) for chunk in chunks] == [100, 100, 50]
+    assert (chunks[0]["B_total"] == 2000).all()
+    assert abs(np.concatenate([c["A_converted"] for c in chunks]).mean() - 100) < 3
+    assert abs(np.concatenate([c["B_converted"] for c in chunks]).mean() - 400) < 5
+
+
+def test_simulate_ratio_rejection_rate():
+
+    res = simulate_ratio_rejection_rate(
+        0.1, 0.11, 5000, n_experiments=1000, seed=42, chunk_size=300
+    )
+
+    rejections = 0
+    for chunk in simulate_ratio_experiments(
+        0.1, 0.11, 5000, n_experiments=1000, seed=42, chunk_size=300
+    ):
+        rejections += np.sum(ABTestRatiosBatch(chunk).p_value() <= 0.05)
+
+    assert res["rejections"] == rejections
+    assert res["rejection_rate"] == rejections / 1000
+    np.testing.assert_allclose(
+        res["std_err"],
+        np.sqrt(res["rejection_rate"] * (1 - res["rejection_rate"]) / 1000),
+    )
+
+
+def test_simulate_power_curve():
+
+    curve = simulate_power_curve(
+        0.1, [0, 0.05, 0.1, 0.2], 5000, n_experiments=2000, test="binom", seed=42
+    )
+
+    assert list(curve.uplift) == [0, 0.05, 0.1, 0.2]
+    np.testing.assert_allclose(curve.treatment_rate, [0.1, 0.105, 0.11, 0.12])
+    assert (np.diff(curve.rejection_rate) > 0).all()
+    np.testing.assert_allclose(curve.expected_power[0], 0.05)
+
+
+def test_simulate_series_rejection_rate():
+
+    def revenue(rng, size):
+        return rng.binomial(1, 0.3, size) * rng.lognormal(0, 1, size)
+
+    def more_revenue(rng, size):
+        return rng.binomial(1, 0.45, size) * rng.lognormal(0, 1, size)
+
+    type_1_error = simulate_series_rejection_rate(
+        revenue, A_size=200, n_experiments=4000, seed=42, chunk_size=1000
+    )
+    power = simulate_series_rejection_rate(
+        revenue, more_revenue, A_size=200, B_size=300, n_experiments=500, seed=42
+    )
+
+    assert abs(type_1_error["rejection_rate"] - 0.05) < 4 * type_1_error["std_err"]
+    assert power["rejection_rate"] > 0.8
@@ -0,0 +1,104 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from dietbox.abtest.batch import ABTestRatiosBatch
+from dietbox.abtest.cuped import cal_cuped_series
+from dietbox.abtest.sql import (
+    aggregate_report,
+    aggregates_to_moments,
+    build_aggregation_query,
+    query_aggregates,
+)
+
+rng = np.random.default_rng(42)
+n = 5000
+covariate = rng.poisson(3, size=n)
+events = pd.DataFrame(
+    {
+        "variant": rng.choice(["A", "B"], size=n),
+        "country": rng.choice(["DE", "FR"], size=n),
+        "revenue": (covariate + rng.normal(0, 1, size=n)) * (rng.random(n) < 0.6),
+        "pre_revenue": covariate,
+    }
+)
+connection = sqlite3.connect(":memory:")
+events.to_sql("events", connection, index=False)
+
+
+def test_build_aggregation_query():
+
+    query = build_aggregation_query(
+        "events", "revenue", segments=["country"], where="country <> 'NL'"
+    )
+
+    assert "GROUP BY variant, country" in query
+    assert "WHERE country <> 'NL'" in query
+    assert "cross_sum" not in query
+
+
+def test_aggregates_to_moments():
+
+    query = build_aggregation_query("events", "revenue", covariate_column="pre_revenue")
+    aggregates = query_aggregates(query, connection=connection)
+    moments = aggregates_to_moments(aggregates)
+
+    assert list(aggregates.variant) == ["A", "B"]
+    A_events = events[events.variant == "A"]
+    assert moments[0].total == len(A_events)
+    assert moments[0].non_zero == np.count_nonzero(A_events.revenue)
+    np.testing.assert_allclose(moments[0].mean, A_events.revenue.mean())
+    np.testing.assert_allclose(moments[0].variance, A_events.revenue.var())
+    np.testing.assert_allclose(
+        moments[0].covariance, np.cov(A_events.revenue, A_events.pre_revenue)[0, 1]
+    )
+
+
+def test_aggregate_report():
+
+    query = build_aggregation_query(
+        "events", "revenue", segments="country", covariate_column="pre_revenue"
+    )
+    aggregates = query_aggregates(query, connection=connection)
+    report = aggregate_report(aggregates, segments="country")
+    counts = aggregate_report(aggregates, segments="country", kpi_method="count")
+
+    assert list(report.index) == ["DE", "FR"]
+    for country, row in report.iterrows():
+        segment = events[events.country == country]
+        A_events = segment[segment.variant == "A"]
+        B_events = segment[segment.variant == "B"]
+        expected = cal_cuped_series(
+            A_events.revenue,
+            B_events.revenue,
+            A_events.pre_revenue,
+            B_events.pre_revenue,
+        )
+        np.testing.assert_allclose(row.kpi_a, expected["kpi"][0])
+        np.testing.assert_allclose(row.std_err_b, expected["std_err"][1])
+        np.testing.assert_allclose(row.p_value, expected["p_value"])
+        assert row.total_a == len(A_events)
+
+        expected = ABTestRatiosBatch(
+            {
+                "A_total": [len(A_events)],
+                "A_converted": [np.count_nonzero(A_events.revenue)],
+                "B_total": [len(B_events)],
+                "B_converted": [np.count_nonzero(B_events.revenue)],
+            }
+        ).to_frame()
+        np.testing.assert_allclose(counts.loc[country, "p_value"], expected.p_value[0])
+
+
+def test_aggregate_report_without_segments():
+
+    aggregates = query_aggregates(
+        build_aggregation_query("events", "revenue"), connection=connection
+    )
+    report = aggregate_report(aggregates)
+
+    assert len(report) == 1
+    np.testing.assert_allclose(report.theta, 0)
+    np.testing.assert_allclose(
+        report.kpi_b, events[events.variant == "B"].revenue.mean()
+    )
@@ -1,5 +1,7 @@
 import numpy as np
+import pytest
 from dietbox.abtest.stats_util import cal_p_value
+from dietbox.abtest.moments import cal_moments
 from dietbox.abtest.stats import ABTestRatios, ABTestRatiosNaive, ABTestSeries
 
 
@@ -32,3 +34,250 @@ def test_ab_tests():
     mw = ABTestSeries(another_ab_test)
 
     print(mw.report(with_data=False))
+
+
+def test_ab_test_report_pipeline():
+
+    one_ab_test = {
+        "A_converted": 43,
+        "A_total": 17207,
+        "B_converted": 68,
+        "B_total": 17198,
+    }
+
+    dd = ABTestRatios(one_ab_test)
+    res = dd.report(with_data=False, pipeline=["p_value"])
+
+    assert list(res) == ["p_value"]
+    assert "conversion_uplift" in dd._metric_cache
+    assert "alt_distribution" not in dd._metric_cache
+    assert "conversion_rate" not in dd._metric_cache
+
+    full = dd.report(with_data=False)
+    assert full["p_value"] == res["p_value"]
+    assert dd.report(with_data=False, pipeline="z_score") == {
+        "z_score": full["z_score"]
+    }
+    assert ABTestRatios(one_ab_test).report(with_data=False) == full
+
+    # cached metrics do not walk their dependencies again
+    dd.conversion_uplift = None
+    assert dd.p_value() == full["p_value"]
+    assert dd.z_score(0.05) == ABTestRatios(one_ab_test).z_score(0.05)
+
+
+def test_ab_test_report_cached(monkeypatch):
+
+    calls = []
+
+    def counted_p_value(ab_test_data, test=None):
+        calls.append(test)
+        return cal_p_value(ab_test_data, test=test)
+
+    monkeypatch.setattr("dietbox.abtest.stats.cal_p_value", counted_p_value)
+
+    naive = ABTestRatiosNaive(
+        {"A_converted": 43, "A_total": 17207, "B_converted": 68, "B_total": 17198}
+    )
+    assert naive.report() == naive.report()
+    assert len(calls) == 1
+
+    rng = np.random.default_rng(0)
+    series = ABTestSeries(
+        {"A_series": rng.poisson(1, size=500), "B_series": rng.poisson(1.1, size=500)}
+    )
+    report = series.report(with_data=False)
+    assert series.report(with_data=False) == report
+    assert series.result() == series.result()
+    assert len(calls) == 2
+
+    # calls with other arguments are cached separately
+    assert series.p_value(method="welch") != report["p_value"]
+    assert series.p_value(method=None) == report["p_value"]
+    assert len(calls) == 2
+
+
+def test_ab_test_series_moments():
+
+    rng = np.random.default_rng(42)
+    A_series = rng.binomial(1, 0.3, size=2000) * rng.lognormal(1, 1, size=2000)
+    B_series = rng.binomial(1, 0.33, size=2100) * rng.lognormal(1, 1, size=2100)
+
+    def sums(series):
+        return {
+            "total": len(series),
+            "sum": series.sum(),
+            "sum_squares": np.dot(series, series),
+            "non_zero": np.count_nonzero(series),
+        }
+
+    partials = [cal_moments(chunk).to_dict() for chunk in np.array_split(B_series, 3)]
+    for kpi_method in ("sum", "count", "non_zero_avg", "all_avg"):
+        from_series = ABTestSeries(
+            {"A_series": A_series, "B_series": B_series}, kpi_method=kpi_method
+        )
+        from_moments = ABTestSeries(
+            {"A_moments": sums(A_series), "B_moments": partials},
+            kpi_method=kpi_method,
+        )
+        expected = from_series.report(with_data=False, pipeline=["kpi", "uplift"])
+        res = from_moments.report(with_data=False, pipeline=["kpi", "uplift"])
+
+        np.testing.assert_allclose(res["kpi"]["a"], expected["kpi"]["a"])
+        np.testing.assert_allclose(res["kpi"]["b"], expected["kpi"]["b"])
+        np.testing.assert_allclose(res["uplift"], expected["uplift"])
+        np.testing.assert_allclose(
+            from_moments.p_value(), from_series.p_value(method="welch")
+        )
+        assert from_moments.p_value() == from_moments.welch_test["p_value"]
+
+    # the number of non zero elements can not be recovered from the sums
+    without_non_zero = {
+        key: value for key, value in sums(A_series).items() if key != "non_zero"
+    }
+    for kpi_method in ("sum", "count", "non_zero_avg", "all_avg"):
+        ab_test_data = {"A_moments": without_non_zero, "B_moments": partials}
+        if kpi_method in ("count", "non_zero_avg"):
+            with pytest.raises(Exception, match="requires non_zero"):
+                ABTestSeries(ab_test_data, kpi_method=kpi_method)
+        else:
+            ABTestSeries(ab_test_data, kpi_method=kpi_method).report()
+
+
+def test_ab_test_series_streaming(tmp_path):
+
+    rng = np.random.default_rng(42)
+    A_series = rng.binomial(1, 0.3, size=5000) * rng.lognormal(1, 1, size=5000)
+    B_series = rng.binomial(1, 0.33, size=4000) * rng.lognormal(1, 1, size=4000)
+    np.save(tmp_path / "A.npy", A_series)
+    B_series.astype(np.float32).tofile(tmp_path / "B.bin")
+    B_series = B_series.astype(np.float32)
+
+    for kpi_method in ("sum", "count", "non_zero_avg", "all_avg"):
+        in_memory = ABTestSeries(
+            {"A_series": A_series, "B_series": B_series}, kpi_method=kpi_method
+        )
+        expected = in_memory.report(with_data=False, pipeline=["kpi", "uplift"])
+        for ab_test_data in (
+            {"A_series": tmp_path / "A.npy", "B_series": str(tmp_path / "B.bin")},
+            {
+                "A_series": np.load(tmp_path / "A.npy", mmap_mode="r"),
+                "B_series": (B_series[i : i + 999] for i in range(0, 4000, 999)),
+            },
+        ):
+            streamed = ABTestSeries(
+                ab_test_data, kpi_method=kpi_method, chunk_size=1000, dtype=np.float32
+            )
+            res = streamed.report(with_data=False, pipeline=["kpi", "uplift"])
+
+            np.testing.assert_allclose(res["kpi"]["a"], expected["kpi"]["a"])
+            np.testing.assert_allclose(res["kpi"]["b"], expected["kpi"]["b"], rtol=1e-6)
+            np.testing.assert_allclose(res["uplift"], expected["uplift"], rtol=1e-5)
+            np.testing.assert_allclose(
+                streamed.p_value(method="welch"),
+                in_memory.p_value(method="welch"),
+                rtol=1e-5,
+            )
+
+    # files are kept as memory maps for the tests of the whole series
+    streamed = ABTestSeries(
+        {"A_series": tmp_path / "A.npy", "B_series": tmp_path / "B.bin"},
+        dtype=np.float32,
+    )
+    assert isinstance(streamed.A_series, np.memmap)
+    assert streamed.p_value() == in_memory.p_value()
+
+
+def test_ab_test_series_streaming_mannwhitney(tmp_path, monkeypatch):
+
+    rng = np.random.default_rng(3)
+    A_series = rng.poisson(3, size=50_000).astype(np.int8)
+    B_series = rng.poisson(3.1, size=40_000).astype(np.int8)
+    np.save(tmp_path / "A.npy", A_series)
+    B_series.tofile(tmp_path / "B.bin")
+    expected = ABTestSeries({"A_series": A_series, "B_series": B_series}).p_value()
+
+    import dietbox.abtest.rank as rank
+
+    counted = []
+    cal_value_counts = rank.cal_value_counts
+
+    def recording_cal_value_counts(series, *args, **kwargs):
+        counted.append(len(series))
+        return cal_value_counts(series, *args, **kwargs)
+
+    monkeypatch.setattr(rank, "cal_value_counts", recording_cal_value_counts)
+
+    streamed = ABTestSeries(
+        {"A_series": tmp_path / "A.npy", "B_series": tmp_path / "B.bin"},
+        chunk_size=1000,
+        dtype=np.int8,
+    )
+
+    np.testing.assert_allclose(streamed.p_value(), expected, rtol=1e-10)
+    # the default Mann-Whitney test never holds more than a chunk
+    assert sum(counted) == 90_000
+    assert max(counted) <= 1000
+
+
+def test_ab_test_series_streaming_covariates(tmp_path):
+
+    rng = np.random.default_rng(7)
+    covariates = [rng.lognormal(1, 1, size=size) for size in (3000, 3500)]
+    series = [rng.binomial(1, 0.3, size=len(c)) * c for c in covariates]
+    for name, values in zip(("A", "B", "A_cov", "B_cov"), series + covariates):
+        np.save(tmp_path / f"{name}.npy", values)
+
+    def chunks(values):
+        return iter(np.array_split(values, 4))
+
+    for kpi_method in ("sum", "count", "non_zero_avg", "all_avg"):
+        in_memory = ABTestSeries(
+            {
+                "A_series": series[0],
+                "B_series": series[1],
+                "A_covariate": covariates[0],
+                "B_covariate": covariates[1],
+            },
+            kpi_method=kpi_method,
+        )
+        expected = in_memory.report(with_data=False)
+        from_files = ABTestSeries(
+            {
+                "A_series": tmp_path / "A.npy",
+                "B_series": tmp_path / "B.npy",
+                "A_covariate": tmp_path / "A_cov.npy",
+                "B_covariate": tmp_path / "B_cov.npy",
+            },
+            kpi_method=kpi_method,
+            chunk_size=1000,
+        )
+        from_chunks = ABTestSeries(
+            {
+                "A_series": chunks(series[0]),
+                "B_series": chunks(series[1]),
+                "A_covariate": chunks(covariates[0]),
+                "B_covariate": chunks(covariates[1]),
+            },
+            kpi_method=kpi_method,
+        )
+
+        for streamed in (from_files, from_chunks):
+            res = streamed.report(with_data=False)
+
+            assert list(res) == list(expected)
+            for key in ("kpi", "std_err"):
+                np.testing.assert_allclose(res[key]["a"], expected[key]["a"])
+                np.testing.assert_allclose(res[key]["b"], expected[key]["b"])
+            np.testing.assert_allclose(res["uplift"], expected["uplift"])
+            if "cuped" in expected:
+                for key in ("theta", "uplift", "p_value"):
+                    np.testing.assert_allclose(
+                        res["cuped"][key], expected["cuped"][key]
+                    )
+
+        # the default p-value does not depend on how the series are stored
+        assert from_files.report(with_data=False)["p_value"] == expected["p_value"]
+        np.testing.assert_allclose(
+            from_chunks.p_value(), in_memory.p_value(method="welch")
+        )
@@ -0,0 +1,58 @@
+import numpy as np
+import scipy.special as scsp
+import scipy.stats as scs
+from dietbox.abtest.stats_util import cal_binom_test_p_value, cal_p_value
+
+# p-values of scipy.stats.binom_test(k, n=n, p=p, alternative="greater")
+# computed with scipy 1.11, before binom_test was removed from scipy
+BINOM_TEST_P_VALUES = [
+    (68, 17198, 43 / 17207, 0.0002523526290113547),
+    (110, 1100, 0.07, 0.00013467725556153692),
+    (0, 100, 0.1, 1.0),
+    (5, 10, 0.5, 0.623046875),
+    (30500, 10_000_000, 0.003, 0.001980696804228522),
+    (31000, 10_000_000, 0.003, 4.496986886419914e-09),
+    (2000, 1_000_000, 0.001, 1.853653994401358e-170),
+    (120000, 40_000_000, 0.003, 0.5003856129058282),
+]
+
+
+def test_cal_binom_test_p_value():
+
+    k, n, p, expected = (np.array(i) for i in zip(*BINOM_TEST_P_VALUES))
+
+    np.testing.assert_allclose(cal_binom_test_p_value(k, n, p), expected, rtol=1e-12)
+    for i in range(len(k)):
+        np.testing.assert_allclose(
+            cal_binom_test_p_value(k[i], n[i], p[i]), expected[i], rtol=1e-12
+        )
+
+    np.testing.assert_allclose(
+        cal_binom_test_p_value(k, n, p, log=True), np.log(expected), rtol=1e-12
+    )
+    # the tail underflows in double precision but not in log space, where the
+    # result is an upper bound of the exact log tail, which is summed term by
+    # term as the reference, up to 1e-3 in the log, i.e., 0.1% of the p-value
+    assert cal_binom_test_p_value(5000, 1_000_000, 0.001) == 0
+    for k, n, p in ((5000, 1_000_000, 0.001), (4000, 2_000_000, 0.001)):
+        reference = scsp.logsumexp(scs.binom.logpmf(np.arange(k, k + 100_000), n, p))
+        log_p_value = cal_binom_test_p_value(k, n, p, log=True)
+
+        assert log_p_value >= reference
+        np.testing.assert_allclose(log_p_value, reference, rtol=0, atol=1e-3)
+
+
+def test_cal_p_value():
+
+    one_ab_test = {
+        "A_converted": 43,
+        "A_total": 17207,
+        "B_converted": 68,
+        "B_total": 17198,
+    }
+
+    np.testing.assert_allclose(cal_p_value(one_ab_test), 0.0002523526290113547)
+    np.testing.assert_allclose(
+        cal_p_value({key: np.array([val, val]) for key, val in one_ab_test.items()}),
+        [0.0002523526290113547, 0.0002523526290113547],
+    )
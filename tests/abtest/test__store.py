@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from dietbox.abtest.moments import cal_moments
+from dietbox.abtest.stats import ABTestRatios, ABTestSeries
+from dietbox.abtest.store import ABTestResultStore, cal_fingerprint
+
+
+def test_cal_fingerprint(tmp_path):
+
+    series = np.arange(1000) % 7
+    ab_test_data = {"A_series": series, "B_series": series[::-1]}
+
+    fingerprint = cal_fingerprint(ab_test_data, kpi_method="sum")
+    assert fingerprint == cal_fingerprint(
+        {"B_series": series[::-1].copy(), "A_series": list(series)}, kpi_method="sum"
+    )
+    assert fingerprint != cal_fingerprint(ab_test_data, kpi_method="all_avg")
+    assert fingerprint != cal_fingerprint(
+        {"A_series": series, "B_series": series[::-1] + 1}, kpi_method="sum"
+    )
+    assert cal_fingerprint({"A_total": np.int64(5)}) == cal_fingerprint({"A_total": 5})
+
+    # files, moments and unsupported values
+    A_path, B_path = tmp_path / "A.npy", tmp_path / "B.npy"
+    np.save(A_path, series)
+    np.save(B_path, series + 1)
+    assert cal_fingerprint({"A_series": A_path}) != cal_fingerprint(
+        {"A_series": B_path}
+    )
+    assert cal_fingerprint({"A_series": str(A_path)}) == cal_fingerprint(
+        {"A_series": A_path}
+    )
+    fingerprint = cal_fingerprint({"A_series": A_path})
+    np.save(A_path, np.arange(2000))
+    assert cal_fingerprint({"A_series": A_path}) != fingerprint
+
+    A_moments, B_moments = cal_moments(series), cal_moments(series + 1)
+    assert cal_fingerprint({"A_moments": A_moments}) != cal_fingerprint(
+        {"A_moments": B_moments}
+    )
+    assert cal_fingerprint({"A_moments": [A_moments]}) != cal_fingerprint(
+        {"A_moments": [B_moments]}
+    )
+    with pytest.raises(TypeError):
+        cal_fingerprint({"A_series": iter(np.array_split(series, 3))})
+
+    # non contiguous arrays are hashed in blocks with the same bytes
+    matrix = np.random.default_rng(0).normal(size=(300_000, 3))
+    for array in (matrix[::2], np.asfortranarray(matrix), matrix[:, 1]):
+        assert cal_fingerprint({"A_series": array}) == cal_fingerprint(
+            {"A_series": array.copy(order="C")}
+        )
+
+
+def test_ab_test_result_store(tmp_path):
+
+    experiments = {
+        f"test_{i}": {
+            "A_converted": 40 + i,
+            "A_total": 17207,
+            "B_converted": 68,
+            "B_total": 17198,
+        }
+        for i in range(5)
+    }
+    path = tmp_path / "results.sqlite"
+
+    with ABTestResultStore(path) as store:
+        first = store.run(ABTestRatios, experiments)
+        assert (store.hits, store.misses) == (0, 5)
+
+    experiments["test_0"]["B_converted"] = 70
+    with ABTestResultStore(path) as store:
+        second = store.run(ABTestRatios, experiments)
+        assert (store.hits, store.misses) == (4, 1)
+        assert list(second)[1:] == list(first)[1:]
+        assert (
+            second[0]
+            == ABTestRatios(experiments["test_0"], test_name="test_0").result()
+        )
+        assert len(store) == 6
+
+        store.mark_finished(["test_1", "test_2"])
+        assert store.evict(finished_ttl=3600) == 0
+        assert store.evict() == 2
+        assert store.evict(max_entries=3) == 1
+        assert len(store) == 3
+
+        series = {"A_series": np.arange(100) % 3, "B_series": np.arange(100) % 4}
+        store.run(ABTestSeries, {"series": series}, kpi_method="all_avg")
+        store.run(ABTestSeries, {"series": series}, kpi_method="sum")
+        assert store.misses == 3
+
+        # a changed file is a changed input
+        files = {"A_series": tmp_path / "A.npy", "B_series": tmp_path / "B.npy"}
+        np.save(files["A_series"], np.ones(10))
+        np.save(files["B_series"], np.full(10, 1.5))
+        res = store.run(ABTestSeries, {"files": files}, kpi_method="all_avg")
+        assert res[0].kpi_b == 1.5
+        np.save(files["B_series"], np.full(10, 2.95))
+        res = store.run(ABTestSeries, {"files": files}, kpi_method="all_avg")
+        assert res[0].kpi_b == 2.95
@@ -0,0 +1,48 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+from dietbox.abtest.stats import ABTestRatios
+from dietbox.abtest.streaming import ABTestRatiosAccumulator
+from dietbox.data.sync.local import save_records
+
+
+def test_ab_test_ratios_accumulator():
+
+    rng = np.random.default_rng(42)
+    groups = rng.choice(["A", "B"], size=2000)
+    converted = rng.random(2000) < np.where(groups == "A", 0.05, 0.08)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        events_file = os.path.join(tmp_dir, "events.ndjson")
+        save_records(
+            [
+                {"group": str(g), "converted": bool(c)}
+                for g, c in zip(groups, converted)
+            ],
+            events_file,
+        )
+
+        with open(events_file) as fp:
+            streamed = ABTestRatiosAccumulator().update_records(
+                json.loads(line) for line in fp
+            )
+
+    batched = ABTestRatiosAccumulator().update_batch(groups[:1000], converted[:1000])
+    other_worker = ABTestRatiosAccumulator().update_batch(
+        groups[1000:], converted[1000:]
+    )
+    merged = batched + other_worker
+
+    ab_test_data = {
+        "A_total": int(np.sum(groups == "A")),
+        "A_converted": int(np.sum(converted & (groups == "A"))),
+        "B_total": int(np.sum(groups == "B")),
+        "B_converted": int(np.sum(converted & (groups == "B"))),
+    }
+
+    assert streamed.to_dict() == ab_test_data
+    assert merged.to_dict() == ab_test_data
+    assert batched.A_total + other_worker.A_total == merged.A_total
+    assert merged.report() == ABTestRatios(ab_test_data).report()
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from dietbox.abtest.stats import ABTestRatios
+from dietbox.abtest.timeseries import cal_cumulative_metrics, cumulative_report
+
+daily = {
+    "A_total": np.array([[1000, 1200, 900], [500, 0, 700]]),
+    "A_converted": np.array([[43, 51, 40], [20, 0, 31]]),
+    "B_total": np.array([[1010, 1180, 950], [520, 0, 690]]),
+    "B_converted": np.array([[68, 70, 55], [25, 0, 36]]),
+}
+
+
+def test_cal_cumulative_metrics():
+
+    res = cal_cumulative_metrics(daily)
+
+    np.testing.assert_array_equal(
+        res["A_total"], [[1000, 2200, 3100], [500, 500, 1200]]
+    )
+    for i in range(2):
+        for day in range(3):
+            report = ABTestRatios(
+                {column: daily[column][i, : day + 1].sum() for column in daily}
+            ).report()
+            np.testing.assert_allclose(res["kpi_a"][i, day], report["kpi"]["a"])
+            np.testing.assert_allclose(res["kpi_b"][i, day], report["kpi"]["b"])
+            np.testing.assert_allclose(res["uplift"][i, day], report["uplift"])
+            np.testing.assert_allclose(
+                res["pooled_std_err"][i, day], report["pooled_std_err"]
+            )
+            np.testing.assert_allclose(res["p_value"][i, day], report["p_value"])
+
+    half_width = 1.959963984540054 * report["diff_std_err"]
+    np.testing.assert_allclose(
+        [res["ci_lower"][1, 2], res["ci_upper"][1, 2]],
+        [
+            report["kpi"]["b"] - report["kpi"]["a"] - half_width,
+            report["kpi"]["b"] - report["kpi"]["a"] + half_width,
+        ],
+    )
+
+
+def test_cumulative_report():
+
+    rows = []
+    for i, experiment in enumerate(["exp_1", "exp_2"]):
+        for day, date in enumerate(pd.date_range("2021-01-01", periods=3)):
+            if daily["A_total"][i, day] == 0:
+                continue
+            row = {column: daily[column][i, day] for column in daily}
+            rows.append(dict(row, experiment=experiment, date=date))
+
+    report = cumulative_report(pd.DataFrame(rows))
+    expected = cal_cumulative_metrics(daily)
+
+    assert report.index.names == ["experiment", "date"]
+    assert len(report) == 6
+    np.testing.assert_allclose(report.loc["exp_2"].A_total, [500, 500, 1200])
+    np.testing.assert_allclose(report.p_value, expected["p_value"].ravel())